@@ -2,7 +2,7 @@
 # Copyright Kevin Köck 2019 Released under the MIT license
 # Created on 2019-03-29 
 
-__updated__ = "2019-04-06"
+__updated__ = "2026-10-17"
 __version__ = "0.1"
 
 try:
@@ -25,9 +25,10 @@ def runTest(descr, f, *args):
     try:
         res = f(*args)
     except Exception as e:
-        if arduino.rom2str(args[0]) not in errors:  # always ROM
-            errors[arduino.rom2str(args[0])] = {}
-        errors[arduino.rom2str(args[0])][descr] = e
+        k = arduino.rom2str(args[0])  # always ROM
+        if k not in errors:
+            errors[k] = {}
+        errors[k][descr] = e
         res = "Failed"
     print(descr, res)
     return res if res != "Failed" else None
@@ -79,6 +80,9 @@ def test():
         for p in range(aps):
             runTest("AnalogRead             pin A{!s}:".format(p), arduino.analogRead, rom, p)
         print("-----------------------------------------------------\n")
+    print("Logged errors ({!s} dropped):".format(arduino.errors.dropped))
+    for record in arduino.errors.drain():
+        print(arduino.errors.format(record))
     print("\nTest done\n")
     if len(errors) == 0:
         print("No errors")
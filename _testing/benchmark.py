@@ -0,0 +1,170 @@
+# Author: Kevin Köck
+# Copyright Kevin Köck 2019 Released under the MIT license
+# Created on 2026-10-17
+
+"""
+Throughput and latency benchmark of ArduinoControl.
+
+On CPython the benchmark runs against the simulated bus of _testing/simulator.py
+with 1..N devices and different fault rates, printing one json object per result:
+
+    python -m _testing.benchmark --devices 4 --faults 0,0.01 --n 100 --output bench_output.txt
+
+On a micropython device it runs against the real bus:
+
+    from _testing import benchmark
+    benchmark.hardware(19)
+"""
+
+__updated__ = "2026-10-17"
+__version__ = "0.1"
+
+try:
+    import ujson as json
+except ImportError:
+    import json
+import sys
+
+
+def _percentile(latencies: list, p: int) -> int:
+    if not latencies:
+        return 0
+    return latencies[min(len(latencies) - 1, len(latencies) * p // 100)]
+
+
+def measure(name: str, f, args_list: list, setup=None) -> dict:
+    """
+    Call f once for every argument tuple in args_list and measure each call.
+    :param name: name of the operation
+    :param f: callable
+    :param args_list: list of argument tuples
+    :param setup: optional callable executed with the same arguments before every call, not measured
+    :return: dict with ops/s, p50/p99 latency in us and number of failed calls
+    """
+    import utime as time
+    latencies = []
+    failed = 0
+    total = 0
+    for args in args_list:
+        if setup is not None:
+            setup(*args)
+        t = time.ticks_us()
+        try:
+            f(*args)
+        except Exception:
+            failed += 1
+        d = time.ticks_diff(time.ticks_us(), t)
+        total += d
+        latencies.append(d)
+    latencies.sort()
+    return {"op": name, "calls": len(args_list), "failed": failed,
+            "ops_s": round(len(args_list) * 1000000 / total, 2) if total else 0,
+            "p50_us": _percentile(latencies, 50), "p99_us": _percentile(latencies, 99)}
+
+
+def run(arduinoControl, roms: list, n=50, pin=3, apin=0, scans=5) -> list:
+    """
+    Benchmark the public commands of ArduinoControl on all roms, calls are distributed round robin.
+    :param arduinoControl: ArduinoControl object
+    :param roms: list of roms to use
+    :param n: number of calls per command
+    :param pin: digital pin used for pinMode, digitalWrite, digitalRead and analogWrite
+    :param apin: analog pin used for analogRead
+    :param scans: number of calls of scan, scanSafely and of a sweep of all roms
+    :return: list of result dicts
+    """
+    ac = arduinoControl
+    calls = [roms[i % len(roms)] for i in range(n)]
+    results = [
+        measure("pinMode", ac.pinMode, [(rom, pin, 1) for rom in calls]),
+        measure("digitalWrite", ac.digitalWrite, [(rom, pin, i & 1) for i, rom in enumerate(calls)]),
+        measure("digitalRead", ac.digitalRead, [(rom, pin) for rom in calls]),
+        measure("analogWrite", ac.analogWrite, [(rom, pin, (i * 16) & 0xFF) for i, rom in enumerate(calls)]),
+        measure("analogRead", ac.analogRead, [(rom, apin) for rom in calls]),
+        # clientVersion is cached, invalidating it measures the transaction
+        measure("clientVersion", ac.clientVersion, [(rom,) for rom in calls], ac.invalidate),
+        measure("scan", ac.scan, [() for _ in range(scans)]),
+        measure("scanSafely", ac.scanSafely, [() for _ in range(scans)]),
+    ]
+    spec = [(rom, [pin], [apin]) for rom in roms]
+    buf = [0] * ac.sweepSize(spec)
+    results.append(measure("sweep", ac.sweep, [(spec, buf) for _ in range(scans)]))
+    return results
+
+
+def _control(pin):
+    from arduinoGPIO.arduinoControl import ArduinoControl
+    from arduinoGPIO.errorLog import ErrorLog
+    # logging retries would distort the measurements
+    return ArduinoControl(pin, errors=ErrorLog(size=0))
+
+
+def hardware(pin=19, n=50, output=None) -> list:
+    """
+    Run the benchmark on the real bus connected to a pin
+    :param pin: pin id of the 1-wire bus
+    :param n: number of calls per command
+    :param output: optional file name to write the results to
+    :return: list of result dicts
+    """
+    import machine
+    ac = _control(machine.Pin(pin))
+    roms = ac.scanSafely()
+    results = run(ac, roms, n)
+    for r in results:
+        r["devices"] = len(roms)
+    _write(results, output)
+    return results
+
+
+def simulated(devices=1, faults=((0.0, 0.0),), n=50, output=None) -> list:
+    """
+    Run the benchmark on the simulated bus for 1..devices devices and every fault rate
+    :param devices: maximum number of devices
+    :param faults: list of tuples (crc_fault_rate, bus_fault_rate)
+    :param n: number of calls per command
+    :param output: optional file name to write the results to
+    :return: list of result dicts
+    """
+    from _testing import simulator
+    simulator.install()
+    results = []
+    for count in range(1, devices + 1):
+        for crc_fault_rate, bus_fault_rate in faults:
+            simulator.reset()
+            bus = simulator.bus(19, crc_fault_rate=crc_fault_rate, bus_fault_rate=bus_fault_rate, seed=count)
+            for i in range(count):
+                bus.attach(simulator.SimArduino(unit_id=i + 1))
+            ac = _control(simulator.machine.Pin(19))
+            roms = [d.rom for d in bus.devices]
+            for r in run(ac, roms, n):
+                r["devices"] = count
+                r["crc_fault_rate"] = crc_fault_rate
+                r["bus_fault_rate"] = bus_fault_rate
+                results.append(r)
+    _write(results, output)
+    return results
+
+
+def _write(results: list, output=None):
+    lines = [json.dumps(r) for r in results]
+    if output is not None:
+        with open(output, "w") as f:
+            for line in lines:
+                f.write(line)
+                f.write("\n")
+    for line in lines:
+        print(line)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark ArduinoControl on the simulated bus")
+    parser.add_argument("--devices", type=int, default=1, help="benchmark with 1..DEVICES devices")
+    parser.add_argument("--faults", default="0",
+                        help="comma separated fault rates, applied to crc and bus faults, e.g. 0,0.01")
+    parser.add_argument("--n", type=int, default=50, help="calls per command")
+    parser.add_argument("--output", default=None, help="file to write the json lines to")
+    args = parser.parse_args(sys.argv[1:])
+    simulated(args.devices, [(float(f), float(f)) for f in args.faults.split(",")], args.n, args.output)
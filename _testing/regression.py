@@ -0,0 +1,620 @@
+# Author: Kevin Köck
+# Copyright Kevin Köck 2019 Released under the MIT license
+# Created on 2026-10-17
+
+__updated__ = "2026-10-17"
+__version__ = "0.1"
+
+# Regression tests of arduinoGPIO against the simulated bus, every test gets a new bus.
+# python -m _testing.regression [name of test ...]
+
+import sys
+import random
+from array import array
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+from _testing import simulator
+
+simulator.install()
+
+from arduinoGPIO.arduinoControl import ArduinoControl, PIN_MODE, DIGITAL_WRITE, ANALOG_WRITE, DIGITAL_READ, \
+    ANALOG_READ, BATCH_MAX, PIPELINE_MAX, SWEEP_MISSING, LONG_FRAME, PIPELINE
+from arduinoGPIO.asyncArduinoControl import AsyncArduinoControl
+from arduinoGPIO.arduino import Arduino
+from arduinoGPIO.pin import readPins, writePins
+from arduinoGPIO.retry import RetryPolicy
+from arduinoGPIO.errorLog import ErrorLog
+from arduinoGPIO.stats import TRANSACTIONS
+from arduinoGPIO.busPool import BusPool, AsyncBusPool
+
+
+def _bus(devices=1, **kwargs):
+    """
+    New bus with simulated devices, kwargs are passed to SimBus
+    :return: bus, list of SimArduino
+    """
+    seed = kwargs.pop("seed", 1)
+    random.seed(seed)  # jitter of the RetryPolicy
+    simulator.reset()
+    bus = simulator.install(seed=seed, **kwargs)
+    return bus, [bus.attach(simulator.SimArduino(unit_id=i + 1)) for i in range(devices)]
+
+
+def _control(**kwargs) -> ArduinoControl:
+    return ArduinoControl(simulator.machine.Pin(19), **kwargs)
+
+
+def _sleep(bus, ms):
+    simulator.utime.sleep_ms(ms)
+    bus._tick(0)  # devices run their loop
+
+
+def testBatch():
+    bus, (d,) = _bus()
+    old = bus.attach(simulator.SimArduino(unit_id=2, version=106))  # no long frames
+    ac = _control()
+    ac.hasFeature(d.rom, 0)
+    ac.hasFeature(old.rom, 0)
+    ops = [(ANALOG_WRITE, i, 10 * i) for i in range(14)] + [(DIGITAL_WRITE, 13, 1)]
+    for dev in (d, old):
+        c = dev.commands
+        r = bus.resets
+        assert ac.writeBatch(dev.rom, ops)
+        assert dev.duties[:14] == [10 * i for i in range(14)] and dev.outputs[13] == 1
+        transactions = bus.resets - r
+        if dev is d:
+            assert transactions == 1, transactions  # long batch
+        else:
+            assert transactions == -(-len(ops) // BATCH_MAX), transactions
+        assert dev.commands > c
+    with ac.batch(d.rom) as b:
+        b.pinMode(3, 1)
+        b.digitalWrite(3, 1)
+        b.analogWrite(5, 200)
+    assert d.modes[3] == 1 and d.outputs[3] == 1 and d.duties[5] == 200
+    r = bus.resets
+    with ac.batch(d.rom):
+        pass
+    assert bus.resets == r  # empty batch, no transaction
+
+
+def testBatchFallback():
+    bus, _ = _bus(0)
+    old = bus.attach(simulator.SimArduino(unit_id=1, version=100, digital_pins=14))  # no batches
+    ac = _control()
+    ops = [(PIN_MODE, 3, 1), (DIGITAL_WRITE, 3, 1), (ANALOG_WRITE, 5, 77)]
+    assert ac.writeBatch(old.rom, ops)
+    assert ac.writeMany(old.rom, [(4, 1)])
+    assert old.modes[3] == 1 and old.outputs[3] == 1 and old.outputs[4] == 1 and old.duties[5] == 77
+    assert len(ac.errors) == 0  # no batch was sent
+
+    async def main():
+        c = AsyncArduinoControl(simulator.machine.Pin(19))
+        assert await c.writeBatch(old.rom, [(DIGITAL_WRITE, 3, 0)]) and old.outputs[3] == 0
+
+    asyncio.run(main())
+
+
+def testPort():
+    bus, (d,) = _bus()
+    ac = _control()
+    for p in (0, 3, 19):
+        d.setInput(p, 1)
+    assert ac.readPort(d.rom) == 1 | 1 << 3 | 1 << 19
+    for p in range(20):
+        d.modes[p] = 1
+    ac.writePort(d.rom, 0b1010 | 1 << 19, 0xFFFFFF)
+    assert d.outputs[1] == d.outputs[3] == d.outputs[19] == 1 and d.outputs[0] == d.outputs[2] == 0
+    pins = [ac.Pin(d.rom, p) for p in (4, 5, 6)]
+    writePins(pins, [1, 0, 1])
+    assert d.outputs[4:7] == [1, 0, 1]
+    assert readPins(pins) == [1, 0, 1]
+    buf = bytearray(3)
+    ac.digitalReadInto(d.rom, [3, 4, 5], buf)  # levels of the outputs
+    assert list(buf) == [1, 1, 0]
+    try:
+        ac.writePort(d.rom, 1 << 60, 0)
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("mask out of range accepted")
+
+
+def testPortFallback():
+    bus, _ = _bus(0)
+    old = bus.attach(simulator.SimArduino(unit_id=1, version=100, digital_pins=14))  # no port commands
+    ac = _control()
+    for p in (0, 3):
+        old.setInput(p, 1)
+    assert ac.readPort(old.rom) == 1 | 1 << 3
+    for p in range(8):
+        old.modes[p] = 1
+    r = bus.resets
+    ac.writePort(old.rom, 0b110, 0b010)
+    assert old.outputs[:3] == [0, 1, 0] and bus.resets - r == 2  # one digitalWrite per pin
+    pins = [ac.Pin(old.rom, p) for p in (1, 2)]
+    writePins(pins, [0, 1])
+    r = bus.resets
+    assert readPins(pins) == [0, 1] and bus.resets - r == 2
+    assert Arduino(ac, old.rom).readPins([1, 2]) == [0, 1]
+    assert len(ac.errors) == 0  # no port command was sent
+
+
+def testBroadcast():
+    bus, devs = _bus(4)
+    devs[3].version = 103  # no broadcast support
+    ac = _control(cache_outputs=True)
+    roms = ac.scan()
+    seq = ac.broadcast([(PIN_MODE, 7, 1), (DIGITAL_WRITE, 7, 1)])
+    assert [d.outputs[7] for d in devs] == [1, 1, 1, 0]
+    assert ac.verifyBroadcast(roms, seq) == [devs[3].rom]
+    seq, failed = ac.broadcast([(PIN_MODE, 7, 1), (DIGITAL_WRITE, 7, 1)], roms)  # writes to the missed device
+    assert failed == [] and [d.outputs[7] for d in devs] == [1, 1, 1, 1]
+    c = devs[0].commands
+    ac.digitalWrite(roms[0], 7, 1)
+    assert devs[0].commands == c  # confirmed by verifyBroadcast
+    seqs = [ac.broadcast([(DIGITAL_WRITE, 8, 0)]) for _ in range(300)]
+    assert 0 not in seqs and max(seqs) == 255
+    ac._seq = 255
+    seq = ac.broadcast([(DIGITAL_WRITE, 8, 0)])
+    devs[1].broadcast_seq = 0  # rebooted after the broadcast
+    assert seq == 1 and ac.verifyBroadcast(roms[:3], seq) == [devs[1].rom]
+
+
+def testBroadcastOffline():
+    bus, devs = _bus(4)
+    devs[2].version = 103  # no broadcast support, repaired with a batch
+    ac = _control()
+    roms = ac.scan()
+    devs[0].present = False
+    seq, failed = ac.broadcast([(PIN_MODE, 7, 1), (DIGITAL_WRITE, 7, 1)], roms)
+    assert seq == 1 and failed == [devs[0].rom], failed
+    assert [d.outputs[7] for d in devs] == [0, 1, 1, 1]
+
+    async def main():
+        c = AsyncArduinoControl(simulator.machine.Pin(19))
+        devs[3].present = False
+        seq, failed = await c.broadcast([(DIGITAL_WRITE, 7, 0)], roms)
+        assert failed == [devs[0].rom, devs[3].rom] and [d.outputs[7] for d in devs] == [0, 0, 0, 1]
+
+    asyncio.run(main())
+
+
+def testStreamOverflow():
+    bus, (d,) = _bus()
+    ac = _control()
+    d.setAnalog(0, 321)
+    ac.streamStart(d.rom, [0], 10)
+    buf = array("H", [0] * 100)
+    _sleep(bus, 50)
+    n = ac.readBlock(d.rom, buf)
+    assert 4 <= n <= 8 and list(buf[:n]) == [321] * n, n
+    assert len(ac.errors) == 0
+    _sleep(bus, 1000)  # device buffer overflows
+    assert ac.readBlock(d.rom, buf) > 0
+    assert [r[2] for r in ac.errors.drain()] == ["Stream buffer overflow"]
+    ac.streamStop(d.rom)
+    assert ac.readBlock(d.rom, buf) == 0
+    adc = ac.ADC(d.rom, 0)
+    c = d.commands
+    g = adc.stream(500)
+    assert [next(g) for _ in range(4)] == [321] * 4
+    g.close()
+    assert d.commands - c <= 4, d.commands - c  # waits for the samples instead of polling
+
+
+def testWatch():
+    bus, devs = _bus(3)
+    ac = _control()
+    events = []
+    pins = [ac.Pin(d.rom, 4, mode=0) for d in devs]
+    for p in pins:
+        p.irq(lambda p: events.append((p._r, p._p)), simulator.machine.Pin.IRQ_RISING)
+    assert ac.poll() == {}
+    devs[1].setInput(4, 1)
+    bus._tick(1)
+    res = ac.poll()
+    assert list(res) == [devs[1].rom] and events == [(devs[1].rom, 4)], events
+    devs[1].setInput(4, 0)
+    bus._tick(1)
+    ac.poll()
+    assert len(events) == 1  # falling edge not requested
+    pins[1].irq(None)
+    devs[1].setInput(4, 1)
+    bus._tick(1)
+    assert ac.poll() == {} and len(events) == 1
+
+
+def testWatchOneShot():
+    bus, devs = _bus(2)
+    ac = _control()
+    events = []
+
+    def oneShot(p):
+        events.append((p._r, p._p))
+        p.irq(None)
+
+    pins = [ac.Pin(devs[0].rom, 4, mode=0), ac.Pin(devs[0].rom, 5, mode=0), ac.Pin(devs[1].rom, 4, mode=0)]
+    for p in pins[:2]:
+        p.irq(oneShot)
+    pins[2].irq(lambda p: events.append((p._r, p._p)))
+    for d, pin in ((devs[0], 4), (devs[0], 5), (devs[1], 4)):
+        d.setInput(pin, 1)
+    bus._tick(1)
+    ac.poll()
+    assert sorted(events) == sorted([(devs[0].rom, 4), (devs[0].rom, 5), (devs[1].rom, 4)]), events
+    for d, pin in ((devs[0], 4), (devs[0], 5), (devs[1], 4)):
+        d.setInput(pin, 0)
+    bus._tick(1)
+    ac.poll()
+    assert len(events) == 4 and events[-1] == (devs[1].rom, 4)
+
+
+def testWatchUnsupported():
+    bus, _ = _bus(0)
+    old = bus.attach(simulator.SimArduino(unit_id=1, version=105, digital_pins=14))  # no watch commands
+    ac = _control()
+    pin = ac.Pin(old.rom, 4, mode=0)
+    resets = bus.resets
+    for f in (lambda: ac.watch(old.rom, 1 << 4), lambda: ac.readChanges(old.rom),
+              lambda: pin.irq(lambda p: None)):
+        try:
+            f()
+        except NotImplementedError:
+            pass
+        else:
+            raise AssertionError("watch on a device without FEATURE_WATCH")
+    assert bus.resets == resets  # capabilities were cached, nothing was sent
+    assert ac.poll() == {} and not ac._irqs.get(old.rom)
+
+    async def main():
+        c = AsyncArduinoControl(simulator.machine.Pin(19))
+        try:
+            await c.readChanges(old.rom)
+        except NotImplementedError:
+            return
+        raise AssertionError("readChanges on a device without FEATURE_WATCH")
+
+    asyncio.run(main())
+
+
+def testRamp():
+    bus, (d,) = _bus()
+    old = bus.attach(simulator.SimArduino(unit_id=2, version=107))
+    ac = _control(cache_outputs=True)
+    a = Arduino(ac, d.rom)
+    ac.analogWrite(d.rom, 5, 10)
+    a.rampTo(5, 210, 1000)
+    _sleep(bus, 500)
+    assert 90 < d.duties[5] < 130, d.duties[5]
+    _sleep(bus, 600)
+    assert d.duties[5] == 210
+    c = d.commands
+    ac.analogWrite(d.rom, 5, 210)
+    assert d.commands == c + 1  # cache forgotten by the ramp
+    a.rampSequence(6, [(255, 100), (0, 100)], repeat=True, start=0)
+    values = []
+    for _ in range(8):
+        _sleep(bus, 50)
+        values.append(d.duties[6])
+    assert max(values) > 200 and min(values) < 50 and values[:4] == values[4:], values  # repeated
+    ac.analogWrite(d.rom, 6, 7)  # stops the ramp
+    _sleep(bus, 100)
+    assert d.duties[6] == 7
+    ac.capabilities(old.rom)
+    resets, c = bus.resets, old.commands
+    for f in (lambda: ac.rampTo(old.rom, 5, 1, 1), lambda: ac.rampSequence(old.rom, 5, [(1, 1)])):
+        try:
+            f()
+        except NotImplementedError:
+            pass
+        else:
+            raise AssertionError("ramp on a device without ramps")
+    assert bus.resets == resets and old.commands == c  # nothing was sent
+
+
+def testSweep():
+    bus, devs = _bus(3)
+    old = bus.attach(simulator.SimArduino(unit_id=20, version=101))
+    for i, d in enumerate(devs + [old]):
+        for p in range(4):
+            d.setAnalog(p, 100 * i + p)
+        d.setInput(2, i & 1)
+    ac = _control()
+    spec = [(d.rom, [2], [0, 3]) for d in devs + [old]]
+    buf = ac.sweep(spec)
+    assert list(buf) == [v for i in range(4) for v in (i & 1, 100 * i, 100 * i + 3)], list(buf)
+    devs[1].present = False
+    for _ in range(3):
+        ac.sweep(spec, buf)
+    assert list(buf[3:6]) == [SWEEP_MISSING] * 3 and ac.retry.failing(devs[1].rom)
+    r = bus.resets
+    ac.sweep(spec, buf)
+    # failing device skipped, port and long frame read of the 2 others, 3 reads of the old device
+    assert bus.resets - r == 2 * 2 + 3, bus.resets - r
+    devs[1].present = True
+    simulator.utime.sleep_ms(1100)  # probe interval of the RetryPolicy
+    ac.sweep(spec, buf)
+    assert list(buf[3:6]) == [1, 100, 103] and not ac.retry.failing(devs[1].rom)
+
+
+def testRegistry():
+    bus, devs = _bus(3)
+    events = []
+
+    class Control(ArduinoControl):
+        def _deviceAdded(self, rom):
+            events.append(("added", rom))
+
+        def _deviceRemoved(self, rom):
+            events.append(("removed", rom))
+
+    ac = Control(simulator.machine.Pin(19))
+    added, removed = ac.refresh()  # empty registry, searches the bus
+    assert sorted(added) == sorted(d.rom for d in devs) and removed == []
+    assert sorted(events) == sorted(("added", d.rom) for d in devs)
+    del events[:]
+    r = bus.resets
+    assert ac.refresh() == ([], []) and bus.resets - r == 3  # one ping per device, no search
+    devs[1].present = False
+    assert ac.refresh(misses=2) == ([], []) and events == []  # first miss
+    assert ac.refresh(misses=2) == ([], [devs[1].rom]) and events == [("removed", devs[1].rom)]
+    assert sorted(ac.devices()) == sorted([devs[0].rom, devs[2].rom]) and devs[1].rom not in ac._caps
+    assert ac.refresh() == ([], [])  # not searched again
+    devs[1].present = True
+    assert ac.refresh() == ([], [])
+    assert ac.refresh(scan=True) == ([devs[1].rom], []) and events[-1] == ("added", devs[1].rom)
+    assert len(ac.devices()) == 3
+
+    async def main():
+        class AsyncControl(AsyncArduinoControl):
+            def _deviceAdded(self, rom):
+                events.append(("async added", rom))
+
+            def _deviceRemoved(self, rom):
+                events.append(("async removed", rom))
+
+        a = AsyncControl(simulator.machine.Pin(19))
+        task = asyncio.create_task(a.monitor(interval=1, scan_interval=None, misses=1))
+        for _ in range(100):
+            await asyncio.sleep(0.001)
+            if len(a.devices()) == 3:
+                break
+        assert sorted(a.devices()) == sorted(d.rom for d in devs)
+        devs[2].present = False
+        for _ in range(100):
+            await asyncio.sleep(0.001)
+            if ("async removed", devs[2].rom) in events:
+                break
+        task.cancel()
+        assert sorted(a.devices()) == sorted([devs[0].rom, devs[1].rom])
+        assert [e for e in events if e[0] == "async removed"] == [("async removed", devs[2].rom)]
+
+    asyncio.run(main())
+
+
+def testBusPool():
+    bus, devs = _bus(2)
+    other = simulator.bus(21)
+    devs2 = [other.attach(simulator.SimArduino(unit_id=10 + i)) for i in range(2)]
+    pool = BusPool([_control(), ArduinoControl(simulator.machine.Pin(21))])
+    assert len(pool.scan()) == 4 and pool.control(devs2[1].rom) is pool.controls[1]
+    assert pool.pinMode(devs2[1].rom, 4, 1) and pool.digitalWrite(devs2[1].rom, 4, 1)
+    assert devs2[1].outputs[4] == 1 and devs[0].outputs[4] == 0
+    for name in ("missing", "PORT_PINS", "_irqs"):
+        try:
+            getattr(pool, name)
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError("{!s} routed".format(name))
+    unknown = b"\xc4" * 8
+    calls = [("digitalWrite", d.rom, 5, 1) for d in devs + devs2]
+    calls.insert(1, ("digitalWrite", unknown, 5, 1))
+    calls.append(("digitalRead", devs2[0].rom, 6))
+    devs2[0].setInput(6, 1)
+    calls.append(("clientVersion", devs[1].rom))
+    for threads in (False, True):
+        res = pool.run(calls, threads)
+        assert res[0] is True and res[2:5] == [True, True, True], res
+        assert isinstance(res[1], simulator.OneWireError) and res[5] == 1 and res[6] == devs[1].version, res
+        assert [d.outputs[5] for d in devs + devs2] == [1, 1, 1, 1]
+        for d in devs + devs2:
+            d.outputs[5] = 0
+
+    async def main():
+        ap = AsyncBusPool([AsyncArduinoControl(simulator.machine.Pin(19)),
+                           AsyncArduinoControl(simulator.machine.Pin(21))])
+        assert len(await ap.scan()) == 4
+        res = await ap.run(calls)
+        assert res[0] is True and isinstance(res[1], simulator.OneWireError) and res[5] == 1, res
+        assert await ap.digitalRead(devs2[0].rom, 6) == 1
+
+    asyncio.run(main())
+
+
+def testStats():
+    bus, (d,) = _bus()
+    ac = _control(stats=True)
+    ac.analogReadInto(d.rom, [0, 1, 2], array("H", [0] * 3))  # long frame
+    ac.pipeline(d.rom, [(DIGITAL_WRITE, 3, 1), (ANALOG_READ, 0, 0)])
+    assert ac.stats.get(com=ANALOG_READ)[TRANSACTIONS] == 1
+    assert ac.stats.get(com=LONG_FRAME) is None
+    assert ac.stats.get(com=PIPELINE)[TRANSACTIONS] == 1
+    roms = ac.stats.export()["roms"]
+    assert list(roms) == [ac.rom2str(d.rom)] and roms[ac.rom2str(d.rom)]["failures"] == 0
+    c = ac.stats.get(d.rom)
+    assert c[TRANSACTIONS] >= 2 and ac.stats.get(bytearray(d.rom)) is c and ac.stats.get(ac.rom2str(d.rom)) is c
+
+
+def testSnapshot():
+    bus, (d,) = _bus()
+    for p in range(6):
+        d.setAnalog(p, 10 * p + 1)
+    d.setInput(4, 1)
+    d.setInput(17, 1)
+    ac = _control()
+    a = Arduino(ac, d.rom)
+    a.snapshotStart([0, 2, 5])
+    _sleep(bus, 10)
+    r = bus.resets
+    mask, buf = a.snapshot()
+    assert bus.resets - r == 1
+    assert mask == 1 << 4 | 1 << 17, bin(mask)
+    assert buf[0] == 1 and buf[2] == 21 and buf[5] == 51, list(buf)
+    a.snapshotStop()
+    ac.retry.attempts = 1
+    try:
+        a.snapshot()
+    except simulator.OneWireError:
+        pass
+    else:
+        raise AssertionError("snapshot after snapshotStop")
+    old = bus.attach(simulator.SimArduino(unit_id=2, version=108))  # no snapshots
+    ac.capabilities(old.rom)
+    resets, c = bus.resets, old.commands
+    for f in (lambda: ac.snapshotStart(old.rom, [0]), lambda: ac.snapshot(old.rom), lambda: ac.snapshotStop(old.rom)):
+        try:
+            f()
+        except NotImplementedError:
+            pass
+        else:
+            raise AssertionError("snapshot on a device without snapshots")
+    assert bus.resets == resets and old.commands == c  # nothing was sent
+
+
+def testPipeline():
+    bus, (d,) = _bus()
+    old = bus.attach(simulator.SimArduino(unit_id=2, version=109))
+    for p in range(6):
+        d.setAnalog(p, 10 * p + 1)
+        old.setAnalog(p, 10 * p + 1)
+    d.setInput(15, 1)
+    ac = _control()
+    ops = [(PIN_MODE, p, 1) for p in range(2, 14)] + [(DIGITAL_WRITE, 13, 1), (ANALOG_WRITE, 9, 128),
+                                                      (DIGITAL_READ, 15, 0), (ANALOG_READ, 3, 0)]
+    expected = [True] * 14 + [1, 31]
+    ac.hasFeature(d.rom, 0)
+    r = bus.resets
+    assert ac.pipeline(d.rom, ops) == expected
+    assert bus.resets - r == -(-len(ops) // PIPELINE_MAX), bus.resets - r
+    assert d.modes[2:14] == [1] * 12 and d.outputs[13] == 1 and d.duties[9] == 128
+    assert ac.pipeline(old.rom, ops)[:14] == [True] * 14  # one command per transaction
+    bus.crc_fault_rate = 0.02
+    for _ in range(20):
+        res = ac.pipeline(d.rom, ops)
+        assert all(v is None or v == e for v, e in zip(res, expected)), res
+    ac.retry.reset()
+    r = bus.resets
+    ac.pipeline(d.rom, ops)
+    assert bus.resets - r <= 3 * 6 * 2 + 2, bus.resets - r  # repeats of failed commands are capped
+    bus.crc_fault_rate = 0
+    d.present = False
+    ac.retry.reset()
+    assert ac.pipeline(d.rom, ops) == [None] * len(ops)
+
+
+def testRetryFailFast():
+    bus, (d, e) = _bus(2)
+    ac = _control(retry=RetryPolicy(attempts=4, fail_fast=2))
+    d.present = False
+    for _ in range(2):
+        r = bus.resets
+        try:
+            ac.digitalWrite(d.rom, 3, 1)
+        except simulator.OneWireError:
+            pass
+        assert bus.resets - r == 4  # all attempts
+    assert ac.retry.attemptsFor(ac._key(d.rom)) == 1
+    r = bus.resets
+    try:
+        ac.digitalWrite(d.rom, 3, 1)
+    except simulator.OneWireError:
+        pass
+    assert bus.resets - r == 1  # fails fast
+    assert ac.retry.attemptsFor(ac._key(e.rom)) == 4 and ac.digitalWrite(e.rom, 3, 1)
+    d.present = True
+    ac.digitalWrite(d.rom, 3, 1)
+    assert d.outputs[3] == 1 and not ac.retry.failing(ac._key(d.rom))
+    assert ac.retry.attemptsFor(ac._key(d.rom)) > 1
+
+
+def testErrorLog():
+    bus, (d,) = _bus(crc_fault_rate=0.03, seed=2)
+    log = ErrorLog(size=4, rate=3, period=1000)
+    ac = _control(errors=log)
+    for _ in range(100):
+        try:
+            ac.analogRead(d.rom, 0)
+        except simulator.OneWireError:
+            pass
+    assert len(log) and log.dropped > 0
+    records = log.drain()
+    assert records[0][1] == d.rom and len(log) == 0
+    log = ErrorLog(size=8, rate=3, period=1000)
+    for i in range(5):
+        log.log(str(i))
+    assert len(log) == 3 and log.dropped == 2  # rate limited
+    simulator.utime.sleep_ms(1000)
+    log.log("next period")
+    assert [r[2] for r in log.drain()] == ["0", "1", "2", "next period"]
+    o = ErrorLog(size=2, rate=100)
+    for i in range(5):
+        o.log(str(i))
+    assert [r[2] for r in o.drain()] == ["3", "4"] and o.dropped == 3
+
+
+def testAsync():
+    bus, devs = _bus(3, crc_fault_rate=0.03, seed=3)
+
+    async def main():
+        ac = AsyncArduinoControl(simulator.machine.Pin(19),
+                                 retry=RetryPolicy(attempts=8, max_attempts=8, fail_fast=0))
+        r = bus.resets
+        async with ac.batch(devs[0].rom):
+            pass
+        assert bus.resets == r
+
+        async def worker(i, d):
+            for v in range(10):
+                await ac.analogWrite(d.rom, 3, v)
+                d.setAnalog(1, 7 * i + v)
+                assert await ac.analogRead(d.rom, 1) == 7 * i + v
+                buf = array("H", [0, 0])
+                await ac.analogReadInto(d.rom, [1, 2], buf)
+                assert buf[0] == 7 * i + v
+                await ac.writePort(d.rom, 0xF << 16, (v & 0xF) << 16)
+            return True
+
+        assert all(await asyncio.gather(*[worker(i, d) for i, d in enumerate(devs)]))
+        for d in devs:
+            assert d.duties[3] == 9 and d.outputs[16:20] == [1, 0, 0, 1]
+
+    asyncio.run(main())
+
+
+def run(names=None) -> int:
+    """
+    Run the tests
+    :param names: names of the tests or None for all
+    :return: number of failed tests
+    """
+    failed = 0
+    for name, f in sorted(globals().items()):
+        if not name.startswith("test") or (names and name not in names):
+            continue
+        try:
+            f()
+            print(name, "ok")
+        except Exception as e:
+            failed += 1
+            print(name, "failed:", repr(e))
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(1 if run(sys.argv[1:]) else 0)
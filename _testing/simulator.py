@@ -0,0 +1,985 @@
+# Author: Kevin Köck
+# Copyright Kevin Köck 2019 Released under the MIT license
+# Created on 2026-10-17
+
+"""
+Simulated 1-wire bus with Arduinos running the ProjectArduinoControl sketch.
+Makes arduinoGPIO importable and runnable on CPython for benchmarking and regression tests:
+
+    from _testing import simulator
+    bus = simulator.install()  # registers fake micropython, utime, machine and onewire modules
+    bus.attach(simulator.SimArduino(unit_id=1))
+    from arduinoGPIO.arduinoControl import ArduinoControl
+    ac = ArduinoControl(simulator.machine.Pin(19))
+
+Time is virtual: every reset, byte and bit on the bus advances the clock returned by utime.ticks_us
+so latencies are deterministic and independent of the host speed.
+"""
+
+__updated__ = "2026-10-17"
+__version__ = "0.1"
+
+
+import random
+import sys
+import types
+
+# 1-wire ROM commands
+SEARCH_ROM = 0xF0
+MATCH_ROM = 0x55
+SKIP_ROM = 0xCC
+
+FAMILY_CODE = 0xC4
+
+# Commands of Control.cpp
+PIN_MODE = 0x10
+DIGITAL_READ = 0x22
+DIGITAL_WRITE = 0x32
+ANALOG_READ = 0x44
+ANALOG_WRITE = 0x54
+DIGITAL_PINS = 0xAA
+ANALOG_PINS = 0xBC
+WRITE_SCRATCHPAD = 0x4E
+READ_SCRATCHPAD = 0xBE
+READ_VERSION = 0xCE
+BATCH = 0x60
+READ_PORT = 0x62
+WRITE_PORT = 0x64
+BROADCAST = 0x66
+BROADCAST_STATUS = 0x68
+STREAM_START = 0x6A
+STREAM_READ = 0x6C
+WATCH = 0x6E
+READ_CHANGES = 0x70
+LONG_FRAME = 0x72
+RAMP = 0x74
+SNAPSHOT = 0x76
+PIPELINE = 0x78
+
+BATCH_MAX = 8
+PORT_PINS = 56
+STREAM_BUFFER = 64
+STREAM_READ_MAX = 16
+LONG_FRAME_MAX = 64
+RAMP_SLOTS = 4
+RAMP_KEYFRAMES = 8
+RAMP_CURRENT = 0xFFFF
+SNAPSHOT_ANALOG = 16
+PIPELINE_MAX = 7
+PIPELINE_ARGUMENTS = {PIN_MODE: 2, DIGITAL_WRITE: 3, ANALOG_WRITE: 3, DIGITAL_READ: 1, ANALOG_READ: 1}
+ANALOG_READ_US = 112  # duration of analogRead() on an AVR
+COMMAND_US = 10  # duration of other commands of a pipeline
+
+FEATURE_BATCH = 0x0001
+FEATURE_PORT = 0x0002
+FEATURE_BROADCAST = 0x0004
+FEATURE_STREAM = 0x0008
+FEATURE_WATCH = 0x0010
+FEATURE_LONG_FRAME = 0x0020
+FEATURE_RAMP = 0x0040
+FEATURE_SNAPSHOT = 0x0080
+FEATURE_PIPELINE = 0x0100
+
+# client version introducing a feature or command
+FEATURES = ((101, FEATURE_BATCH), (102, FEATURE_PORT), (104, FEATURE_BROADCAST), (105, FEATURE_STREAM),
+            (106, FEATURE_WATCH), (107, FEATURE_LONG_FRAME), (108, FEATURE_RAMP),
+            (109, FEATURE_SNAPSHOT), (110, FEATURE_PIPELINE))
+COMMAND_VERSIONS = {BATCH: 101, READ_PORT: 102, WRITE_PORT: 102, BROADCAST: 104, BROADCAST_STATUS: 104,
+                    STREAM_START: 105, STREAM_READ: 105, WATCH: 106, READ_CHANGES: 106,
+                    LONG_FRAME: 107, RAMP: 108, SNAPSHOT: 109, PIPELINE: 110}
+
+SUCCESS = 0xEE
+SUCCESS_CRC = 0xF6
+
+
+def crc8(data, crc=0):
+    for b in data:
+        for _ in range(8):
+            mix = (crc ^ b) & 0x01
+            crc >>= 1
+            if mix:
+                crc ^= 0x8C
+            b >>= 1
+    return crc
+
+
+def crc16(data, crc=0):
+    """CRC-16/MAXIM without final inversion as used by long frames"""
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+class Clock:
+    """Virtual microsecond clock shared by the bus and the fake utime module"""
+
+    def __init__(self):
+        self.us = 0
+
+    def advance(self, us):
+        self.us += int(us)
+
+
+class SimArduino:
+    """
+    Model of one Arduino running the ProjectArduinoControl sketch.
+    Implements the command set, scratchpad layout and crc handling of Control.cpp.
+    """
+
+    def __init__(self, unit_id=0x03, digital_pins=20, analog_pins=6, version=110, rom=None):
+        if rom is None:
+            rom = bytearray((FAMILY_CODE, 0x00, 0x00, 0xB2, 0x18, 0xDA, unit_id & 0xFF, 0))
+            rom[7] = crc8(rom[:7])
+        self.rom = bytes(rom)
+        self.digital_pins = digital_pins
+        self.analog_pins = analog_pins
+        self.version = version
+        self.present = True
+        self.modes = [0] * digital_pins
+        self.outputs = [0] * digital_pins
+        self.inputs = [0] * digital_pins
+        self.duties = [0] * digital_pins
+        self.analog = [0] * analog_pins
+        self.scratchpad = bytearray(9)
+        self.broadcast_seq = 0
+        self.analog_source = None  # callable(pin, us) returning the analog value at a time
+        self.stream_mask = 0
+        self.stream_interval = 0
+        self.stream_last = 0
+        self.stream = []  # buffered samples
+        self.stream_pins = 0
+        self.stream_overflow = False
+        self.watch_mask = 0
+        self.watch_state = 0
+        self.watch_changed = 0
+        self.ramps = [[0, [], 0, False, 0, 0, 0] for _ in range(RAMP_SLOTS)]  # pin, keyframes, index, repeat, from, value, start ms
+        self.duty_writes = 0  # number of pwm duties written, by commands and ramps
+        self.snapshot_enabled = False
+        self.snapshot_mask = 0
+        self.snapshot_next = 0
+        self.snapshot_digital = 0
+        self.snapshot_analog = [0] * SNAPSHOT_ANALOG
+        self.commands = 0  # number of commands executed
+        self._out = []
+        self._bits = []  # (us, value) of single bits sent, read once the device got to them
+        self._session = None
+        self._now = 0
+        self._commands = {
+            PIN_MODE: self._pinMode,
+            DIGITAL_READ: self._digitalRead,
+            DIGITAL_WRITE: self._digitalWrite,
+            ANALOG_READ: self._analogRead,
+            ANALOG_WRITE: self._analogWrite,
+            DIGITAL_PINS: self._digitalPins,
+            ANALOG_PINS: self._analogPins,
+            WRITE_SCRATCHPAD: self._writeScratchpad,
+            READ_SCRATCHPAD: self._readScratchpad,
+            READ_VERSION: self._readVersion,
+            BATCH: self._batch,
+            READ_PORT: self._readPort,
+            WRITE_PORT: self._writePort,
+            BROADCAST: self._broadcast,
+            BROADCAST_STATUS: self._broadcastStatus,
+            STREAM_START: self._streamStart,
+            STREAM_READ: self._streamRead,
+            WATCH: self._watch,
+            READ_CHANGES: self._readChanges,
+            LONG_FRAME: self._longFrame,
+            RAMP: self._ramp,
+            SNAPSHOT: self._snapshot,
+            PIPELINE: self._pipeline,
+        }
+
+    def features(self):
+        """Feature flags reported with READ_VERSION, depending on the simulated client version"""
+        f = 0
+        for version, feature in FEATURES:
+            if self.version >= version:
+                f |= feature
+        return f
+
+    # external pin stimulus
+
+    def setInput(self, pin, value):
+        self.inputs[pin] = 1 if value else 0
+
+    def setAnalog(self, pin, value):
+        self.analog[pin] = value & 0x3FF
+
+    def pinState(self, pin):
+        """Level of a pin like digitalRead() on the Arduino would return it"""
+        if self.modes[pin] == 1:
+            return self.outputs[pin]
+        return self.inputs[pin]
+
+    def analogValue(self, pin, us):
+        if self.analog_source is not None:
+            return self.analog_source(pin, us) & 0x3FF
+        return self.analog[pin]
+
+    def _watchPins(self, latch):
+        for pin in range(min(self.digital_pins, PORT_PINS)):
+            bit = 1 << pin
+            if self.watch_mask & bit and bool(self.watch_state & bit) != bool(self.pinState(pin)):
+                self.watch_state ^= bit
+                if latch:
+                    self.watch_changed |= bit
+
+    def update(self, clock):
+        """Equivalent of Control::update() called from loop() of the sketch"""
+        self._now = clock.us
+        if self.watch_mask:
+            self._watchPins(True)
+        if self.stream_mask:
+            now = clock.us // 1000
+            # loop() of the sketch runs continuously, take the samples due since the last update
+            while now - self.stream_last >= self.stream_interval:
+                self.stream_last += self.stream_interval
+                if len(self.stream) + self.stream_pins > STREAM_BUFFER:
+                    del self.stream[:self.stream_pins]
+                    self.stream_overflow = True
+                for pin in range(16):
+                    if self.stream_mask & (1 << pin):
+                        self.stream.append(self.analogValue(pin, clock.us))
+                if self.stream_interval == 0:
+                    break  # one sample per update
+        self._runRamps()
+        self._updateSnapshot()
+
+    def _updateSnapshot(self):
+        """Control::updateSnapshot, all digital pins and one analog pin per call"""
+        if not self.snapshot_enabled:
+            return
+        self.snapshot_digital = 0
+        for pin in range(min(self.digital_pins, PORT_PINS)):
+            if self.pinState(pin):
+                self.snapshot_digital |= 1 << pin
+        if not self.snapshot_mask:
+            return
+        for _ in range(SNAPSHOT_ANALOG):
+            pin = self.snapshot_next
+            self.snapshot_next = (pin + 1) % SNAPSHOT_ANALOG
+            if self.snapshot_mask & (1 << pin):
+                self.snapshot_analog[pin] = self.analogValue(pin, self._now)
+                break
+
+    # bus side
+
+    def reset(self):
+        self._out = []
+        self._bits = []
+        self._session = self._rom()
+        next(self._session)
+
+    def write(self, value):
+        if self._session is None:
+            return
+        try:
+            self._session.send(value)
+        except StopIteration:
+            self._session = None
+
+    def read(self):
+        if self._out:
+            return self._out.pop(0)
+        return 0xFF
+
+    def send(self, data):
+        self._out.extend(data)
+
+    def sendBit(self, value, us=0):
+        # hub->sendBit() after us of work, read slots before get a 1 from the pull-up
+        self._bits.append((self._now + us, value))
+
+    def readBit(self, us):
+        if self._bits and us >= self._bits[0][0]:
+            return self._bits.pop(0)[1]
+        return 1
+
+    def _rom(self):
+        cmd = yield
+        if cmd == MATCH_ROM:
+            for i in range(8):
+                b = yield
+                if b != self.rom[i]:
+                    return
+        elif cmd != SKIP_ROM:
+            return
+        yield from self._duty()
+
+    def _duty(self):
+        cmd = yield
+        handler = self._commands.get(cmd)
+        if handler is None or COMMAND_VERSIONS.get(cmd, 100) > self.version:
+            return  # hub->raiseSlaveError(cmd), no answer
+        self.commands += 1
+        yield from handler(cmd)
+
+    def _checkCRC(self, cmd, length):
+        sp = self.scratchpad
+        for i in range(length + 1):
+            sp[i + 1] = yield
+        sp[0] = cmd
+        return crc8(sp[:length + 2]) == 0
+
+    def _sendSuccess(self):
+        self.send((SUCCESS, SUCCESS_CRC))
+
+    def _sendScratchpad(self):
+        sp = self.scratchpad
+        sp[8] = crc8(sp[:8])
+        self.send(sp)
+
+    def _setValue(self, value):
+        self.scratchpad[4] = value & 0xFF
+        self.scratchpad[5] = (value >> 8) & 0xFF
+
+    def _writeScratchpad(self, cmd):
+        if (yield from self._checkCRC(cmd, 7)):
+            self._sendSuccess()
+
+    def _readScratchpad(self, cmd):
+        if (yield from self._checkCRC(cmd, 0)):
+            self._sendScratchpad()
+
+    def _pinMode(self, cmd):
+        if (yield from self._checkCRC(cmd, 2)):
+            self._execute(cmd, self.scratchpad[1], self.scratchpad[2])
+            self._sendSuccess()
+
+    def _digitalRead(self, cmd):
+        if (yield from self._checkCRC(cmd, 1)):
+            self._setValue(self.pinState(self.scratchpad[1]))
+            self._sendScratchpad()
+
+    def _digitalWrite(self, cmd):
+        if (yield from self._checkCRC(cmd, 3)):
+            sp = self.scratchpad
+            self._execute(cmd, sp[1], (sp[2] << 8) | sp[3])
+            self._sendSuccess()
+
+    def _analogRead(self, cmd):
+        if (yield from self._checkCRC(cmd, 1)):
+            self._setValue(self.analogValue(self.scratchpad[1], self._now))
+            self._sendScratchpad()
+
+    def _analogWrite(self, cmd):
+        if (yield from self._checkCRC(cmd, 3)):
+            sp = self.scratchpad
+            self._execute(cmd, sp[1], (sp[2] << 8) | sp[3])
+            self._sendSuccess()
+
+    def _execute(self, cmd, pin, value):
+        r = self._stopRamp(pin)
+        if cmd == PIN_MODE:
+            self.modes[pin] = value
+        elif cmd == DIGITAL_WRITE:
+            self.outputs[pin] = 1 if value else 0
+        elif cmd == ANALOG_WRITE:
+            self._writeDuty(pin, value)
+            if r is None:
+                r = self._rampSlot(pin, False)
+            if r is not None:
+                r[:3] = [pin, [(value, 0)], 1]
+                r[5] = value
+
+    def _writeDuty(self, pin, value):
+        self.duties[pin] = value & 0xFF
+        self.duty_writes += 1
+
+    # ramps, see Control::startRamp and Control::runRamps
+
+    def _rampSlot(self, pin, evict):
+        for r in self.ramps:
+            if r[1] and r[0] == pin:
+                return r
+        slot = None
+        for r in self.ramps:
+            if not r[1]:
+                return r
+            if r[2] == len(r[1]):
+                slot = r
+        if slot is not None or not evict:
+            return slot
+        return min(self.ramps, key=lambda r: r[6])
+
+    def _stopRamp(self, pin):
+        for r in self.ramps:
+            if r[1] and r[0] == pin:
+                r[2] = len(r[1])
+                return r
+        return None
+
+    def _startRamp(self, pin, start, keys, repeat):
+        if not 0 < len(keys) <= RAMP_KEYFRAMES or (repeat and sum(ms for _, ms in keys) == 0):
+            return False
+        r = self._rampSlot(pin, True)
+        if start == RAMP_CURRENT:
+            start = r[5] if r[1] and r[0] == pin else 0
+        r[:] = [pin, keys, 0, repeat, start, start, self._now // 1000]
+        self._writeDuty(pin, start)
+        self._runRamps()
+        return True
+
+    def _runRamps(self):
+        now = self._now // 1000
+        for r in self.ramps:
+            keys = r[1]
+            if r[2] == len(keys):
+                continue  # unused or finished
+            elapsed = now - r[6]
+            while r[2] < len(keys) and elapsed >= keys[r[2]][1]:
+                elapsed -= keys[r[2]][1]
+                r[6] += keys[r[2]][1]
+                r[4] = keys[r[2]][0]
+                r[2] += 1
+                if r[2] == len(keys) and r[3]:
+                    r[2] = 0
+            if r[2] == len(keys):
+                value = r[4]
+            else:
+                value = r[4] + int((keys[r[2]][0] - r[4]) * elapsed / keys[r[2]][1])
+            if value != r[5]:
+                r[5] = value
+                self._writeDuty(r[0], value)
+
+    def _snapshot(self, cmd):
+        if (yield from self._checkCRC(cmd, 3)):
+            sp = self.scratchpad
+            self.snapshot_mask = (sp[2] << 8) | sp[1]
+            self.snapshot_enabled = bool(sp[3] & 0x01)
+            self.snapshot_next = 0
+            self.snapshot_analog = [0] * SNAPSHOT_ANALOG
+            self._updateSnapshot()
+            self._sendSuccess()
+
+    def _ramp(self, cmd):
+        if (yield from self._checkCRC(cmd, 7)):
+            sp = self.scratchpad
+            if self._startRamp(sp[1], (sp[2] << 8) | sp[3], [((sp[4] << 8) | sp[5], (sp[6] << 8) | sp[7])], False):
+                self._sendSuccess()
+
+    def _checkBatch(self, crc):
+        """
+        :param crc: crc of the bytes received before the batch
+        :return: list of operations or None
+        """
+        n = yield
+        if n > BATCH_MAX:
+            return None
+        ops = bytearray()
+        for _ in range(n * 4 + 1):
+            ops.append((yield))
+        if crc8(ops, crc8((n,), crc)) != 0:
+            return None
+        for i in range(0, n * 4, 4):
+            if ops[i] not in (PIN_MODE, DIGITAL_WRITE, ANALOG_WRITE):
+                return None
+        return [(ops[i], ops[i + 1], (ops[i + 2] << 8) | ops[i + 3]) for i in range(0, n * 4, 4)]
+
+    def _batch(self, cmd):
+        ops = yield from self._checkBatch(crc8((cmd,)))
+        if ops is not None:
+            for op in ops:
+                self._execute(*op)
+            self._sendSuccess()
+
+    def _broadcast(self, cmd):
+        seq = yield
+        ops = yield from self._checkBatch(crc8((cmd, seq)))
+        if ops is not None:
+            for op in ops:
+                self._execute(*op)
+            self.broadcast_seq = seq
+
+    def _broadcastStatus(self, cmd):
+        if (yield from self._checkCRC(cmd, 0)):
+            self.scratchpad[3] = self.broadcast_seq
+            self._sendScratchpad()
+
+    def _readPort(self, cmd):
+        if (yield from self._checkCRC(cmd, 0)):
+            sp = self.scratchpad
+            for i in range(1, 8):
+                sp[i] = 0
+            for pin in range(min(self.digital_pins, PORT_PINS)):
+                if self.pinState(pin):
+                    sp[1 + pin // 8] |= 1 << (pin % 8)
+            self._sendScratchpad()
+
+    def _writePort(self, cmd):
+        if (yield from self._checkCRC(cmd, 7)):
+            sp = self.scratchpad
+            for i in range(24):
+                pin = sp[1] * 8 + i
+                if pin >= self.digital_pins:
+                    break
+                if sp[2 + i // 8] & (1 << (i % 8)):
+                    self._stopRamp(pin)
+                    self.outputs[pin] = (sp[5 + i // 8] >> (i % 8)) & 1
+            self._sendSuccess()
+
+    def _streamStart(self, cmd):
+        if (yield from self._checkCRC(cmd, 4)):
+            sp = self.scratchpad
+            self.stream_mask = (sp[2] << 8) | sp[1]
+            self.stream_interval = (sp[3] << 8) | sp[4]
+            self.stream_pins = bin(self.stream_mask).count("1")
+            self.stream = []
+            self.stream_overflow = False
+            self.stream_last = self._now // 1000
+            self._sendSuccess()
+
+    def _streamRead(self, cmd):
+        if (yield from self._checkCRC(cmd, 1)):
+            m = min(self.scratchpad[1], STREAM_READ_MAX)
+            n = min(len(self.stream), m)
+            if self.stream_pins:
+                n -= n % self.stream_pins
+            a = bytearray(3 + 2 * m)
+            a[0] = n
+            a[1] = 0x01 if self.stream_overflow else 0
+            for i in range(n):
+                a[2 + 2 * i] = self.stream[i] & 0xFF
+                a[3 + 2 * i] = self.stream[i] >> 8
+            del self.stream[:n]
+            if self.stream:
+                a[1] |= 0x02
+            self.stream_overflow = False
+            a[-1] = crc8(a[:-1])
+            self.send(a)
+
+    def _watch(self, cmd):
+        if (yield from self._checkCRC(cmd, 7)):
+            self.watch_mask = int.from_bytes(bytes(self.scratchpad[1:8]), "little")
+            self.watch_state = 0
+            self.watch_changed = 0
+            self._watchPins(False)
+            self._sendSuccess()
+
+    def _readChanges(self, cmd):
+        if (yield from self._checkCRC(cmd, 0)):
+            a = bytearray(self.watch_changed.to_bytes(7, "little") + self.watch_state.to_bytes(7, "little"))
+            a.append(crc8(a))
+            self.watch_changed = 0
+            self.send(a)
+
+    def _longFrame(self, cmd):
+        n = yield
+        if n == 0 or n > LONG_FRAME_MAX:
+            return
+        frame = bytearray((cmd, n))
+        for _ in range(n + 2):
+            frame.append((yield))
+        if crc16(frame) != 0:
+            return
+        com, args = frame[2], frame[3:n + 2]
+        if com == BATCH:
+            if len(args) != args[0] * 4 + 1:
+                return
+            ops = [(args[i], args[i + 1], (args[i + 2] << 8) | args[i + 3]) for i in range(1, len(args), 4)]
+            if any(op[0] not in (PIN_MODE, DIGITAL_WRITE, ANALOG_WRITE) for op in ops):
+                return
+            for op in ops:
+                self._execute(*op)
+            answer = bytearray((SUCCESS,))
+        elif com == ANALOG_READ:
+            if 2 * len(args) > LONG_FRAME_MAX:
+                return
+            answer = bytearray()
+            for pin in args:
+                v = self.analogValue(pin, self._now)
+                answer.extend((v & 0xFF, v >> 8))
+        elif com == DIGITAL_READ:
+            answer = bytearray(self.pinState(pin) for pin in args)
+        elif com == READ_SCRATCHPAD and self.version >= 109:
+            if args or not self.snapshot_enabled:
+                return
+            answer = bytearray(self.snapshot_digital.to_bytes(PORT_PINS // 8, "little"))
+            for pin in range(min(self.analog_pins, SNAPSHOT_ANALOG)):
+                answer.extend((self.snapshot_analog[pin] & 0xFF, self.snapshot_analog[pin] >> 8))
+        elif com == RAMP and self.version >= 108:
+            if len(args) < 8 or (len(args) - 4) % 4:
+                return
+            keys = [((args[i] << 8) | args[i + 1], (args[i + 2] << 8) | args[i + 3]) for i in range(4, len(args), 4)]
+            if not self._startRamp(args[0], (args[2] << 8) | args[3], keys, bool(args[1] & 0x01)):
+                return
+            answer = bytearray((SUCCESS,))
+        else:
+            return
+        a = bytearray((len(answer),)) + answer
+        c = crc16(a)
+        a.extend((c & 0xFF, c >> 8))
+        self.send(a)
+
+    def _pipeline(self, cmd):
+        if not (yield from self._checkCRC(cmd, 1)):
+            return
+        n = self.scratchpad[1]
+        if n == 0 or n > PIPELINE_MAX:
+            return
+        frames = []
+        for _ in range(n):
+            com = yield
+            if com not in PIPELINE_ARGUMENTS:
+                return
+            f = bytearray((com,))
+            for _ in range(PIPELINE_ARGUMENTS[com] + 1):
+                f.append((yield))
+            frames.append(f)
+        answer = bytearray()
+        us = 0
+        for f in frames:
+            ok = crc8(f) == 0
+            if f[0] in (DIGITAL_READ, ANALOG_READ):
+                if ok:
+                    if f[0] == ANALOG_READ:
+                        self._setValue(self.analogValue(f[1], self._now))
+                        us += ANALOG_READ_US
+                    else:
+                        self._setValue(self.pinState(f[1]))
+                    self.scratchpad[8] = crc8(self.scratchpad[:8])
+                answer.extend(self.scratchpad if ok else b"\xff" * 9)
+            else:
+                if ok:
+                    self._execute(f[0], f[1], f[2] if f[0] == PIN_MODE else (f[2] << 8) | f[3])
+                answer.extend((SUCCESS, SUCCESS_CRC) if ok else b"\xff\xff")
+            us += COMMAND_US
+        self.sendBit(0, us)
+        self.send(answer)
+
+    def _digitalPins(self, cmd):
+        if (yield from self._checkCRC(cmd, 0)):
+            self.scratchpad[3] = self.digital_pins
+            self._sendScratchpad()
+
+    def _analogPins(self, cmd):
+        if (yield from self._checkCRC(cmd, 0)):
+            self.scratchpad[3] = self.analog_pins
+            self._sendScratchpad()
+
+    def _readVersion(self, cmd):
+        if (yield from self._checkCRC(cmd, 0)):
+            sp = self.scratchpad
+            if self.version >= 103:
+                f = self.features()
+                sp[1] = f & 0xFF
+                sp[2] = f >> 8
+                sp[3] = self.digital_pins
+                sp[6] = self.analog_pins
+                sp[7] = 0
+            self._setValue(self.version)
+            self._sendScratchpad()
+
+
+class SimBus:
+    """
+    Byte and bit level model of a 1-wire bus. Reads are the wired-AND of all talking devices.
+    :param reset_us: duration of a reset/presence cycle
+    :param byte_us: duration of one byte (8 time slots)
+    :param crc_fault_rate: probability that a byte read by the master has a flipped bit
+    :param bus_fault_rate: probability that a reset gets no presence pulse
+    :param seed: seed for the fault injection
+    """
+
+    def __init__(self, clock=None, reset_us=1000, byte_us=600, crc_fault_rate=0.0, bus_fault_rate=0.0, seed=None):
+        self.clock = clock or Clock()
+        self.devices = []
+        self.reset_us = reset_us
+        self.byte_us = byte_us
+        self.crc_fault_rate = crc_fault_rate
+        self.bus_fault_rate = bus_fault_rate
+        self.random = random.Random(seed)
+        self.resets = 0
+        self.bytes = 0
+        self._search = None
+        self._rom_command = False  # next byte written is the rom command
+
+    def attach(self, device):
+        self.devices.append(device)
+        return device
+
+    def detach(self, device):
+        self.devices.remove(device)
+
+    def _tick(self, us):
+        self.clock.advance(us)
+        for d in self.devices:
+            d.update(self.clock)
+
+    def reset(self):
+        self.resets += 1
+        self._tick(self.reset_us)
+        self._search = None
+        self._rom_command = True
+        present = False
+        for d in self.devices:
+            if d.present:
+                d.reset()
+                present = True
+        if present and self.bus_fault_rate and self.random.random() < self.bus_fault_rate:
+            return False
+        return present
+
+    def _active(self):
+        return [d for d in self.devices if d.present]
+
+    def writebyte(self, value):
+        self.bytes += 1
+        self._tick(self.byte_us)
+        rom_command = self._rom_command
+        self._rom_command = False
+        if rom_command and value == SEARCH_ROM:
+            self._search = self._startSearch()
+            return
+        for d in self._active():
+            d.write(value)
+
+    def readbyte(self):
+        self.bytes += 1
+        self._tick(self.byte_us)
+        v = 0xFF
+        for d in self._active():
+            v &= d.read()
+        if self.crc_fault_rate and self.random.random() < self.crc_fault_rate:
+            v ^= 1 << self.random.randrange(8)
+        return v
+
+    # search rom, one bit per call
+
+    def _startSearch(self):
+        return [self._active(), 0, 0]  # participating devices, bit index, read phase  # participating devices, bit index, read phase
+
+    def _bit(self, d, i):
+        return (d.rom[i // 8] >> (i % 8)) & 1
+
+    def readbit(self):
+        self._tick(self.byte_us / 8)
+        if self._search is None:
+            v = 1
+            for d in self._active():
+                v &= d.readBit(self.clock.us)
+            return v
+        devices, i, phase = self._search
+        v = 1
+        for d in devices:
+            b = self._bit(d, i)
+            v &= b if phase == 0 else b ^ 1
+        self._search[2] = 1 - phase
+        return v
+
+    def writebit(self, value):
+        self._tick(self.byte_us / 8)
+        if self._search is None:
+            return
+        devices, i, _ = self._search
+        self._search[0] = [d for d in devices if self._bit(d, i) == value]
+        self._search[1] = i + 1
+        self._search[2] = 0
+
+
+# fake modules
+
+_clock = Clock()
+_buses = {}
+
+
+def _const(value):
+    return value
+
+
+def _sleep_ms(ms):
+    _clock.advance(ms * 1000)
+
+
+def _sleep_us(us):
+    _clock.advance(us)
+
+
+def _ticks_us():
+    return _clock.us
+
+
+def _ticks_ms():
+    return _clock.us // 1000
+
+
+def _ticks_diff(a, b):
+    return a - b
+
+
+def _ticks_add(a, b):
+    return a + b
+
+
+class _Pin:
+    IN = 1
+    OUT = 3
+    OPEN_DRAIN = 7
+    PULL_UP = 2
+    PULL_DOWN = 1
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    def __init__(self, id, *args, **kwargs):
+        self.id = id
+
+    def init(self, *args, **kwargs):
+        pass
+
+
+class OneWireError(Exception):
+    pass
+
+
+class _OneWire:
+    """Port of micropython's onewire.py running on a SimBus instead of the _onewire C module"""
+    SEARCH_ROM = 0xF0
+    MATCH_ROM = 0x55
+    SKIP_ROM = 0xCC
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.pin.init(pin.OPEN_DRAIN, pin.PULL_UP)
+        self._bus = bus(pin.id)
+
+    def reset(self, required=False):
+        reset = self._bus.reset()
+        if required and not reset:
+            raise OneWireError
+        return reset
+
+    def readbit(self):
+        return self._bus.readbit()
+
+    def readbyte(self):
+        return self._bus.readbyte()
+
+    def readinto(self, buf):
+        for i in range(len(buf)):
+            buf[i] = self._bus.readbyte()
+
+    def writebit(self, value):
+        return self._bus.writebit(value)
+
+    def writebyte(self, value):
+        return self._bus.writebyte(value)
+
+    def write(self, buf):
+        for b in buf:
+            self._bus.writebyte(b)
+
+    def select_rom(self, rom):
+        self.reset()
+        self.writebyte(self.MATCH_ROM)
+        self.write(rom)
+
+    def scan(self):
+        devices = []
+        diff = 65
+        rom = False
+        for i in range(0xff):
+            rom, diff = self._search_rom(rom, diff)
+            if rom:
+                devices += [rom]
+            if diff == 0:
+                break
+        return devices
+
+    def _search_rom(self, l_rom, diff):
+        if not self.reset():
+            return None, 0
+        self.writebyte(self.SEARCH_ROM)
+        if not l_rom:
+            l_rom = bytearray(8)
+        rom = bytearray(8)
+        next_diff = 0
+        i = 64
+        for byte in range(8):
+            r_b = 0
+            for bit in range(8):
+                b = self.readbit()
+                if self.readbit():
+                    if b:  # there are no devices or there is an error on the bus
+                        return None, 0
+                else:
+                    if not b:  # collision, two devices with different bit meaning
+                        if diff > i or ((l_rom[byte] & (1 << bit)) and diff != i):
+                            b = 1
+                            next_diff = i
+                self.writebit(b)
+                if b:
+                    r_b |= 1 << bit
+                i -= 1
+            rom[byte] = r_b
+        return rom, next_diff
+
+    def crc8(self, data):
+        return crc8(data)
+
+
+micropython = types.ModuleType("micropython")
+micropython.const = _const
+
+utime = types.ModuleType("utime")
+utime.sleep_ms = _sleep_ms
+utime.sleep_us = _sleep_us
+utime.sleep = lambda s: _sleep_ms(s * 1000)
+utime.ticks_us = _ticks_us
+utime.ticks_ms = _ticks_ms
+utime.ticks_diff = _ticks_diff
+utime.ticks_add = _ticks_add
+
+machine = types.ModuleType("machine")
+machine.Pin = _Pin
+
+onewire = types.ModuleType("onewire")
+onewire.OneWire = _OneWire
+onewire.OneWireError = OneWireError
+
+
+def bus(pin_id, **kwargs) -> SimBus:
+    """
+    Returns the SimBus connected to the pin with the given id, creating it on first use.
+    :param pin_id: id of the machine.Pin the ArduinoControl object will be created with
+    :param kwargs: SimBus arguments, only used when the bus gets created
+    """
+    if pin_id not in _buses:
+        _buses[pin_id] = SimBus(_clock, **kwargs)
+    return _buses[pin_id]
+
+
+def clock() -> Clock:
+    return _clock
+
+
+def install(pin_id=19, **kwargs) -> SimBus:
+    """
+    Register the fake modules so arduinoGPIO can be imported on CPython.
+    :param pin_id: pin id of the bus to return
+    :param kwargs: SimBus arguments
+    :return: SimBus of pin_id
+    """
+    for name, module in (("micropython", micropython), ("utime", utime), ("machine", machine),
+                         ("onewire", onewire)):
+        sys.modules[name] = module
+    return bus(pin_id, **kwargs)
+
+
+def reset():
+    """Remove all buses and reset the clock"""
+    _buses.clear()
+    _clock.us = 0
+
+
+if __name__ == "__main__":
+    # runs the hardware test _testing/arduinoGPIO.py against two simulated devices:
+    # python -m _testing.simulator [crc_fault_rate] [bus_fault_rate]
+    b = install(crc_fault_rate=float(sys.argv[1]) if len(sys.argv) > 1 else 0.0,
+                bus_fault_rate=float(sys.argv[2]) if len(sys.argv) > 2 else 0.0, seed=1)
+    b.attach(SimArduino(unit_id=1))
+    b.attach(SimArduino(unit_id=2, digital_pins=14, analog_pins=8))
+    import _testing.arduinoGPIO
+    print("Virtual time: {!s}ms, resets: {!s}, bytes: {!s}".format(_clock.us // 1000, b.resets, b.bytes))
@@ -2,10 +2,12 @@
 # Copyright Kevin Köck 2019 Released under the MIT license
 # Created on 2019-04-03 
 
-__updated__ = "2019-04-03"
+__updated__ = "2026-10-17"
 __version__ = "0.1"
 
-from .arduinoControl import ArduinoControl
+import utime as time
+from array import array
+from .arduinoControl import ArduinoControl, STREAM_READ_MAX
 
 try:
     from pysmartnode.components.machine.adc import pyADC
@@ -15,10 +17,12 @@ except:
 
 
 class ADC(pyADC):
+    __slots__ = ("_a", "_r", "_p", "_v")
+
     def __init__(self, arduinoControl: ArduinoControl, rom: bytearray, pin, vcc=5):
         """
         machine.ADC compatible object that can be used in any application/library.
-        This class does not need an Arduino object translating between the ArduinoControl object.
+        Used by ArduinoControl.ADC and Arduino.ADC.
         :param arduinoControl: ArduinoControl object
         :param rom: onewire slave id, can be str as it will be converted
         :param pin: pin number
@@ -28,8 +32,8 @@ class ADC(pyADC):
         self._p = pin
         self._v = vcc
         self._a = arduinoControl
-        self._r = rom if type(rom) == bytearray else arduinoControl.str2rom(rom)
-        if arduinoControl.analogPins(rom) < pin:
+        self._r = arduinoControl._key(rom)
+        if pin >= arduinoControl.analogPins(self._r):
             raise AttributeError("Selected pin number higher than available pins")
 
     def __str__(self):
@@ -44,6 +48,46 @@ class ADC(pyADC):
     def read(self):
         return self._a.analogRead(self._r, self._p)
 
+    def readBlock(self, buf, max_samples: int = None) -> int:
+        """
+        Read samples buffered on the device after calling streamStart()
+        :param buf: preallocated array('H') or list
+        :param max_samples: maximum number of samples to read, defaults to len(buf)
+        :return: number of samples stored in buf
+        """
+        return self._a.readBlock(self._r, buf, max_samples)
+
+    def streamStart(self, interval: int):
+        """
+        Start sampling this pin on the device every interval ms.
+        Stops streaming of other pins of the same device.
+        """
+        return self._a.streamStart(self._r, [self._p], interval)
+
+    def streamStop(self):
+        return self._a.streamStop(self._r)
+
+    def stream(self, interval: int, buf=None):
+        """
+        Generator returning the samples of this pin, reading up to len(buf) samples per transaction.
+        If the device had fewer samples buffered, it waits until buf could be filled before the next read
+        instead of polling the bus. Streaming is stopped when the generator is closed.
+        :param interval: sampling interval in ms
+        :param buf: preallocated buffer, defaults to an array('H') of STREAM_READ_MAX
+        """
+        if buf is None:
+            buf = array("H", [0] * STREAM_READ_MAX)
+        self.streamStart(interval)
+        try:
+            while True:
+                n = self.readBlock(buf)
+                for i in range(n):
+                    yield buf[i]
+                if n < len(buf):
+                    time.sleep_ms((len(buf) - n) * interval)
+        finally:
+            self.streamStop()
+
     def atten(self, *args):
         raise NotImplementedError("Arduino ADC doesn't support atten")
 
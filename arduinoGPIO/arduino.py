@@ -2,142 +2,172 @@
 # Copyright Kevin Köck 2019 Released under the MIT license
 # Created on 2019-04-03 
 
-__updated__ = "2019-04-06"
+__updated__ = "2026-10-17"
 __version__ = "0.1"
 
-from .arduinoControl import ArduinoControl
-
-try:
-    from pysmartnode.components.machine.adc import pyADC
-except:
-    pyADC = object
-import machine
+from .arduinoControl import ArduinoControl, ANALOG_READ
+from . import pin as _pin, adc as _adc
 
 
 class Arduino:
     def __init__(self, arduinoControl: ArduinoControl, rom: bytearray):
         self._c = arduinoControl
-        self._r = rom
-        self._dp = arduinoControl.digitalPins(rom)
-        self._ap = arduinoControl.analogPins(rom)
+        self._r = arduinoControl._key(rom)
+        c = arduinoControl.capabilities(rom)
+        self._dp = c[1]
+        self._ap = c[2]
 
     def __str__(self):
         return "Arduino({!s})".format(self._c.rom2str(self._r))
 
     def _checkDpin(self, pin: int):
-        if pin > self._dp:
+        if pin >= self._dp:
             raise AttributeError("Selected pin number higher than available pins")
 
     def _checkApin(self, pin: int):
-        if pin > self._ap:
+        if pin >= self._ap:
             raise AttributeError("Selected pin number higher than available pins")
 
     def clientVersion(self):
         return self._c.clientVersion(self._r)
 
-    def pinMode(self, pin: int, mode: int) -> bool:
+    def pinMode(self, pin: int, mode: int, force=False) -> bool:
         self._checkDpin(pin)
-        return self._c.pinMode(self._r, pin, mode)
+        return self._c.pinMode(self._r, pin, mode, force)
 
-    def digitalWrite(self, pin: int, value: int) -> bool:
+    def digitalWrite(self, pin: int, value: int, force=False) -> bool:
         self._checkDpin(pin)
-        return self._c.digitalWrite(self._r, pin, value)
+        return self._c.digitalWrite(self._r, pin, value, force)
 
-    def digitalRead(self, pin: int) -> int:
+    def digitalRead(self, pin: int, refresh=False) -> int:
         self._checkDpin(pin)
-        return self._c.digitalRead(self._r, pin)
+        return self._c.digitalRead(self._r, pin, refresh)
 
     def analogRead(self, pin: int) -> int:
         self._checkApin(pin)
         return self._c.analogRead(self._r, pin)
 
-    def analogWrite(self, pin: int, duty: int) -> bool:
+    def analogWrite(self, pin: int, duty: int, force=False) -> bool:
         self._checkDpin(pin)
-        return self._c.analogWrite(self._r, pin, duty)
+        return self._c.analogWrite(self._r, pin, duty, force)
 
-    def digitalPins(self) -> int:
-        return self._dp
+    def rampTo(self, pin: int, duty: int, ms: int, start: int = None) -> bool:
+        """
+        Ramp the pwm duty of a pin on the device, see ArduinoControl.rampTo
+        :param pin: pin number
+        :param duty: pwm duty at the end of the ramp
+        :param ms: duration of the ramp in ms
+        :param start: pwm duty at the start, None continues from the current duty
+        :return: True
+        """
+        self._checkDpin(pin)
+        return self._c.rampTo(self._r, pin, duty, ms, start)
 
-    def analogPins(self) -> int:
-        return self._ap
+    def rampSequence(self, pin: int, keyframes: list, repeat=False, start: int = None) -> bool:
+        self._checkDpin(pin)
+        return self._c.rampSequence(self._r, pin, keyframes, repeat, start)
 
-    def Pin(self, pin, *args, **kwargs):
-        return Pin(self, pin, *args, **kwargs)
+    def streamStart(self, pins: list, interval: int) -> bool:
+        for pin in pins:
+            self._checkApin(pin)
+        return self._c.streamStart(self._r, pins, interval)
 
-    def ADC(self, pin, vcc=5):
-        return ADC(self, pin, vcc)
+    def streamStop(self) -> bool:
+        return self._c.streamStop(self._r)
 
+    def readBlock(self, buf, max_samples: int = None) -> int:
+        return self._c.readBlock(self._r, buf, max_samples)
 
-class Pin:
-    """
-    Attempt to make a compatible Pin version to machine.Pin
-    """
-    IN = machine.Pin.IN
-    OUT = machine.Pin.OUT
+    def snapshotStart(self, pins: list = ()) -> bool:
+        for pin in pins:
+            self._checkApin(pin)
+        return self._c.snapshotStart(self._r, pins)
 
-    def __init__(self, arduino: Arduino, pin: int, mode=machine.Pin.OUT, pull=None, value=None, *args, **kwargs):
-        self._a = arduino
-        self._p = pin
-        self.mode(mode)
-        if value is not None:
-            self._a.digitalWrite(pin, value)
-        # no open_drain implemented (but on the client side the passed value will be used).
-        # pullup not implemented
+    def snapshotStop(self) -> bool:
+        return self._c.snapshotStop(self._r)
 
-    def value(self, value: int = None):
-        if value is None:
-            return self._a.digitalRead(self._p)
-        return self._a.digitalWrite(self._p, value)
+    def snapshot(self, buf=None) -> tuple:
+        """
+        Read all digital pins and the sampled analog pins with one transaction, see ArduinoControl.snapshot
+        :param buf: array('H') or list with analogPins() entries for the analog values, allocated if None
+        :return: tuple (bitmask of the digital pins, buf)
+        """
+        return self._c.snapshot(self._r, buf)
+
+    def readPort(self) -> int:
+        return self._c.readPort(self._r)
 
-    def mode(self, mode):
-        self._a.pinMode(self._p, 0 if mode == machine.Pin.OUT else (1 if mode == machine.Pin.IN else mode))
+    def writePort(self, mask: int, values: int) -> bool:
+        return self._c.writePort(self._r, mask, values)
 
-    def __call__(self, value=None):
-        return self.value(value)
+    def watch(self, pins: list) -> bool:
+        mask = 0
+        for pin in pins:
+            self._checkDpin(pin)
+            mask |= 1 << pin
+        return self._c.watch(self._r, mask)
 
-    def on(self):
-        self.value(1)
+    def readChanges(self) -> tuple:
+        return self._c.readChanges(self._r)
 
-    def off(self):
-        self.value(0)
+    def irq(self, pin: int, handler=None, trigger=3, obj=None):
+        self._checkDpin(pin)
+        self._c.irq(self._r, pin, handler, trigger, obj)
 
-    def pull(self, *args, **kwargs):
-        raise NotImplementedError
+    def readPins(self, pins: list) -> list:
+        """
+        Read multiple digital pins with one transaction, see ArduinoControl.digitalReadInto
+        :param pins: list of pin numbers
+        :return: list of values in the order of pins
+        """
+        res = [0] * len(pins)
+        self._c.digitalReadInto(self._r, pins, res)
+        return res
+
+    def writeMany(self, values: list) -> bool:
+        for pin, _ in values:
+            self._checkDpin(pin)
+        return self._c.writeMany(self._r, values)
+
+    def pipeline(self, ops: list) -> list:
+        for com, pin, _ in ops:
+            if com == ANALOG_READ:
+                self._checkApin(pin)
+            else:
+                self._checkDpin(pin)
+        return self._c.pipeline(self._r, ops)
+
+    def batch(self):
+        return self._c.batch(self._r)
 
-    def drive(self, *args, **kwargs):
-        raise NotImplementedError
+    def digitalPins(self) -> int:
+        return self._dp
 
-    def irq(self, *args, **kwargs):
-        raise NotImplementedError
+    def analogPins(self) -> int:
+        return self._ap
 
+    def Pin(self, pin, *args, **kwargs):
+        return Pin(self, pin, *args, **kwargs)
 
-class ADC(pyADC):
-    def __init__(self, arduino: Arduino, pin, vcc=5):
-        """
-        machine.ADC compatible object that can be used in any application/library
-        :param arduino: Arduino object the pin belongs to
-        :param pin: pin number
-        :param vcc: Voltage the arduino is running at to calculate adc voltage
-        """
-        super().__init__()
-        self._p = pin
-        self._v = vcc
-        self._a = arduino
+    def ADC(self, pin, vcc=5):
+        return ADC(self, pin, vcc)
 
-    def __str__(self):
-        return "ArduinoADC({!s})".format(self._p)
 
-    def maxVoltage(self):
-        return self._v  # arduino operating voltage
+class Pin(_pin.Pin):
+    __slots__ = ()
 
-    def readVoltage(self):
-        return self.read() / 1023 * self._v
+    def __init__(self, arduino: Arduino, pin: int, *args, **kwargs):
+        """
+        Pin object of an Arduino, see arduinoGPIO.pin.Pin
+        """
+        super().__init__(arduino._c, arduino._r, pin, *args, **kwargs)
 
-    def read(self):
-        return self._a.analogRead(self._p)
 
-    def atten(self, *args):
-        raise NotImplementedError("Arduino ADC doesn't support atten")
+class ADC(_adc.ADC):
+    __slots__ = ()
 
-    def width(self, *args, **kwargs):
-        raise NotImplementedError("Arduino ADC doesn't support width")
+    def __init__(self, arduino: Arduino, pin, vcc=5):
+        """
+        ADC object of an Arduino, see arduinoGPIO.adc.ADC
+        """
+        super().__init__(arduino._c, arduino._r, pin, vcc)
@@ -2,13 +2,21 @@
 # Copyright Kevin Köck 2019 Released under the MIT license
 # Created on 2019-03-28 
 
-__updated__ = "2019-04-06"
-__version__ = "0.2"
+__updated__ = "2026-10-17"
+__version__ = "0.3"
 
 import onewire
 from micropython import const
 import utime as time
 from machine import Pin
+from array import array
+try:
+    from ubinascii import hexlify, unhexlify
+except ImportError:
+    from binascii import hexlify, unhexlify
+from .stats import BusStats
+from .retry import RetryPolicy
+from .errorLog import ErrorLog
 
 FAMILY_CODE = const(0xC4)
 
@@ -23,29 +31,154 @@ ANALOG_PINS = const(0xBC)
 WRITE_SCRATCHPAD = const(0x4E)
 READ_SCRATCHPAD = const(0xBE)
 READ_VERSION = const(0xCE)
+BATCH = const(0x60)
+READ_PORT = const(0x62)
+WRITE_PORT = const(0x64)
+BROADCAST = const(0x66)
+BROADCAST_STATUS = const(0x68)
+STREAM_START = const(0x6A)
+STREAM_READ = const(0x6C)
+WATCH = const(0x6E)
+READ_CHANGES = const(0x70)
+LONG_FRAME = const(0x72)
+RAMP = const(0x74)
+SNAPSHOT = const(0x76)
+PIPELINE = const(0x78)
+
+
+BATCH_MAX = const(8)  # operations per batch frame, size of the batch buffer on the client
+PORT_PINS = const(56)  # pins covered by port commands, 7 bytes of the scratchpad
+STREAM_READ_MAX = const(16)  # samples per STREAM_READ transaction
+LONG_FRAME_MAX = const(64)  # payload bytes of a long frame or its answer
+LONG_BATCH_MAX = const(15)  # operations per long frame batch
+LONG_READ_MAX = const(32)  # analog pins per long frame read
+RAMP_KEYFRAMES = const(8)  # keyframes of a ramp sequence
+RAMP_CURRENT = const(0xFFFF)  # start duty of a ramp continuing from the current duty of the pin
+SNAPSHOT_ANALOG = const(16)  # analog pins covered by the snapshot
+PIPELINE_MAX = const(7)  # commands per pipeline transaction
+SWEEP_MISSING = const(0xFFFF)  # value of sweep() for pins of devices that were skipped or didn't answer
+FRAME_SIZE = const(68)  # size of the preallocated frame and answer buffers, LONG_FRAME_MAX + 4
+
+# Features reported by READ_VERSION
+FEATURE_BATCH = const(0x0001)
+FEATURE_PORT = const(0x0002)
+FEATURE_BROADCAST = const(0x0004)
+FEATURE_STREAM = const(0x0008)
+FEATURE_WATCH = const(0x0010)
+FEATURE_LONG_FRAME = const(0x0020)
+FEATURE_RAMP = const(0x0040)
+FEATURE_SNAPSHOT = const(0x0080)
+FEATURE_PIPELINE = const(0x0100)
+CAPABILITIES_VERSION = const(103)  # first client version reporting pins and features with READ_VERSION
 
 # Return value
 SUCCESS = const(0xEE)
 
+_OUTPUT = const(1)  # pinMode OUTPUT on the arduino
+
+# Results of a single transaction
+ERROR_NONE = const(0)
+ERROR_ONEWIRE = const(1)
+ERROR_CRC = const(2)
+
+LONG_ANSWER = const(2)  # awaiting_answer value of long frames: answer with length byte and crc16
+PIPELINE_ANSWER = const(3)  # awaiting_answer value of pipelines: ready bit, answers checked by the caller
+_PIPELINE_POLL = const(64)  # read slots waiting for the ready bit of a pipeline, about 4ms
+
+
+def _crc16Table() -> array:
+    t = array("H", [0] * 16)
+    for i in range(16):
+        c = i
+        for _ in range(4):
+            c = (c >> 1) ^ 0xA001 if c & 1 else c >> 1
+        t[i] = c
+    return t
+
+
+_CRC16 = _crc16Table()
+
+_names = {}  # rom key: string, cache of rom2str
+_NAMES_MAX = const(64)
+
+
+def crc16(data, crc=0) -> int:
+    """
+    CRC-16/MAXIM without final inversion as used by long frames. Returns 0 for data including its crc.
+    :param data: buffer
+    :param crc: initial value
+    :return: int
+    """
+    t = _CRC16
+    for b in data:
+        crc = (crc >> 4) ^ t[(crc ^ b) & 0x0F]
+        crc = (crc >> 4) ^ t[(crc ^ (b >> 4)) & 0x0F]
+    return crc
+
 
 class ArduinoControl(onewire.OneWire):
-    def __init__(self, pin: Pin, expected_devices=None):
+    def __init__(self, pin: Pin, expected_devices=None, cache_outputs=False, stats=False, retry: RetryPolicy = None,
+                 errors: ErrorLog = None):
         """
         Class to remotely control an Arduino
         :param pin: Pin object of the onewire connection
-        :param expected_devices: used to warn if devices go missing (filters non-arduino devices)
+        :param expected_devices: number or list of roms (bytes, bytearray or string), used to warn if
+        devices go missing (filters non-arduino devices)
+        :param cache_outputs: remember confirmed pinMode, digitalWrite and analogWrite values and skip
+        writes that wouldn't change anything. Only use if nothing else changes the pins of the devices.
+        :param stats: collect counters and latency histograms of all transactions in self.stats
+        :param retry: RetryPolicy, defaults to 4 attempts with exponential backoff
+        :param errors: ErrorLog collecting error messages in self.errors, defaults to ErrorLog()
         """
-        if type(expected_devices) in (int, list) or expected_devices is None:
+        if type(expected_devices) == list:
+            self._expected_devices = [self._key(rom) for rom in expected_devices]
+        elif type(expected_devices) == int or expected_devices is None:
             self._expected_devices = expected_devices
         else:
             raise TypeError("expected_devices has to be None,int or list")
+        self._caps = {}  # capability cache, rom key: (version, digital pins, analog pins, features)
+        self._shadow = {} if cache_outputs else None  # rom key: {command << 8 | pin: value}
+        self._seq = 0  # sequence number of the last broadcast
+        self.stats = BusStats() if stats else None
+        self.retry = retry or RetryPolicy()
+        self.errors = ErrorLog() if errors is None else errors
+        self._devices = {}  # device registry, rom key: number of consecutive failed pings
+        self._searched = 0  # ticks_ms of the last full search by refresh
+        self._broadcast = None  # (sequence number, ops) of the last broadcast
+        self._watched = {}  # rom key: bitmask of watched pins
+        self._irqs = {}  # rom key: {pin: (handler, trigger, Pin object)}
+        # preallocated buffers and memoryviews of them for commands in the hot path, see _command
+        self._fb = bytearray(FRAME_SIZE)
+        self._ab = bytearray(FRAME_SIZE)
+        self._fv = [None] * (FRAME_SIZE + 1)
+        self._av = [None] * (FRAME_SIZE + 1)
         super().__init__(pin)
 
     def _error(self, message):  # Subclass
-        print(message)
+        self.errors.log(message)
+
+    def _log(self, message, rom=None):
+        # subclasses overriding _error get the rom formatted into the message
+        if type(self)._error is ArduinoControl._error:
+            self.errors.log(message, None if rom is None else self._key(rom))
+        elif rom is None:
+            self._error(message)
+        else:
+            self._error("{!s}: {!s}".format(self.rom2str(rom), message))
 
-    def scan(self):
-        return [rom for rom in super().scan() if rom[0] == FAMILY_CODE and self.crc8(rom) == 0]
+    def _deviceAdded(self, rom: bytes):  # Subclass
+        pass
+
+    def _deviceRemoved(self, rom: bytes):  # Subclass
+        pass
+
+    def scan(self) -> list:
+        """
+        Search the bus for arduino devices
+        :return: list of roms as bytes, usable as keys and without copying them on every command
+        """
+        self._caps.clear()
+        return [bytes(rom) for rom in super().scan() if rom[0] == FAMILY_CODE and self.crc8(rom) == 0]
 
     def scanSafely(self, iter=4, wait=10, raise_on_missing=False) -> list:
         """
@@ -56,6 +189,7 @@ class ArduinoControl(onewire.OneWire):
         :return: list of roms
         """
         roms = []
+        seen = set()
         exp = self._expected_devices
         scan = self.scan
         for _ in range(iter):
@@ -65,22 +199,123 @@ class ArduinoControl(onewire.OneWire):
                     roms = r
                     break
                 # not checking for added devices
-            for rom in r:
-                if rom not in roms:
-                    roms.append(rom)
+            self._collect(r, roms, seen)
             time.sleep_ms(wait)
-        if type(exp) == int and len(roms) < exp:
-            self._error("Missing {!s} devices".format(exp - len(roms)))
-            if raise_on_missing:
-                raise Exception("Missing {!s} devices".format(exp - len(roms)))
-        elif type(exp) == list and len(exp) < len(roms):
-            for d in exp:
-                if d not in roms:
-                    self._error("Missing device {!s}".format(d))
-            if raise_on_missing:
-                raise Exception("Missing {!s} devices".format(len(exp) - len(roms)))
+        self._checkMissing(roms, raise_on_missing)
+        self._merge(roms)
         return roms
 
+    @staticmethod
+    def _collect(found: list, roms: list, seen: set):
+        # add the roms of a search that weren't found before
+        for rom in found:
+            if rom not in seen:
+                seen.add(rom)
+                roms.append(rom)
+
+    def _checkMissing(self, roms: list, raise_on_missing: bool):
+        exp = self._expected_devices
+        if type(exp) == int:
+            missing = exp - len(roms)
+            if missing > 0:
+                self._log("Missing {!s} devices".format(missing))
+        elif type(exp) == list:
+            found = set(roms)
+            missing = 0
+            for d in exp:
+                if d not in found:
+                    self._log("Missing device", d)
+                    missing += 1
+        else:
+            return
+        if missing > 0 and raise_on_missing:
+            raise Exception("Missing {!s} devices".format(missing))
+
+    def devices(self) -> list:
+        """
+        :return: list of roms in the device registry, see refresh
+        """
+        return list(self._devices)
+
+    def ping(self, rom: bytearray) -> bool:
+        """
+        Check if a device answers using a single READ_VERSION transaction without retries.
+        Updates the capability cache of the device.
+        :param rom: selected device
+        :return: True if the device answered
+        """
+        t = time.ticks_us()
+        r = self._view(self._av, self._ab, 9)
+        k = self._key(rom)
+        f = self._commandFrame(READ_VERSION)
+        e = self._transaction(k, f, r)
+        self._record(k, f, t, 1, 1 if e == ERROR_CRC else 0, 1 if e == ERROR_ONEWIRE else 0,
+                     e != ERROR_NONE)
+        if e != ERROR_NONE:
+            return False
+        self.retry.success(k, 1)
+        c = self._capabilities(r)
+        if c[1] is not None:
+            self._caps[k] = c
+        return True
+
+    def refresh(self, scan=False, scan_interval=None, misses=2) -> tuple:
+        """
+        Update the device registry. Known devices are pinged with one transaction each, the bus is only
+        searched if requested, if the registry is empty or if scan_interval passed since the last search.
+        Devices are removed after not answering to misses consecutive pings.
+        _deviceAdded and _deviceRemoved are called for every change.
+        :param scan: search the bus for new devices
+        :param scan_interval: search the bus if the last search is older than scan_interval ms
+        :param misses: failed pings after which a device is removed
+        :return: tuple (list of added roms, list of removed roms)
+        """
+        added, seen = self._merge(self.scan()) if self._scanDue(scan, scan_interval) else ([], ())
+        removed = []
+        for k in list(self._devices):
+            if k in seen or self.ping(k):
+                self._devices[k] = 0
+            elif self._missed(k, misses):
+                removed.append(k)
+        return added, removed
+
+    def _scanDue(self, scan: bool, scan_interval: int) -> bool:
+        return scan or not self._devices or (
+                scan_interval is not None and time.ticks_diff(time.ticks_ms(), self._searched) >= scan_interval)
+
+    def _merge(self, roms: list) -> tuple:
+        """
+        Add the roms found by a search to the registry
+        :return: tuple (list of added roms, set of found roms)
+        """
+        self._searched = time.ticks_ms()
+        added = []
+        seen = set()
+        for rom in roms:
+            k = self._key(rom)
+            seen.add(k)
+            self.retry.success(k, 1)  # answered the search
+            if k not in self._devices:
+                self._devices[k] = 0
+                added.append(k)
+                self._deviceAdded(k)
+        return added, seen
+
+    def _missed(self, k: bytes, misses: int) -> bool:
+        """
+        Count a failed ping, removes the device if it failed misses times
+        :return: True if the device was removed
+        """
+        n = self._devices[k] + 1
+        if n < misses:
+            self._devices[k] = n
+            return False
+        del self._devices[k]
+        self.invalidate(k)
+        self.retry.reset(k)
+        self._deviceRemoved(k)
+        return True
+
     def _sendData(self, rom: bytearray, com, data: bytearray = None, awaiting_answer=True, length_answer=2):
         """
         Helping function for sending data and receiving the answer
@@ -91,6 +326,127 @@ class ArduinoControl(onewire.OneWire):
         :param length_answer: length of expected answer
         :return: bytearray answer or True if no answer expected
         """
+        return self._send(rom, self._frame(com, data), bytearray(length_answer), awaiting_answer)
+
+    def _sendLong(self, rom: bytearray, payload: bytearray, length_answer: int):
+        """
+        Send a long frame: LONG_FRAME, length, payload, crc16 (low byte first).
+        Only supported by devices with FEATURE_LONG_FRAME.
+        :param rom: selected device
+        :param payload: command followed by its arguments, up to LONG_FRAME_MAX bytes
+        :param length_answer: length of the answer payload
+        :return: bytearray answer (length, payload, crc16), payload in answer[1:length_answer + 1]
+        """
+        if len(payload) > LONG_FRAME_MAX:
+            raise AttributeError("Long frames only support {!s} bytes".format(LONG_FRAME_MAX))
+        a = bytearray(2)
+        a[0] = LONG_FRAME
+        a[1] = len(payload)
+        a.extend(payload)
+        c = crc16(a)
+        a.append(c & 0xFF)
+        a.append(c >> 8)
+        return self._send(rom, a, bytearray(length_answer + 3), LONG_ANSWER)
+
+    def _long(self, rom: bytearray, length: int, length_answer: int):
+        """
+        Send a long frame without allocating memory. The payload has to be stored in self._fb[2:length + 2].
+        Not safe to be used by multiple coroutines as the buffers are shared.
+        :return: memoryview of the answer, payload in answer[1:length_answer + 1]
+        """
+        return self._send(rom, self._longFrame(length), self._view(self._av, self._ab, length_answer + 3), LONG_ANSWER)
+
+    def _longFrame(self, length: int) -> memoryview:
+        f = self._fb
+        f[0] = LONG_FRAME
+        f[1] = length
+        c = crc16(self._view(self._fv, f, length + 2))
+        f[length + 2] = c & 0xFF
+        f[length + 3] = c >> 8
+        return self._view(self._fv, f, length + 4)
+
+    def _command(self, rom: bytearray, com, length: int = 0, length_answer=2):
+        """
+        Send a command without allocating memory. The arguments have to be stored in self._fb[1:length + 1].
+        Not safe to be used by multiple coroutines as the buffers are shared.
+        :param rom: selected device or None if only one device is connected
+        :param com: command, byte
+        :param length: number of argument bytes in the frame buffer
+        :param length_answer: length of expected answer
+        :return: memoryview of the answer, only valid until the next command, or True
+        """
+        return self._send(rom, self._commandFrame(com, length), self._view(self._av, self._ab, length_answer))
+
+    def _commandFrame(self, com, length: int = 0) -> memoryview:
+        f = self._fb
+        f[0] = com
+        f[length + 1] = self.crc8(self._view(self._fv, f, length + 1))
+        return self._view(self._fv, f, length + 2)
+
+    @staticmethod
+    def _view(views: list, buf: bytearray, length: int) -> memoryview:
+        v = views[length]
+        if v is None:
+            v = views[length] = memoryview(buf)[:length]
+        return v
+
+    def _send(self, rom: bytearray, a, r, awaiting_answer=True, attempts: int = None):
+        """
+        Send a frame and receive the answer with retries
+        :param rom: selected device or None if only one device is connected
+        :param a: frame including crc
+        :param r: buffer for the answer
+        :param awaiting_answer: bool, if answer is expected
+        :param attempts: number of attempts or None for the number of the RetryPolicy
+        :return: r or True if no answer expected or answer is SUCCESS
+        """
+        t = time.ticks_us()
+        k = None if rom is None else self._key(rom)
+        p = self.retry
+        n = p.attemptsFor(k) if attempts is None else attempts
+        crc = 0
+        ow = 0
+        i = 0
+        while True:
+            e = self._transaction(k, a, r, awaiting_answer)  # normalized rom key, sent after MATCH_ROM
+            i += 1
+            if e == ERROR_NONE:
+                p.success(k, i)
+                self._record(k, a, t, i, crc, ow, False)
+                return self._answer(r, awaiting_answer)
+            if e == ERROR_CRC:
+                self._log("CRC error, retrying", k)
+                crc += 1
+            else:
+                self._log("OneWire error, retrying", k)
+                ow += 1
+            if i >= n:
+                break
+            d = p.delay(i)
+            if p.expired(time.ticks_diff(time.ticks_us(), t), i, d):
+                break
+            time.sleep_ms(d)
+        p.failure(k, i)
+        self._record(k, a, t, i, crc, ow, True)
+        raise self._unavailable(rom)
+
+    def _record(self, key: bytes, a, start: int, attempts: int, crc_errors: int, onewire_errors: int,
+                failed: bool):
+        # long frames are counted under the command in their payload, a pipeline under PIPELINE
+        if self.stats is not None:
+            self.stats.record(key, a[2] if a[0] == LONG_FRAME else a[0], time.ticks_diff(time.ticks_us(), start),
+                              attempts, crc_errors, onewire_errors, failed)
+
+    def _unavailable(self, rom: bytearray) -> Exception:
+        """
+        Called when a device didn't respond after all retries.
+        :return: exception to raise
+        """
+        if rom is not None:
+            self.invalidate(rom)
+        return onewire.OneWireError("Device or bus unavailable")
+
+    def _frame(self, com, data: bytearray = None) -> bytearray:
         a = bytearray(1)
         a[0] = com
         if data is not None:
@@ -98,37 +454,56 @@ class ArduinoControl(onewire.OneWire):
         crc = self.crc8(a)
         a.append(crc)
         if self.crc8(a) != 0:
-            print("CRC error on generation..")
-        r = bytearray(length_answer)
-        for _ in range(4):
-            try:
-                self.reset(True)
-                if rom is None:
-                    self.writebyte(self.SKIP_ROM)
-                else:
-                    self.select_rom(rom)
-                self.write(a)
-                if awaiting_answer is True:
-                    self.readinto(r)
-            except onewire.OneWireError:
-                print("OneWire error, retrying")
-                time.sleep_ms(10)
-                continue
-            if awaiting_answer is True:
-                if self.crc8(r) == 0:
-                    break
-                else:
-                    print("CRC error, retrying")
-                    time.sleep_ms(10)
+            self._log("CRC error on generation..")
+        return a
+
+    def _transaction(self, rom: bytearray, a: bytearray, r: bytearray, awaiting_answer=True) -> int:
+        """
+        Single attempt of sending a frame and receiving the answer, used by _send for every retry.
+        :param rom: selected device or None if only one device is connected
+        :param a: frame including crc
+        :param r: buffer for the answer
+        :param awaiting_answer: bool, if answer is expected, LONG_ANSWER for answers of long frames,
+        PIPELINE_ANSWER for pipelines
+        :return: ERROR_NONE if the answer was received correctly, ERROR_ONEWIRE or ERROR_CRC
+        """
+        try:
+            self.reset(True)
+            if rom is None:
+                self.writebyte(self.SKIP_ROM)
             else:
+                # select_rom would reset the bus a second time
+                self.writebyte(self.MATCH_ROM)
+                self.write(rom)
+            self.write(a)
+            if awaiting_answer == PIPELINE_ANSWER and not self._ready():
+                return ERROR_ONEWIRE
+            if awaiting_answer:
+                self.readinto(r)
+        except onewire.OneWireError:
+            return ERROR_ONEWIRE
+        if awaiting_answer is True:
+            if self.crc8(r) != 0:
+                return ERROR_CRC
+        elif awaiting_answer == LONG_ANSWER:
+            if r[0] != len(r) - 3 or crc16(r) != 0:
+                return ERROR_CRC
+        return ERROR_NONE
+
+    def _ready(self) -> bool:
+        # the device sends a 0 bit once it executed all commands of a pipeline
+        for _ in range(_PIPELINE_POLL):
+            if not self.readbit():
                 return True
-        if self.crc8(r) == 0:
-            # received data correctly
-            if length_answer == 2 and r[0] == SUCCESS:
+        return False
+
+    @staticmethod
+    def _answer(r: bytearray, awaiting_answer=True):
+        if awaiting_answer is True:
+            if len(r) == 2 and r[0] == SUCCESS:
                 return True
             return r
-        else:
-            raise onewire.OneWireError("Device or bus unavailable")
+        return r if awaiting_answer else True
 
     def clientVersion(self, rom: bytearray) -> int:
         """
@@ -136,12 +511,138 @@ class ArduinoControl(onewire.OneWire):
         :param rom: selected device
         :return: int
         """
-        r = self._sendData(rom, READ_VERSION, length_answer=9)
-        return (r[5] << 8) | r[4]
+        return self.capabilities(rom)[0]
+
+    def capabilities(self, rom: bytearray) -> tuple:
+        """
+        Get client version, number of pins and supported features of a device. The values are read
+        with one transaction and cached until the bus is scanned again or the device goes missing.
+        :param rom: selected device
+        :return: tuple (version, digital pins, analog pins, features)
+        """
+        k = self._key(rom)
+        c = self._caps.get(k)
+        if c is None:
+            c = self._capabilities(self._sendData(rom, READ_VERSION, length_answer=9))
+            if c[1] is None:  # old client, no pin numbers in the answer of READ_VERSION
+                c = (c[0], self._sendData(rom, DIGITAL_PINS, length_answer=9)[3],
+                     self._sendData(rom, ANALOG_PINS, length_answer=9)[3], c[3])
+            self._caps[k] = c
+        return c
+
+    @staticmethod
+    def _capabilities(r: bytearray) -> tuple:
+        v = (r[5] << 8) | r[4]
+        if v >= CAPABILITIES_VERSION:
+            return v, r[3], r[6], (r[2] << 8) | r[1]
+        return v, None, None, (FEATURE_BATCH if v >= 101 else 0) | (FEATURE_PORT if v >= 102 else 0)
+
+    def hasFeature(self, rom: bytearray, feature: int) -> bool:
+        return bool(self.capabilities(rom)[3] & feature)
+
+    def _require(self, rom: bytearray, feature: int, name: str):
+        """
+        Raise NotImplementedError without sending the command if the device doesn't support the feature
+        """
+        if not self.hasFeature(rom, feature):
+            self._unsupported(rom, name)
+
+    def _unsupported(self, rom: bytearray, name: str):
+        raise NotImplementedError("{!s} doesn't support {!s} (version {!s})".format(
+            self.rom2str(self._key(rom)), name, self._caps[self._key(rom)][0]))
+
+    def invalidate(self, rom: bytearray = None):
+        """
+        Remove a device from the capability and output cache
+        :param rom: selected device or None to clear the caches
+        """
+        if rom is None:
+            self._caps.clear()
+            if self._shadow is not None:
+                self._shadow.clear()
+        else:
+            k = self._key(rom)
+            self._caps.pop(k, None)
+            if self._shadow is not None:
+                self._shadow.pop(k, None)
+
+    def _isCached(self, rom: bytearray, com, pin: int, value: int) -> bool:
+        """
+        Check if a write would not change the last confirmed value
+        """
+        if self._shadow is None:
+            return False
+        d = self._shadow.get(self._key(rom))
+        if d is None:
+            return False
+        if com == DIGITAL_WRITE:
+            value = 1 if value else 0
+        return d.get((com << 8) | pin) == value
+
+    def _remember(self, rom: bytearray, com, pin: int, value: int):
+        """
+        Store a confirmed write in the output cache
+        """
+        if self._shadow is None:
+            return
+        k = self._key(rom)
+        d = self._shadow.get(k)
+        if d is None:
+            d = self._shadow[k] = {}
+        if com == PIN_MODE:
+            # output state after changing the mode is not known for sure
+            d.pop((DIGITAL_WRITE << 8) | pin, None)
+            d.pop((ANALOG_WRITE << 8) | pin, None)
+        elif com == DIGITAL_WRITE:
+            value = 1 if value else 0
+            d.pop((ANALOG_WRITE << 8) | pin, None)
+        else:
+            d.pop((DIGITAL_WRITE << 8) | pin, None)
+        d[(com << 8) | pin] = value
+
+    def _cachedOutput(self, rom: bytearray, pin: int):
+        """
+        :return: last written value of a pin in OUTPUT mode or None if not known
+        """
+        if self._shadow is None:
+            return None
+        d = self._shadow.get(self._key(rom))
+        if d is None or d.get((PIN_MODE << 8) | pin) != _OUTPUT:
+            return None
+        return d.get((DIGITAL_WRITE << 8) | pin)
+
+    def _uncachedPort(self, rom: bytearray, mask: int, values: int) -> int:
+        """
+        :return: mask without the pins already having the requested output value
+        """
+        if self._shadow is None:
+            return mask
+        d = self._shadow.get(self._key(rom))
+        if d is None:
+            return mask
+        m = mask
+        pin = 0
+        while m:
+            if m & 1 and d.get((DIGITAL_WRITE << 8) | pin) == (values >> pin) & 1:
+                mask &= ~(1 << pin)
+            m >>= 1
+            pin += 1
+        return mask
+
+    def _rememberPort(self, rom: bytearray, mask: int, values: int):
+        if self._shadow is None:
+            return
+        pin = 0
+        while mask:
+            if mask & 1:
+                self._remember(rom, DIGITAL_WRITE, pin, (values >> pin) & 1)
+            mask >>= 1
+            pin += 1
 
     def readScratchpad(self, rom: bytearray) -> bytearray:
         """
-        read the temporary buffer of the connect arduino. Of not much use actually.
+        read the temporary buffer of the connect arduino. Of not much use actually, see snapshot()
+        for reading all pins with READ_SCRATCHPAD.
         :param rom: selected device
         :return: bytearray
         """
@@ -158,45 +659,65 @@ class ArduinoControl(onewire.OneWire):
             raise AttributeError("Data has to be length 7")
         return self._sendData(rom, WRITE_SCRATCHPAD, data)
 
-    def pinMode(self, rom: bytearray, pin: int, mode: int) -> bool:
+    def pinMode(self, rom: bytearray, pin: int, mode: int, force=False) -> bool:
         """
         set the pinMode of the arduino. Be careful, pinMode is the mode on the arduino, NOT the
         micropython pinMode!
         :param rom: selected device
         :param pin: pin number
         :param mode: pinMode of the arduino pin, does NOT correspond to micropython machine.Pin values
+        :param force: send even if the output cache has the same mode
         :return: True
         """
-        a = bytearray(2)
-        a[0] = pin
-        a[1] = mode
-        return self._sendData(rom, PIN_MODE, a)
+        if not force and self._isCached(rom, PIN_MODE, pin, mode):
+            return True
+        r = self._command(rom, PIN_MODE, self._writeArgs(self._fb, PIN_MODE, pin, mode))
+        self._remember(rom, PIN_MODE, pin, mode)
+        return r
 
-    def digitalWrite(self, rom: bytearray, pin: int, value: int) -> bool:
+    def digitalWrite(self, rom: bytearray, pin: int, value: int, force=False) -> bool:
         """
         Set pin output to HIGH or LOW.
         :param rom: selected device
         :param pin: pin number
         :param value: 1 or 0
+        :param force: send even if the output cache has the same value
         :return: True
         """
-        a = bytearray(3)
-        a[0] = pin
-        a[1] = value >> 8
-        a[2] = value & 0xFF
-        return self._sendData(rom, DIGITAL_WRITE, a)
+        if not force and self._isCached(rom, DIGITAL_WRITE, pin, value):
+            return True
+        r = self._command(rom, DIGITAL_WRITE, self._writeArgs(self._fb, DIGITAL_WRITE, pin, value))
+        self._remember(rom, DIGITAL_WRITE, pin, value)
+        return r
 
-    def digitalRead(self, rom: bytearray, pin: int) -> int:
+    @staticmethod
+    def _writeArgs(f, com, pin: int, value: int) -> int:
+        """
+        Encode the arguments of PIN_MODE, DIGITAL_WRITE and ANALOG_WRITE into f[1:]
+        :return: number of argument bytes
+        """
+        f[1] = pin
+        if com == PIN_MODE:
+            f[2] = value
+            return 2
+        f[2] = value >> 8
+        f[3] = value & 0xFF
+        return 3
+
+    def digitalRead(self, rom: bytearray, pin: int, refresh=False) -> int:
         """
         Read a digital pin
         :param rom: selected device
         :param pin: pin number
+        :param refresh: read from the device even if the output cache knows the value of an OUTPUT pin
         :return: int, 0 or 1
         """
-        a = bytearray(1)
-        a[0] = pin
-        r = self._sendData(rom, DIGITAL_READ, a, length_answer=9)
-        return (r[5] << 8) | r[4]
+        if not refresh:
+            v = self._cachedOutput(rom, pin)
+            if v is not None:
+                return v
+        self._fb[1] = pin
+        return self._value(self._command(rom, DIGITAL_READ, 1, 9))
 
     def analogRead(self, rom: bytearray, pin: int) -> int:
         """
@@ -205,24 +726,757 @@ class ArduinoControl(onewire.OneWire):
         :param pin: pin number
         :return:
         """
-        a = bytearray(1)
-        a[0] = pin
-        r = self._sendData(rom, ANALOG_READ, a, length_answer=9)
+        self._fb[1] = pin
+        return self._value(self._command(rom, ANALOG_READ, 1, 9))
+
+    @staticmethod
+    def _value(r) -> int:
+        # value of a read command in the scratchpad
         return (r[5] << 8) | r[4]
 
-    def analogWrite(self, rom: bytearray, pin: int, duty: int) -> bool:
+    def analogReadInto(self, rom: bytearray, pins, buf, offset: int = 0) -> int:
+        """
+        Read multiple analog pins into a preallocated buffer without allocating memory
+        :param rom: selected device
+        :param pins: list or bytearray of pin numbers
+        :param buf: array('H'), list or any buffer with at least offset + len(pins) entries
+        :param offset: index of buf to store the first value at
+        :return: number of values read
+        """
+        n = len(pins)
+        if n > 1 and self.hasFeature(rom, FEATURE_LONG_FRAME):
+            # up to LONG_READ_MAX pins per transaction
+            for i in range(0, n, LONG_READ_MAX):
+                m = self._analogArgs(self._fb, pins, i)
+                self._analogValues(self._long(rom, m + 1, 2 * m), buf, offset + i, m)
+            return n
+        for i in range(n):
+            self._fb[1] = pins[i]
+            buf[offset + i] = self._value(self._command(rom, ANALOG_READ, 1, 9))
+        return n
+
+    @staticmethod
+    def _analogArgs(f, pins, i: int) -> int:
+        """
+        Encode a long frame reading up to LONG_READ_MAX analog pins starting at pins[i] into f[2:]
+        :return: number of pins
+        """
+        m = min(len(pins) - i, LONG_READ_MAX)
+        f[2] = ANALOG_READ
+        for j in range(m):
+            f[3 + j] = pins[i + j]
+        return m
+
+    @staticmethod
+    def _analogValues(r, buf, offset: int, m: int):
+        for j in range(m):
+            buf[offset + j] = (r[2 + 2 * j] << 8) | r[1 + 2 * j]
+
+    def digitalReadInto(self, rom: bytearray, pins, buf, offset: int = 0) -> int:
+        """
+        Read multiple digital pins with one transaction into a preallocated buffer.
+        Devices without FEATURE_PORT are read with one digitalRead per pin.
+        :param rom: selected device
+        :param pins: list or bytearray of pin numbers
+        :param buf: bytearray, array or list with at least offset + len(pins) entries
+        :param offset: index of buf to store the first value at
+        :return: number of values read
+        """
+        if not self.hasFeature(rom, FEATURE_PORT):
+            for i in range(len(pins)):
+                buf[offset + i] = self.digitalRead(rom, pins[i], True)
+            return len(pins)
+        return self._portValues(self._command(rom, READ_PORT, 0, 9), pins, buf, offset)
+
+    @staticmethod
+    def _portValues(r, pins, buf, offset: int) -> int:
+        for i in range(len(pins)):
+            p = pins[i]
+            buf[offset + i] = (r[1 + (p >> 3)] >> (p & 7)) & 1
+        return len(pins)
+
+    def sweep(self, spec, buf=None):
+        """
+        Read pins of many devices into one flat buffer. Every device gets one READ_PORT transaction
+        for its digital pins and one long frame for up to LONG_READ_MAX analog pins, older clients
+        one transaction per pin. Devices failing repeatedly (see RetryPolicy.fail_fast) are skipped,
+        once every RetryPolicy.probe ms they get one attempt until they answer again. Pins of skipped
+        devices and of devices not answering are set to SWEEP_MISSING instead of raising an exception.
+        :param spec: list of tuples (rom, digital pins, analog pins) or dict rom: (digital pins, analog pins)
+        :param buf: array('H') or list with at least sweepSize(spec) entries, allocated if None
+        :return: buf, per device in the order of spec the values of its digital pins followed by its analog pins
+        """
+        if buf is None:
+            buf = array("H", [0] * self.sweepSize(spec))
+        i = 0
+        for rom, dpins, apins in self._sweepItems(spec):
+            n = len(dpins) + len(apins)
+            if self.retry.failing(self._key(rom)) or not self._sweepDevice(rom, dpins, apins, buf, i):
+                for j in range(i, i + n):
+                    buf[j] = SWEEP_MISSING
+            i += n
+        return buf
+
+    def _sweepDevice(self, rom: bytearray, dpins, apins, buf, offset: int) -> bool:
+        try:
+            if dpins:
+                self.digitalReadInto(rom, dpins, buf, offset)
+            if apins:
+                self.analogReadInto(rom, apins, buf, offset + len(dpins))
+        except onewire.OneWireError:
+            return False
+        return True
+
+    @staticmethod
+    def _sweepItems(spec):
+        if type(spec) == dict:
+            return ((rom, spec[rom][0], spec[rom][1]) for rom in spec)
+        return spec
+
+    @classmethod
+    def sweepSize(cls, spec) -> int:
+        """
+        :param spec: see sweep
+        :return: number of values returned by sweep
+        """
+        n = 0
+        for _, dpins, apins in cls._sweepItems(spec):
+            n += len(dpins) + len(apins)
+        return n
+
+    def analogWrite(self, rom: bytearray, pin: int, duty: int, force=False) -> bool:
         """
         Write pwm mode
         :param rom: selected device
         :param pin: pin number
         :param duty: pwm duty
+        :param force: send even if the output cache has the same duty
+        :return: True
+        """
+        if not force and self._isCached(rom, ANALOG_WRITE, pin, duty):
+            return True
+        r = self._command(rom, ANALOG_WRITE, self._writeArgs(self._fb, ANALOG_WRITE, pin, duty))
+        self._remember(rom, ANALOG_WRITE, pin, duty)
+        return r
+
+    def rampTo(self, rom: bytearray, pin: int, duty: int, ms: int, start: int = None) -> bool:
+        """
+        Ramp the pwm duty of a pin linearly on the device. The device keeps writing the duty until
+        the ramp is finished, a pinMode, digitalWrite or analogWrite of the pin stops the ramp.
+        :param rom: selected device
+        :param pin: pin number
+        :param duty: pwm duty at the end of the ramp
+        :param ms: duration of the ramp in ms, up to 65535
+        :param start: pwm duty at the start of the ramp, None continues from the last duty written by
+        analogWrite or a ramp
+        :return: True
+        :raises NotImplementedError: if the device doesn't support FEATURE_RAMP
+        """
+        self._require(rom, FEATURE_RAMP, "rampTo")
+        r = self._command(rom, RAMP, self._rampArgs(self._fb, pin, duty, ms, start))
+        self._unknown(rom, pin)
+        return r
+
+    @staticmethod
+    def _rampArgs(f, pin: int, duty: int, ms: int, start: int) -> int:
+        if start is None:
+            start = RAMP_CURRENT
+        f[1] = pin
+        f[2] = start >> 8
+        f[3] = start & 0xFF
+        f[4] = duty >> 8
+        f[5] = duty & 0xFF
+        f[6] = ms >> 8
+        f[7] = ms & 0xFF
+        return 7
+
+    def rampSequence(self, rom: bytearray, pin: int, keyframes: list, repeat=False, start: int = None) -> bool:
+        """
+        Run a sequence of ramps on the device, uploaded with one long frame. Up to RAMP_KEYFRAMES keyframes.
+        Needs FEATURE_RAMP.
+        :param rom: selected device
+        :param pin: pin number
+        :param keyframes: list of tuples (duty, ms), each ramping from the previous duty to duty in ms
+        :param repeat: restart with the first keyframe after the last one until the ramp is stopped
+        :param start: pwm duty at the start of the sequence, None continues from the current duty
+        :return: True
+        :raises NotImplementedError: if the device doesn't support FEATURE_RAMP
+        """
+        self._require(rom, FEATURE_RAMP, "rampSequence")
+        r = self._sendLong(rom, self._rampFrame(pin, keyframes, repeat, start), 1)
+        self._unknown(rom, pin)
+        return r
+
+    @staticmethod
+    def _rampFrame(pin: int, keyframes: list, repeat: bool, start: int) -> bytearray:
+        """
+        Encode a ramp sequence as payload of a long frame
+        :return: bytearray
+        """
+        if not 0 < len(keyframes) <= RAMP_KEYFRAMES:
+            raise AttributeError("Ramps support 1 to {!s} keyframes".format(RAMP_KEYFRAMES))
+        if repeat and sum(ms for _, ms in keyframes) == 0:
+            raise AttributeError("Repeated ramps need a duration")
+        if start is None:
+            start = RAMP_CURRENT
+        a = bytearray(5 + 4 * len(keyframes))
+        a[0] = RAMP
+        a[1] = pin
+        a[2] = 0x01 if repeat else 0
+        a[3] = start >> 8
+        a[4] = start & 0xFF
+        j = 5
+        for duty, ms in keyframes:
+            a[j] = duty >> 8
+            a[j + 1] = duty & 0xFF
+            a[j + 2] = ms >> 8
+            a[j + 3] = ms & 0xFF
+            j += 4
+        return a
+
+    def _unknown(self, rom: bytearray, pin: int):
+        """
+        Remove the outputs of a pin changed by the device itself from the output cache
+        """
+        if self._shadow is None:
+            return
+        d = self._shadow.get(self._key(rom))
+        if d is not None:
+            d.pop((DIGITAL_WRITE << 8) | pin, None)
+            d.pop((ANALOG_WRITE << 8) | pin, None)
+
+    def writeBatch(self, rom: bytearray, ops: list) -> bool:
+        """
+        Execute several write operations in one transaction. Operations are executed in order and
+        only if the whole frame was received correctly. More than BATCH_MAX operations are split
+        into multiple transactions, devices supporting long frames get up to LONG_BATCH_MAX
+        operations per transaction. Batches are always sent, the output cache gets updated.
+        Devices without FEATURE_BATCH get one command per operation, executed up to the first failing one.
+        :param rom: selected device
+        :param ops: list of tuples (command, pin, value), command being PIN_MODE, DIGITAL_WRITE or ANALOG_WRITE
+        :return: True
+        """
+        if ops and not self.hasFeature(rom, FEATURE_BATCH):
+            for op in ops:
+                self._single(rom, op)
+            return True
+        long = self._longBatch(len(ops)) and self.hasFeature(rom, FEATURE_LONG_FRAME)
+        n = LONG_BATCH_MAX if long else BATCH_MAX
+        for i in range(0, len(ops), n):
+            chunk = ops[i:i + n]
+            if long:
+                self._sendLong(rom, self._batchFrame(chunk, BATCH, LONG_BATCH_MAX), 1)
+            else:
+                self._sendData(rom, BATCH, self._batchFrame(chunk))
+            for com, pin, value in chunk:
+                self._remember(rom, com, pin, value)
+        return True
+
+    @staticmethod
+    def _longBatch(n: int) -> bool:
+        # long frames are only used if they need less transactions
+        return (n + BATCH_MAX - 1) // BATCH_MAX > (n + LONG_BATCH_MAX - 1) // LONG_BATCH_MAX
+
+    @staticmethod
+    def _batchFrame(ops: list, prefix: int = None, limit: int = BATCH_MAX) -> bytearray:
+        """
+        Encode up to BATCH_MAX operations as payload of BATCH and BROADCAST
+        :param ops: list of tuples (command, pin, value)
+        :param prefix: byte sent before the operations, e.g. the sequence number of a broadcast
+        :param limit: maximum number of operations, LONG_BATCH_MAX for long frames
+        :return: bytearray
+        """
+        if len(ops) > limit:
+            raise AttributeError("Only {!s} operations per frame supported".format(limit))
+        j = 0 if prefix is None else 1
+        a = bytearray(j + 1 + 4 * len(ops))
+        if prefix is not None:
+            a[0] = prefix
+        a[j] = len(ops)
+        j += 1
+        for com, pin, value in ops:
+            if com not in (PIN_MODE, DIGITAL_WRITE, ANALOG_WRITE):
+                raise AttributeError("Command {!s} not supported in batch".format(com))
+            a[j] = com
+            a[j + 1] = pin
+            a[j + 2] = value >> 8
+            a[j + 3] = value & 0xFF
+            j += 4
+        return a
+
+    def pipeline(self, rom: bytearray, ops: list) -> list:
+        """
+        Execute pin commands with one transaction per PIPELINE_MAX commands. The device receives all
+        commands of a transaction, executes them in order and sends all answers together, each with
+        its own crc. A failing transaction is retried as usual, commands with a wrong answer are
+        repeated in further transactions with a single attempt each, up to RetryPolicy.attemptsFor()
+        times. Devices without FEATURE_PIPELINE get one transaction per command.
+        Commands are always sent, the output cache gets updated.
+        :param rom: selected device
+        :param ops: list of tuples (command, pin, value), command being PIN_MODE, DIGITAL_WRITE,
+        ANALOG_WRITE, DIGITAL_READ or ANALOG_READ, the value of reads is ignored
+        :return: list of results in the order of ops: True for writes, the value for reads and
+        None for commands that didn't get a correct answer
+        """
+        res = [None] * len(ops)
+        try:
+            pipelined = self.hasFeature(rom, FEATURE_PIPELINE)
+        except onewire.OneWireError:
+            return res
+        if not pipelined:
+            for i, op in enumerate(ops):
+                try:
+                    res[i] = self._single(rom, op)
+                except onewire.OneWireError:
+                    pass
+            return res
+        todo = list(range(len(ops)))
+        attempts = None  # the first round gets the usual retries
+        for _ in range(self.retry.attemptsFor(self._key(rom))):
+            failed = []
+            for i in range(0, len(todo), PIPELINE_MAX):
+                chunk = todo[i:i + PIPELINE_MAX]
+                a, length = self._pipelineFrame(ops, chunk)
+                try:
+                    r = self._send(rom, a, bytearray(length), PIPELINE_ANSWER, attempts)
+                except onewire.OneWireError:
+                    continue  # the results of the chunk stay None
+                failed += self._pipelineAnswers(rom, ops, chunk, r, res)
+            todo = failed
+            if not todo:
+                break
+            attempts = 1
+        return res
+
+    def _single(self, rom: bytearray, op: tuple):
+        com, pin, value = op
+        if com == PIN_MODE:
+            return self.pinMode(rom, pin, value, True)
+        if com == DIGITAL_WRITE:
+            return self.digitalWrite(rom, pin, value, True)
+        if com == ANALOG_WRITE:
+            return self.analogWrite(rom, pin, value, True)
+        if com == DIGITAL_READ:
+            return self.digitalRead(rom, pin, True)
+        return self.analogRead(rom, pin)
+
+    def _pipelineFrame(self, ops: list, chunk: list) -> tuple:
+        """
+        Encode the commands of a pipeline: PIPELINE, count, crc8, then every command as its usual frame
+        :param ops: list of tuples (command, pin, value)
+        :param chunk: indexes of the ops to send
+        :return: tuple (bytearray frame, length of the answer)
+        """
+        a = self._frame(PIPELINE, bytearray((len(chunk),)))
+        length = 0
+        for i in chunk:
+            com, pin, value = ops[i]
+            if com == PIN_MODE:
+                a.extend(self._frame(com, bytearray((pin, value))))
+                length += 2
+            elif com in (DIGITAL_WRITE, ANALOG_WRITE):
+                a.extend(self._frame(com, bytearray((pin, value >> 8, value & 0xFF))))
+                length += 2
+            elif com in (DIGITAL_READ, ANALOG_READ):
+                a.extend(self._frame(com, bytearray((pin,))))
+                length += 9
+            else:
+                raise AttributeError("Command {!s} not supported in pipeline".format(com))
+        return a, length
+
+    def _pipelineAnswers(self, rom: bytearray, ops: list, chunk: list, r: bytearray, res: list) -> list:
+        """
+        Check the answer of every command of a pipeline and store the results
+        :return: list of indexes of the ops that failed
+        """
+        failed = []
+        j = 0
+        for i in chunk:
+            com, pin, value = ops[i]
+            n = 9 if com in (DIGITAL_READ, ANALOG_READ) else 2
+            v = memoryview(r)[j:j + n]
+            j += n
+            if self.crc8(v) != 0:
+                failed.append(i)
+            elif n == 9:
+                res[i] = self._value(v)
+            elif v[0] == SUCCESS:
+                res[i] = True
+                self._remember(rom, com, pin, value)
+            else:
+                failed.append(i)
+        if failed:
+            self._log("Pipeline: {!s} of {!s} commands failed".format(len(failed), len(chunk)), rom)
+        return failed
+
+    def broadcast(self, ops: list, roms: list = None) -> int:
+        """
+        Execute write operations on all devices on the bus at the same time with one transaction.
+        Devices don't acknowledge a broadcast but remember its sequence number which can be checked
+        with verifyBroadcast(). If roms are given, the broadcast is verified and sent to devices that
+        missed it individually. Devices not answering are skipped and returned.
+        :param ops: list of up to BATCH_MAX tuples (command, pin, value), see writeBatch
+        :param roms: list of devices that should have received the broadcast or None
+        :return: sequence number of the broadcast, if roms are given a tuple
+        (sequence number, list of devices that missed the broadcast and could not be repaired)
+        """
+        self._seq = self._seq % 255 + 1  # 1..255, devices start with 0 after a reboot
+        a = self._batchFrame(ops, self._seq)
+        self._forget(ops)
+        self._sendData(None, BROADCAST, a, awaiting_answer=False)
+        self._broadcast = (self._seq, ops)
+        if roms is None:
+            return self._seq
+        failed = []
+        for rom in self.verifyBroadcast(roms, self._seq):
+            try:
+                self.writeBatch(rom, ops)
+            except onewire.OneWireError:
+                failed.append(rom)
+        return self._seq, failed
+
+    def verifyBroadcast(self, roms: list, seq: int) -> list:
+        """
+        Check which devices executed a broadcast, one transaction per device.
+        :param roms: list of devices to check
+        :param seq: sequence number returned by broadcast()
+        :return: list of devices that did not execute the broadcast
+        """
+        missed = []
+        for rom in roms:
+            try:
+                if not self.hasFeature(rom, FEATURE_BROADCAST):
+                    missed.append(rom)
+                    continue
+                r = self._command(rom, BROADCAST_STATUS, 0, 9)
+            except onewire.OneWireError:
+                missed.append(rom)
+                continue
+            if r[3] == seq:
+                self._rememberBroadcast(rom, seq)
+            else:
+                missed.append(rom)
+        return missed
+
+    def _forget(self, ops: list):
+        """
+        Remove pins written by an unconfirmed broadcast from the output cache of all devices
+        """
+        if self._shadow is None:
+            return
+        for d in self._shadow.values():
+            for com, pin, _ in ops:
+                d.pop((com << 8) | pin, None)
+                d.pop((DIGITAL_WRITE << 8) | pin, None)
+                d.pop((ANALOG_WRITE << 8) | pin, None)
+
+    def _rememberBroadcast(self, rom: bytearray, seq: int):
+        if self._broadcast is not None and self._broadcast[0] == seq:
+            for com, pin, value in self._broadcast[1]:
+                self._remember(rom, com, pin, value)
+
+    def writeMany(self, rom: bytearray, values: list) -> bool:
+        """
+        Set multiple pin outputs in one transaction.
+        :param rom: selected device
+        :param values: list of tuples (pin, value)
         :return: True
         """
-        a = bytearray(3)
-        a[0] = pin
-        a[1] = duty >> 8
-        a[2] = duty & 0xFF
-        return self._sendData(rom, ANALOG_WRITE, a)
+        return self.writeBatch(rom, [(DIGITAL_WRITE, pin, value) for pin, value in values])
+
+    def batch(self, rom: bytearray):
+        """
+        Returns a Batch object collecting pinMode, digitalWrite and analogWrite calls that are
+        sent in one transaction when used as a context manager or when calling send().
+        :param rom: selected device
+        :return: Batch
+        """
+        return Batch(self, rom)
+
+    def streamStart(self, rom: bytearray, pins: list, interval: int) -> bool:
+        """
+        Start sampling analog pins on the device into its ring buffer. Samples are read with readBlock().
+        If the buffer is full, the oldest samples are dropped.
+        :param rom: selected device
+        :param pins: list of analog pin numbers, sampled in ascending order
+        :param interval: sampling interval in ms, 0 for as fast as possible
+        :return: True
+        """
+        return self._command(rom, STREAM_START, self._streamArgs(self._fb, pins, interval))
+
+    @staticmethod
+    def _pinMask(pins) -> int:
+        mask = 0
+        for pin in pins:
+            mask |= 1 << pin
+        return mask
+
+    @classmethod
+    def _streamArgs(cls, f, pins, interval: int) -> int:
+        mask = cls._pinMask(pins)
+        f[1] = mask & 0xFF
+        f[2] = mask >> 8
+        f[3] = interval >> 8
+        f[4] = interval & 0xFF
+        return 4
+
+    def streamStop(self, rom: bytearray) -> bool:
+        """
+        Stop sampling and clear the buffer of the device
+        :param rom: selected device
+        :return: True
+        """
+        return self.streamStart(rom, [], 0)
+
+    def readBlock(self, rom: bytearray, buf, max_samples: int = None) -> int:
+        """
+        Read buffered samples of streamStart(). The samples of all pins are interleaved in ascending pin order,
+        a block always contains complete sets of samples.
+        :param rom: selected device
+        :param buf: array('H') or list to store the samples in
+        :param max_samples: maximum number of samples to read, defaults to len(buf)
+        :return: number of samples stored in buf
+        """
+        n = len(buf) if max_samples is None else min(max_samples, len(buf))
+        i = 0
+        while i < n:
+            m = self._fb[1] = min(n - i, STREAM_READ_MAX)
+            r = self._command(rom, STREAM_READ, 1, 2 + 2 * m + 1)
+            i += self._streamValues(rom, r, buf, i)
+            if r[0] == 0 or not r[1] & 0x02:
+                break  # buffer of the device is empty or buf has no room for a complete set
+        return i
+
+    def _streamValues(self, rom: bytearray, r, buf, i: int) -> int:
+        """
+        Store the samples of a STREAM_READ answer in buf[i:]
+        :return: number of samples
+        """
+        if r[1] & 0x01:
+            self._log("Stream buffer overflow", rom)
+        for j in range(r[0]):
+            buf[i + j] = (r[3 + 2 * j] << 8) | r[2 + 2 * j]
+        return r[0]
+
+    def snapshotStart(self, rom: bytearray, pins: list = ()) -> bool:
+        """
+        Keep a snapshot of all digital pins and of analog pins on the device, read with snapshot().
+        The digital pins are refreshed in every loop of the sketch, the analog pins one per loop.
+        :param rom: selected device
+        :param pins: list of analog pin numbers to sample
+        :return: True
+        :raises NotImplementedError: if the device doesn't support FEATURE_SNAPSHOT
+        """
+        self._require(rom, FEATURE_SNAPSHOT, "snapshotStart")
+        return self._command(rom, SNAPSHOT, self._snapshotArgs(self._fb, pins, True))
+
+    def snapshotStop(self, rom: bytearray) -> bool:
+        """
+        Stop refreshing the snapshot on the device
+        :param rom: selected device
+        :return: True
+        :raises NotImplementedError: if the device doesn't support FEATURE_SNAPSHOT
+        """
+        self._require(rom, FEATURE_SNAPSHOT, "snapshotStop")
+        return self._command(rom, SNAPSHOT, self._snapshotArgs(self._fb, (), False))
+
+    @classmethod
+    def _snapshotArgs(cls, f, pins, enable: bool) -> int:
+        mask = cls._pinMask(pins)
+        f[1] = mask & 0xFF
+        f[2] = mask >> 8
+        f[3] = 0x01 if enable else 0
+        return 3
+
+    def snapshot(self, rom: bytearray, buf=None) -> tuple:
+        """
+        Read the snapshot started with snapshotStart() with one transaction. The device only copies
+        the values, nothing is measured while answering.
+        :param rom: selected device
+        :param buf: array('H') or list for the analog values indexed by pin number with at least
+        analogPins() entries, allocated if None. Pins not sampled are 0.
+        :return: tuple (bitmask of the digital pins, buf)
+        :raises NotImplementedError: if the device doesn't support FEATURE_SNAPSHOT
+        """
+        self._require(rom, FEATURE_SNAPSHOT, "snapshot")
+        n = min(self.capabilities(rom)[2], SNAPSHOT_ANALOG)
+        if buf is None:
+            buf = array("H", [0] * n)
+        self._fb[2] = READ_SCRATCHPAD
+        return self._snapshotValues(self._long(rom, 1, PORT_PINS // 8 + 2 * n), buf, n)
+
+    def _snapshotValues(self, r, buf, n: int) -> tuple:
+        for i in range(n):
+            buf[i] = (r[9 + 2 * i] << 8) | r[8 + 2 * i]
+        return self._mask(r, 1), buf
+
+    def readPort(self, rom: bytearray) -> int:
+        """
+        Read all digital pins in one transaction. Only the first 56 pins are covered.
+        Devices without FEATURE_PORT are read with one digitalRead per pin.
+        :param rom: selected device
+        :return: int, bitmask with bit n being the state of pin n
+        """
+        if not self.hasFeature(rom, FEATURE_PORT):
+            v = 0
+            for pin in range(min(self.digitalPins(rom), PORT_PINS)):
+                if self.digitalRead(rom, pin, True):
+                    v |= 1 << pin
+            return v
+        return self._mask(self._command(rom, READ_PORT, 0, 9), 1)
+
+    @staticmethod
+    def _mask(r, offset: int) -> int:
+        # 7 byte little endian pin bitmask
+        v = 0
+        for i in range(offset + 6, offset - 1, -1):
+            v = (v << 8) | r[i]
+        return v
+
+    def writePort(self, rom: bytearray, mask: int, values: int, force=False) -> bool:
+        """
+        Set the outputs of multiple pins. Every transaction covers 24 pins so a device with
+        up to 24 digital pins is updated in one transaction. Devices without FEATURE_PORT get one
+        digitalWrite per pin.
+        :param rom: selected device
+        :param mask: bitmask of the pins to set, bit n representing pin n
+        :param values: bitmask of the values, bits not set in mask are ignored
+        :param force: also send pins that already have the value according to the output cache
+        :return: True
+        """
+        if mask >> PORT_PINS:
+            raise AttributeError("Port commands only support {!s} pins".format(PORT_PINS))
+        if not force:
+            mask = self._uncachedPort(rom, mask, values)
+        if not self.hasFeature(rom, FEATURE_PORT):
+            for pin in range(PORT_PINS):
+                if mask >> pin & 1:
+                    self.digitalWrite(rom, pin, values >> pin & 1, True)
+            return True
+        for offset in range(0, PORT_PINS // 8, 3):
+            m = self._portArgs(self._fb, offset, mask, values)
+            if m:
+                self._command(rom, WRITE_PORT, 7)
+                self._rememberPort(rom, m, values)
+        return True
+
+    @staticmethod
+    def _portArgs(f, offset: int, mask: int, values: int) -> int:
+        """
+        Encode the 24 pins starting at byte offset of a port write into f[1:8]
+        :return: mask of the pins covered, 0 if none of them is in mask
+        """
+        m = (mask >> (offset * 8)) & 0xFFFFFF
+        if m == 0:
+            return 0
+        v = (values >> (offset * 8)) & m
+        f[1] = offset
+        for i in range(3):
+            f[2 + i] = (m >> (i * 8)) & 0xFF
+            f[5 + i] = (v >> (i * 8)) & 0xFF
+        return m << (offset * 8)
+
+    def watch(self, rom: bytearray, mask: int) -> bool:
+        """
+        Latch changes of digital pins on the device. The changes are read with readChanges() or
+        changedDevices(). Replaces the previously watched pins of the device. Only the first 56 pins are covered.
+        :param rom: selected device
+        :param mask: bitmask of the pins, bit n representing pin n, 0 to stop watching
+        :return: True
+        :raises NotImplementedError: if the device doesn't support FEATURE_WATCH
+        """
+        self._require(rom, FEATURE_WATCH, "watch")
+        r = self._command(rom, WATCH, self._watchArgs(self._fb, mask))
+        self._watching(rom, mask)
+        return r
+
+    @staticmethod
+    def _watchArgs(f, mask: int) -> int:
+        if mask >> PORT_PINS:
+            raise AttributeError("Watch only supports {!s} pins".format(PORT_PINS))
+        for i in range(7):
+            f[1 + i] = (mask >> (i * 8)) & 0xFF
+        return 7
+
+    def _watching(self, rom: bytearray, mask: int):
+        if mask:
+            self._watched[self._key(rom)] = mask
+        else:
+            self._watched.pop(self._key(rom), None)
+
+    def readChanges(self, rom: bytearray) -> tuple:
+        """
+        Read and clear the latched changes of the watched pins
+        :param rom: selected device
+        :return: tuple (bitmask of changed pins, bitmask of the current states of the watched pins)
+        :raises NotImplementedError: if the device doesn't support FEATURE_WATCH
+        """
+        self._require(rom, FEATURE_WATCH, "readChanges")
+        return self._changes(self._command(rom, READ_CHANGES, 0, 15))
+
+    @classmethod
+    def _changes(cls, r) -> tuple:
+        return cls._mask(r, 0), cls._mask(r, 7)
+
+    def changedDevices(self) -> dict:
+        """
+        Read the changes of all watched devices, every watched device is polled with one transaction.
+        Devices not answering are skipped.
+        :return: dict rom key: (changed pins, pin states) of devices with changes
+        """
+        res = {}
+        for rom in list(self._watched):
+            try:
+                c = self.readChanges(rom)
+            except onewire.OneWireError:
+                continue
+            if c[0]:
+                res[self._key(rom)] = c
+        return res
+
+    def irq(self, rom: bytearray, pin: int, handler=None, trigger=3, obj=None):
+        """
+        Register a handler called by poll() if a watched pin changed. Adds the pin to the watched pins.
+        :param rom: selected device
+        :param pin: pin number
+        :param handler: callable receiving obj, None to remove the handler
+        :param trigger: 1 (rising), 2 (falling) or 3 (both), see machine.Pin.IRQ_RISING and IRQ_FALLING
+        :param obj: argument of the handler, usually the Pin object
+        """
+        k = self._key(rom)
+        old = self._watched.get(k, 0)
+        mask = old & ~(1 << pin) if handler is None else old | (1 << pin)
+        if mask != old:
+            self.watch(k, mask)  # first, no handler is left behind if the device can't watch
+        irqs = self._irqs.setdefault(k, {})
+        if handler is None:
+            irqs.pop(pin, None)
+        else:
+            irqs[pin] = (handler, trigger, obj)
+
+    def poll(self) -> dict:
+        """
+        Read the changes of all watched devices and call the registered irq handlers.
+        A pin that changed to 1 triggers rising handlers, a pin that changed to 0 falling handlers.
+        Multiple changes of a pin between two polls are reported as one.
+        :return: dict rom key: (changed pins, pin states) of devices with changes
+        """
+        res = self.changedDevices()
+        self._dispatch(res)
+        return res
+
+    def _dispatch(self, changes: dict):
+        for k in changes:
+            irqs = self._irqs.get(k)
+            if not irqs:
+                continue
+            changed, states = changes[k]
+            # handlers may remove themselves or other handlers (one-shot irq)
+            for pin, entry in list(irqs.items()):
+                if changed & (1 << pin) and irqs.get(pin) is entry:
+                    handler, trigger, obj = entry
+                    if trigger & (1 if (states >> pin) & 1 else 2):
+                        handler(obj)
 
     def digitalPins(self, rom: bytearray) -> int:
         """
@@ -230,7 +1484,7 @@ class ArduinoControl(onewire.OneWire):
         :param rom: selected device
         :return: int
         """
-        return (self._sendData(rom, DIGITAL_PINS, length_answer=9))[3]
+        return self.capabilities(rom)[1]
 
     def analogPins(self, rom: bytearray) -> int:
         """
@@ -238,7 +1492,7 @@ class ArduinoControl(onewire.OneWire):
         :param rom: selected device
         :return: int
         """
-        return (self._sendData(rom, ANALOG_PINS, length_answer=9))[3]
+        return self.capabilities(rom)[2]
 
     def Pin(self, rom: bytearray, pin: int, *args, **kwargs):
         """
@@ -250,23 +1504,79 @@ class ArduinoControl(onewire.OneWire):
         :return:
         """
         from .pin import Pin
-        if type(rom) == str:
-            rom = self.str2rom(rom)
         return Pin(self, rom, pin, *args, **kwargs)
 
     def ADC(self, rom: bytearray, pin: int, vcc: int = 5):
         from .adc import ADC
-        if type(rom) == str:
-            rom = self.str2rom(rom)
         return ADC(self, rom, pin, vcc)
 
+    @staticmethod
+    def _key(rom) -> bytes:
+        # canonical hashable rom: bytes are used without allocation, bytearrays copied, strings parsed
+        t = type(rom)
+        if t == bytes:
+            return rom
+        return ArduinoControl.str2rom(rom) if t == str else bytes(rom)
+
     @staticmethod
     def rom2str(rom: bytearray) -> str:
-        return ''.join('%02X' % i for i in iter(rom))
+        k = rom if type(rom) == bytes else bytes(rom)
+        s = _names.get(k)
+        if s is None:
+            if len(_names) >= _NAMES_MAX:
+                _names.clear()
+            s = _names[k] = hexlify(k).decode().upper()
+        return s
 
     @staticmethod
-    def str2rom(rom: str) -> bytearray:
-        a = bytearray(8)
-        for i in range(8):
-            a[i] = int(rom[i * 2:i * 2 + 2], 16)
-        return a
+    def str2rom(rom: str) -> bytes:
+        if len(rom) != 16:
+            raise ValueError("ROM string needs 16 hex digits")
+        return unhexlify(rom)
+
+
+class Batch:
+    """
+    Collects write operations for one device and sends them in as few transactions as possible.
+    Usage:
+        with arduinoControl.batch(rom) as b:
+            b.pinMode(13, 1)
+            b.digitalWrite(13, 1)
+    """
+
+    def __init__(self, arduinoControl: ArduinoControl, rom: bytearray):
+        self._c = arduinoControl
+        self._r = rom
+        self._ops = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.send()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            await self.send()  # AsyncArduinoControl.writeBatch returns a coroutine, also for empty batches
+
+    def pinMode(self, pin: int, mode: int):
+        self._ops.append((PIN_MODE, pin, mode))
+
+    def digitalWrite(self, pin: int, value: int):
+        self._ops.append((DIGITAL_WRITE, pin, value))
+
+    def analogWrite(self, pin: int, duty: int):
+        self._ops.append((ANALOG_WRITE, pin, duty))
+
+    def send(self) -> bool:
+        """
+        Send all collected operations. The Batch object can be reused afterwards.
+        :return: True
+        """
+        ops = self._ops
+        self._ops = []
+        return self._c.writeBatch(self._r, ops)  # no transaction for an empty batch
@@ -0,0 +1,683 @@
+# Author: Kevin Köck
+# Copyright Kevin Köck 2019 Released under the MIT license
+# Created on 2026-10-17
+
+__updated__ = "2026-10-17"
+__version__ = "0.1"
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+import onewire
+import machine
+import utime as time
+from array import array
+from .arduinoControl import ArduinoControl, READ_VERSION, READ_SCRATCHPAD, WRITE_SCRATCHPAD, PIN_MODE, \
+    DIGITAL_WRITE, DIGITAL_READ, ANALOG_READ, ANALOG_WRITE, DIGITAL_PINS, ANALOG_PINS, BATCH, READ_PORT, \
+    WRITE_PORT, BATCH_MAX, PORT_PINS, BROADCAST, BROADCAST_STATUS, FEATURE_BROADCAST, \
+    STREAM_START, STREAM_READ, STREAM_READ_MAX, WATCH, READ_CHANGES, ERROR_NONE, ERROR_CRC, Batch, \
+    FEATURE_LONG_FRAME, LONG_BATCH_MAX, LONG_READ_MAX, RAMP, FEATURE_PORT, SWEEP_MISSING, \
+    SNAPSHOT, SNAPSHOT_ANALOG, PIPELINE_MAX, PIPELINE_ANSWER, FEATURE_PIPELINE, LONG_ANSWER, FEATURE_BATCH, \
+    FEATURE_WATCH, FEATURE_RAMP, FEATURE_SNAPSHOT
+from .pin import arduinoMode
+
+try:
+    from pysmartnode.components.machine.adc import pyADC
+except:
+    pyADC = object
+
+if hasattr(asyncio, "sleep_ms"):
+    _sleep_ms = asyncio.sleep_ms
+else:
+    def _sleep_ms(ms):
+        return asyncio.sleep(ms / 1000)
+
+
+class AsyncArduinoControl(ArduinoControl):
+    def __init__(self, pin: machine.Pin, expected_devices=None, cache_outputs=False, stats=False, retry=None,
+                 errors=None):
+        """
+        ArduinoControl with awaitable methods. Every transaction holds a lock of the bus so multiple
+        coroutines can share one bus. Waiting between retries yields to the event loop and releases the bus.
+        Has to be created while the event loop is available.
+        :param pin: Pin object of the onewire connection
+        :param expected_devices: used to warn if devices go missing (filters non-arduino devices)
+        :param cache_outputs: remember confirmed writes and skip unchanged ones, see ArduinoControl
+        :param stats: collect counters and latency histograms in self.stats
+        :param retry: RetryPolicy, see ArduinoControl
+        :param errors: ErrorLog, see ArduinoControl. Run self.errors.monitor() as a task to print the errors.
+        """
+        super().__init__(pin, expected_devices, cache_outputs, stats, retry, errors)
+        self._lock = asyncio.Lock()
+
+    def _command(self, rom: bytearray, com, length: int = 0, length_answer=2):
+        # the arguments are encoded into the shared frame buffer and copied before the first await,
+        # the frame and the answer buffer of a coroutine survive retries and other coroutines
+        return self._send(rom, bytes(self._commandFrame(com, length)), bytearray(length_answer))
+
+    def _long(self, rom: bytearray, length: int, length_answer: int):
+        return self._send(rom, bytes(self._longFrame(length)), bytearray(length_answer + 3), LONG_ANSWER)
+
+    async def _send(self, rom: bytearray, a, r, awaiting_answer=True, attempts: int = None):
+        t = time.ticks_us()
+        k = None if rom is None else self._key(rom)
+        p = self.retry
+        n = p.attemptsFor(k) if attempts is None else attempts
+        crc = 0
+        ow = 0
+        i = 0
+        while True:
+            async with self._lock:
+                e = self._transaction(k, a, r, awaiting_answer)
+            i += 1
+            if e == ERROR_NONE:
+                p.success(k, i)
+                self._record(k, a, t, i, crc, ow, False)
+                return self._answer(r, awaiting_answer)
+            if e == ERROR_CRC:
+                self._log("CRC error, retrying", k)
+                crc += 1
+            else:
+                self._log("OneWire error, retrying", k)
+                ow += 1
+            if i >= n:
+                break
+            d = p.delay(i)
+            if p.expired(time.ticks_diff(time.ticks_us(), t), i, d):
+                break
+            await _sleep_ms(d)
+        p.failure(k, i)
+        self._record(k, a, t, i, crc, ow, True)
+        raise self._unavailable(rom)
+
+    async def scan(self):
+        async with self._lock:
+            return ArduinoControl.scan(self)
+
+    async def scanSafely(self, iter=4, wait=10, raise_on_missing=False) -> list:
+        roms = []
+        seen = set()
+        exp = self._expected_devices
+        for _ in range(iter):
+            r = await self.scan()
+            if exp is not None:
+                if len(r) >= (exp if type(exp) == int else len(exp)):
+                    roms = r
+                    break
+            self._collect(r, roms, seen)
+            await _sleep_ms(wait)
+        self._checkMissing(roms, raise_on_missing)
+        self._merge(roms)
+        return roms
+
+    async def ping(self, rom: bytearray) -> bool:
+        async with self._lock:  # single transaction, the shared buffers are safe while holding the lock
+            return ArduinoControl.ping(self, rom)
+
+    async def refresh(self, scan=False, scan_interval=None, misses=2) -> tuple:
+        added, seen = self._merge(await self.scan()) if self._scanDue(scan, scan_interval) else ([], ())
+        removed = []
+        for k in list(self._devices):
+            if k in seen or await self.ping(k):
+                self._devices[k] = 0
+            elif self._missed(k, misses):
+                removed.append(k)
+        return added, removed
+
+    async def monitor(self, interval=1000, scan_interval=60000, misses=2):
+        """
+        Keep the device registry up to date in the background, see ArduinoControl.refresh
+        :param interval: ms between pings of the known devices
+        :param scan_interval: ms between full searches of the bus
+        :param misses: failed pings after which a device is removed
+        """
+        while True:
+            await self.refresh(False, scan_interval, misses)
+            await _sleep_ms(interval)
+
+    async def clientVersion(self, rom: bytearray) -> int:
+        return (await self.capabilities(rom))[0]
+
+    async def capabilities(self, rom: bytearray) -> tuple:
+        k = self._key(rom)
+        c = self._caps.get(k)
+        if c is None:
+            c = self._capabilities(await self._sendData(rom, READ_VERSION, length_answer=9))
+            if c[1] is None:  # old client, no pin numbers in the answer of READ_VERSION
+                c = (c[0], (await self._sendData(rom, DIGITAL_PINS, length_answer=9))[3],
+                     (await self._sendData(rom, ANALOG_PINS, length_answer=9))[3], c[3])
+            self._caps[k] = c
+        return c
+
+    async def hasFeature(self, rom: bytearray, feature: int) -> bool:
+        return bool((await self.capabilities(rom))[3] & feature)
+
+    async def _require(self, rom: bytearray, feature: int, name: str):
+        if not await self.hasFeature(rom, feature):
+            self._unsupported(rom, name)
+
+    async def readScratchpad(self, rom: bytearray) -> bytearray:
+        return await self._sendData(rom, READ_SCRATCHPAD, None, length_answer=9)
+
+    async def writeScratchpad(self, rom: bytearray, data: bytearray) -> bool:
+        if len(data) != 7:
+            raise AttributeError("Data has to be length 7")
+        return await self._sendData(rom, WRITE_SCRATCHPAD, data)
+
+    async def pinMode(self, rom: bytearray, pin: int, mode: int, force=False) -> bool:
+        if not force and self._isCached(rom, PIN_MODE, pin, mode):
+            return True
+        r = await self._command(rom, PIN_MODE, self._writeArgs(self._fb, PIN_MODE, pin, mode))
+        self._remember(rom, PIN_MODE, pin, mode)
+        return r
+
+    async def digitalWrite(self, rom: bytearray, pin: int, value: int, force=False) -> bool:
+        if not force and self._isCached(rom, DIGITAL_WRITE, pin, value):
+            return True
+        r = await self._command(rom, DIGITAL_WRITE, self._writeArgs(self._fb, DIGITAL_WRITE, pin, value))
+        self._remember(rom, DIGITAL_WRITE, pin, value)
+        return r
+
+    async def digitalRead(self, rom: bytearray, pin: int, refresh=False) -> int:
+        if not refresh:
+            v = self._cachedOutput(rom, pin)
+            if v is not None:
+                return v
+        self._fb[1] = pin
+        return self._value(await self._command(rom, DIGITAL_READ, 1, 9))
+
+    async def analogRead(self, rom: bytearray, pin: int) -> int:
+        self._fb[1] = pin
+        return self._value(await self._command(rom, ANALOG_READ, 1, 9))
+
+    async def analogReadInto(self, rom: bytearray, pins, buf, offset: int = 0) -> int:
+        n = len(pins)
+        if n > 1 and await self.hasFeature(rom, FEATURE_LONG_FRAME):
+            for i in range(0, n, LONG_READ_MAX):
+                m = self._analogArgs(self._fb, pins, i)
+                self._analogValues(await self._long(rom, m + 1, 2 * m), buf, offset + i, m)
+            return n
+        for i in range(n):
+            buf[offset + i] = await self.analogRead(rom, pins[i])
+        return n
+
+    async def digitalReadInto(self, rom: bytearray, pins, buf, offset: int = 0) -> int:
+        if not await self.hasFeature(rom, FEATURE_PORT):
+            for i in range(len(pins)):
+                buf[offset + i] = await self.digitalRead(rom, pins[i], True)
+            return len(pins)
+        return self._portValues(await self._command(rom, READ_PORT, 0, 9), pins, buf, offset)
+
+    async def sweep(self, spec, buf=None):
+        if buf is None:
+            buf = array("H", [0] * self.sweepSize(spec))
+        i = 0
+        for rom, dpins, apins in self._sweepItems(spec):
+            n = len(dpins) + len(apins)
+            if self.retry.failing(self._key(rom)) or not await self._sweepDevice(rom, dpins, apins, buf, i):
+                for j in range(i, i + n):
+                    buf[j] = SWEEP_MISSING
+            i += n
+        return buf
+
+    async def _sweepDevice(self, rom: bytearray, dpins, apins, buf, offset: int) -> bool:
+        try:
+            if dpins:
+                await self.digitalReadInto(rom, dpins, buf, offset)
+            if apins:
+                await self.analogReadInto(rom, apins, buf, offset + len(dpins))
+        except onewire.OneWireError:
+            return False
+        return True
+
+    async def analogWrite(self, rom: bytearray, pin: int, duty: int, force=False) -> bool:
+        if not force and self._isCached(rom, ANALOG_WRITE, pin, duty):
+            return True
+        r = await self._command(rom, ANALOG_WRITE, self._writeArgs(self._fb, ANALOG_WRITE, pin, duty))
+        self._remember(rom, ANALOG_WRITE, pin, duty)
+        return r
+
+    async def rampTo(self, rom: bytearray, pin: int, duty: int, ms: int, start: int = None) -> bool:
+        await self._require(rom, FEATURE_RAMP, "rampTo")
+        r = await self._command(rom, RAMP, self._rampArgs(self._fb, pin, duty, ms, start))
+        self._unknown(rom, pin)
+        return r
+
+    async def rampSequence(self, rom: bytearray, pin: int, keyframes: list, repeat=False, start: int = None) -> bool:
+        await self._require(rom, FEATURE_RAMP, "rampSequence")
+        r = await self._sendLong(rom, self._rampFrame(pin, keyframes, repeat, start), 1)
+        self._unknown(rom, pin)
+        return r
+
+    async def writeBatch(self, rom: bytearray, ops: list) -> bool:
+        if ops and not await self.hasFeature(rom, FEATURE_BATCH):
+            for op in ops:
+                await self._single(rom, op)
+            return True
+        long = self._longBatch(len(ops)) and await self.hasFeature(rom, FEATURE_LONG_FRAME)
+        n = LONG_BATCH_MAX if long else BATCH_MAX
+        for i in range(0, len(ops), n):
+            chunk = ops[i:i + n]
+            if long:
+                await self._sendLong(rom, self._batchFrame(chunk, BATCH, LONG_BATCH_MAX), 1)
+            else:
+                await self._sendData(rom, BATCH, self._batchFrame(chunk))
+            for com, pin, value in chunk:
+                self._remember(rom, com, pin, value)
+        return True
+
+    async def pipeline(self, rom: bytearray, ops: list) -> list:
+        res = [None] * len(ops)
+        try:
+            pipelined = await self.hasFeature(rom, FEATURE_PIPELINE)
+        except onewire.OneWireError:
+            return res
+        if not pipelined:
+            for i, op in enumerate(ops):
+                try:
+                    res[i] = await self._single(rom, op)
+                except onewire.OneWireError:
+                    pass
+            return res
+        todo = list(range(len(ops)))
+        attempts = None
+        for _ in range(self.retry.attemptsFor(self._key(rom))):
+            failed = []
+            for i in range(0, len(todo), PIPELINE_MAX):
+                chunk = todo[i:i + PIPELINE_MAX]
+                a, length = self._pipelineFrame(ops, chunk)
+                try:
+                    r = await self._send(rom, a, bytearray(length), PIPELINE_ANSWER, attempts)
+                except onewire.OneWireError:
+                    continue
+                failed += self._pipelineAnswers(rom, ops, chunk, r, res)
+            todo = failed
+            if not todo:
+                break
+            attempts = 1
+        return res
+
+    async def _single(self, rom: bytearray, op: tuple):
+        com, pin, value = op
+        if com == PIN_MODE:
+            return await self.pinMode(rom, pin, value, True)
+        if com == DIGITAL_WRITE:
+            return await self.digitalWrite(rom, pin, value, True)
+        if com == ANALOG_WRITE:
+            return await self.analogWrite(rom, pin, value, True)
+        if com == DIGITAL_READ:
+            return await self.digitalRead(rom, pin, True)
+        return await self.analogRead(rom, pin)
+
+    async def broadcast(self, ops: list, roms: list = None) -> int:
+        self._seq = self._seq % 255 + 1
+        a = self._batchFrame(ops, self._seq)
+        self._forget(ops)
+        await self._sendData(None, BROADCAST, a, awaiting_answer=False)
+        self._broadcast = (self._seq, ops)
+        if roms is None:
+            return self._seq
+        failed = []
+        for rom in await self.verifyBroadcast(roms, self._seq):
+            try:
+                await self.writeBatch(rom, ops)
+            except onewire.OneWireError:
+                failed.append(rom)
+        return self._seq, failed
+
+    async def verifyBroadcast(self, roms: list, seq: int) -> list:
+        missed = []
+        for rom in roms:
+            try:
+                if not await self.hasFeature(rom, FEATURE_BROADCAST):
+                    missed.append(rom)
+                    continue
+                r = await self._command(rom, BROADCAST_STATUS, 0, 9)
+            except onewire.OneWireError:
+                missed.append(rom)
+                continue
+            if r[3] == seq:
+                self._rememberBroadcast(rom, seq)
+            else:
+                missed.append(rom)
+        return missed
+
+    async def writeMany(self, rom: bytearray, values: list) -> bool:
+        return await self.writeBatch(rom, [(DIGITAL_WRITE, pin, value) for pin, value in values])
+
+    def batch(self, rom: bytearray):
+        """
+        Use with "async with" or "await batch.send()"
+        """
+        return Batch(self, rom)
+
+    async def streamStart(self, rom: bytearray, pins: list, interval: int) -> bool:
+        return await self._command(rom, STREAM_START, self._streamArgs(self._fb, pins, interval))
+
+    async def streamStop(self, rom: bytearray) -> bool:
+        return await self.streamStart(rom, [], 0)
+
+    async def readBlock(self, rom: bytearray, buf, max_samples: int = None) -> int:
+        n = len(buf) if max_samples is None else min(max_samples, len(buf))
+        i = 0
+        while i < n:
+            m = self._fb[1] = min(n - i, STREAM_READ_MAX)
+            r = await self._command(rom, STREAM_READ, 1, 2 + 2 * m + 1)
+            i += self._streamValues(rom, r, buf, i)
+            if r[0] == 0 or not r[1] & 0x02:
+                break
+        return i
+
+    async def snapshotStart(self, rom: bytearray, pins: list = ()) -> bool:
+        await self._require(rom, FEATURE_SNAPSHOT, "snapshotStart")
+        return await self._command(rom, SNAPSHOT, self._snapshotArgs(self._fb, pins, True))
+
+    async def snapshotStop(self, rom: bytearray) -> bool:
+        await self._require(rom, FEATURE_SNAPSHOT, "snapshotStop")
+        return await self._command(rom, SNAPSHOT, self._snapshotArgs(self._fb, (), False))
+
+    async def snapshot(self, rom: bytearray, buf=None) -> tuple:
+        await self._require(rom, FEATURE_SNAPSHOT, "snapshot")
+        n = min((await self.capabilities(rom))[2], SNAPSHOT_ANALOG)
+        if buf is None:
+            buf = array("H", [0] * n)
+        self._fb[2] = READ_SCRATCHPAD
+        return self._snapshotValues(await self._long(rom, 1, PORT_PINS // 8 + 2 * n), buf, n)
+
+    async def readPort(self, rom: bytearray) -> int:
+        if not await self.hasFeature(rom, FEATURE_PORT):
+            v = 0
+            for pin in range(min(await self.digitalPins(rom), PORT_PINS)):
+                if await self.digitalRead(rom, pin, True):
+                    v |= 1 << pin
+            return v
+        return self._mask(await self._command(rom, READ_PORT, 0, 9), 1)
+
+    async def writePort(self, rom: bytearray, mask: int, values: int, force=False) -> bool:
+        if mask >> PORT_PINS:
+            raise AttributeError("Port commands only support {!s} pins".format(PORT_PINS))
+        if not force:
+            mask = self._uncachedPort(rom, mask, values)
+        if not await self.hasFeature(rom, FEATURE_PORT):
+            for pin in range(PORT_PINS):
+                if mask >> pin & 1:
+                    await self.digitalWrite(rom, pin, values >> pin & 1, True)
+            return True
+        for offset in range(0, PORT_PINS // 8, 3):
+            m = self._portArgs(self._fb, offset, mask, values)
+            if m:
+                await self._command(rom, WRITE_PORT, 7)
+                self._rememberPort(rom, m, values)
+        return True
+
+    async def watch(self, rom: bytearray, mask: int) -> bool:
+        await self._require(rom, FEATURE_WATCH, "watch")
+        r = await self._command(rom, WATCH, self._watchArgs(self._fb, mask))
+        self._watching(rom, mask)
+        return r
+
+    async def readChanges(self, rom: bytearray) -> tuple:
+        await self._require(rom, FEATURE_WATCH, "readChanges")
+        return self._changes(await self._command(rom, READ_CHANGES, 0, 15))
+
+    async def changedDevices(self) -> dict:
+        res = {}
+        for rom in list(self._watched):
+            try:
+                c = await self.readChanges(rom)
+            except onewire.OneWireError:
+                continue
+            if c[0]:
+                res[self._key(rom)] = c
+        return res
+
+    async def irq(self, rom: bytearray, pin: int, handler=None, trigger=3, obj=None):
+        k = self._key(rom)
+        old = self._watched.get(k, 0)
+        mask = old & ~(1 << pin) if handler is None else old | (1 << pin)
+        if mask != old:
+            await self.watch(k, mask)
+        irqs = self._irqs.setdefault(k, {})
+        if handler is None:
+            irqs.pop(pin, None)
+        else:
+            irqs[pin] = (handler, trigger, obj)
+
+    async def poll(self) -> dict:
+        res = await self.changedDevices()
+        self._dispatch(res)
+        return res
+
+    async def digitalPins(self, rom: bytearray) -> int:
+        return (await self.capabilities(rom))[1]
+
+    async def analogPins(self, rom: bytearray) -> int:
+        return (await self.capabilities(rom))[2]
+
+    async def Pin(self, rom: bytearray, pin: int, *args, **kwargs):
+        """
+        Returns an initialized AsyncPin object
+        """
+        return await AsyncPin(self, rom, pin).init(*args, **kwargs)
+
+    async def ADC(self, rom: bytearray, pin: int, vcc: int = 5):
+        return await AsyncADC(self, rom, pin, vcc).init()
+
+
+class AsyncArduino:
+    def __init__(self, arduinoControl: AsyncArduinoControl, rom: bytearray):
+        """
+        Async version of Arduino. Has to be initialized with "arduino = await AsyncArduino(c, rom).init()"
+        """
+        self._c = arduinoControl
+        self._r = arduinoControl._key(rom)
+        self._dp = None
+        self._ap = None
+
+    async def init(self):
+        c = await self._c.capabilities(self._r)
+        self._dp = c[1]
+        self._ap = c[2]
+        return self
+
+    def __str__(self):
+        return "AsyncArduino({!s})".format(self._c.rom2str(self._r))
+
+    def _checkDpin(self, pin: int):
+        if pin >= self._dp:
+            raise AttributeError("Selected pin number higher than available pins")
+
+    def _checkApin(self, pin: int):
+        if pin >= self._ap:
+            raise AttributeError("Selected pin number higher than available pins")
+
+    async def clientVersion(self):
+        return await self._c.clientVersion(self._r)
+
+    async def pinMode(self, pin: int, mode: int, force=False) -> bool:
+        self._checkDpin(pin)
+        return await self._c.pinMode(self._r, pin, mode, force)
+
+    async def digitalWrite(self, pin: int, value: int, force=False) -> bool:
+        self._checkDpin(pin)
+        return await self._c.digitalWrite(self._r, pin, value, force)
+
+    async def digitalRead(self, pin: int, refresh=False) -> int:
+        self._checkDpin(pin)
+        return await self._c.digitalRead(self._r, pin, refresh)
+
+    async def analogRead(self, pin: int) -> int:
+        self._checkApin(pin)
+        return await self._c.analogRead(self._r, pin)
+
+    async def analogWrite(self, pin: int, duty: int, force=False) -> bool:
+        self._checkDpin(pin)
+        return await self._c.analogWrite(self._r, pin, duty, force)
+
+    async def rampTo(self, pin: int, duty: int, ms: int, start: int = None) -> bool:
+        self._checkDpin(pin)
+        return await self._c.rampTo(self._r, pin, duty, ms, start)
+
+    async def rampSequence(self, pin: int, keyframes: list, repeat=False, start: int = None) -> bool:
+        self._checkDpin(pin)
+        return await self._c.rampSequence(self._r, pin, keyframes, repeat, start)
+
+    async def snapshotStart(self, pins: list = ()) -> bool:
+        for pin in pins:
+            self._checkApin(pin)
+        return await self._c.snapshotStart(self._r, pins)
+
+    async def snapshotStop(self) -> bool:
+        return await self._c.snapshotStop(self._r)
+
+    async def snapshot(self, buf=None) -> tuple:
+        return await self._c.snapshot(self._r, buf)
+
+    async def readPort(self) -> int:
+        return await self._c.readPort(self._r)
+
+    async def watch(self, pins: list) -> bool:
+        mask = 0
+        for pin in pins:
+            self._checkDpin(pin)
+            mask |= 1 << pin
+        return await self._c.watch(self._r, mask)
+
+    async def readChanges(self) -> tuple:
+        return await self._c.readChanges(self._r)
+
+    async def streamStart(self, pins: list, interval: int) -> bool:
+        for pin in pins:
+            self._checkApin(pin)
+        return await self._c.streamStart(self._r, pins, interval)
+
+    async def streamStop(self) -> bool:
+        return await self._c.streamStop(self._r)
+
+    async def readBlock(self, buf, max_samples: int = None) -> int:
+        return await self._c.readBlock(self._r, buf, max_samples)
+
+    async def writePort(self, mask: int, values: int) -> bool:
+        return await self._c.writePort(self._r, mask, values)
+
+    async def writeMany(self, values: list) -> bool:
+        for pin, _ in values:
+            self._checkDpin(pin)
+        return await self._c.writeMany(self._r, values)
+
+    async def pipeline(self, ops: list) -> list:
+        for com, pin, _ in ops:
+            if com == ANALOG_READ:
+                self._checkApin(pin)
+            else:
+                self._checkDpin(pin)
+        return await self._c.pipeline(self._r, ops)
+
+    def batch(self):
+        return self._c.batch(self._r)
+
+    def digitalPins(self) -> int:
+        return self._dp
+
+    def analogPins(self) -> int:
+        return self._ap
+
+    async def Pin(self, pin, *args, **kwargs):
+        self._checkDpin(pin)
+        return await AsyncPin(self._c, self._r, pin).init(*args, check=False, **kwargs)
+
+    async def ADC(self, pin, vcc=5):
+        self._checkApin(pin)
+        return await AsyncADC(self._c, self._r, pin, vcc).init(check=False)
+
+
+class AsyncPin:
+    """
+    Awaitable version of Pin. Has to be initialized with "pin = await AsyncPin(c, rom, pin).init()"
+    """
+    IN = machine.Pin.IN
+    OUT = machine.Pin.OUT
+    __slots__ = ("_a", "_r", "_p")
+
+    def __init__(self, arduinoControl: AsyncArduinoControl, rom: bytearray, pin: int):
+        self._a = arduinoControl
+        self._p = pin
+        self._r = arduinoControl._key(rom)
+
+    async def init(self, mode=machine.Pin.OUT, pull=None, value=None, *args, check=True, **kwargs):
+        if check and self._p >= await self._a.digitalPins(self._r):
+            raise AttributeError("Selected pin number higher than available pins")
+        if mode is not None:
+            await self.mode(mode, pull)
+        if value is not None:
+            await self._a.digitalWrite(self._r, self._p, value)
+        return self
+
+    async def value(self, value: int = None, refresh=False):
+        if value is None:
+            return await self._a.digitalRead(self._r, self._p, refresh)
+        return await self._a.digitalWrite(self._r, self._p, value)
+
+    async def mode(self, mode, pull=None):
+        await self._a.pinMode(self._r, self._p, arduinoMode(mode, pull))
+
+    def __call__(self, value=None):
+        return self.value(value)
+
+    async def on(self):
+        await self.value(1)
+
+    async def off(self):
+        await self.value(0)
+
+    async def irq(self, handler=None, trigger=machine.Pin.IRQ_FALLING | machine.Pin.IRQ_RISING):
+        """
+        Handler is called with the AsyncPin object by AsyncArduinoControl.poll(), see Pin.irq
+        """
+        t = (1 if trigger & machine.Pin.IRQ_RISING else 0) | (2 if trigger & machine.Pin.IRQ_FALLING else 0)
+        await self._a.irq(self._r, self._p, handler, t, self)
+
+
+class AsyncADC(pyADC):
+    __slots__ = ("_a", "_r", "_p", "_v")
+
+    def __init__(self, arduinoControl: AsyncArduinoControl, rom: bytearray, pin, vcc=5):
+        """
+        Awaitable version of ADC. Has to be initialized with "adc = await AsyncADC(c, rom, pin).init()"
+        :param arduinoControl: AsyncArduinoControl object
+        :param rom: onewire slave id, can be str as it will be converted
+        :param pin: pin number
+        :param vcc: Voltage the arduino is running at to calculate adc voltage
+        """
+        super().__init__()
+        self._p = pin
+        self._v = vcc
+        self._a = arduinoControl
+        self._r = arduinoControl._key(rom)
+
+    async def init(self, check=True):
+        if check and self._p >= await self._a.analogPins(self._r):
+            raise AttributeError("Selected pin number higher than available pins")
+        return self
+
+    def __str__(self):
+        return "AsyncArduinoControlADC({!s},{!s})".format(self._a.rom2str(self._r), self._p)
+
+    async def readVoltage(self):
+        return await self.read() / 1023 * self._v
+
+    def maxVoltage(self):
+        return self._v  # arduino operating voltage
+
+    async def read(self):
+        return await self._a.analogRead(self._r, self._p)
+
+    async def readBlock(self, buf, max_samples: int = None) -> int:
+        return await self._a.readBlock(self._r, buf, max_samples)
+
+    async def streamStart(self, interval: int):
+        return await self._a.streamStart(self._r, [self._p], interval)
+
+    async def streamStop(self):
+        return await self._a.streamStop(self._r)
@@ -0,0 +1,178 @@
+# Author: Kevin Köck
+# Copyright Kevin Köck 2019 Released under the MIT license
+# Created on 2026-10-17
+
+__updated__ = "2026-10-17"
+__version__ = "0.1"
+
+import onewire
+from .arduinoControl import ArduinoControl
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+
+class BusPool:
+    def __init__(self, controls: list):
+        """
+        Manages multiple ArduinoControl objects, each driving its own 1-wire bus, and routes every
+        command to the bus of its device. Methods of ArduinoControl taking a rom as first argument
+        can be called on the pool directly, e.g. pool.digitalWrite(rom, 13, 1).
+        :param controls: list of ArduinoControl objects, one per bus
+        """
+        self.controls = controls
+        self._routes = {}  # rom key: ArduinoControl
+
+    def scan(self) -> list:
+        """
+        Search all buses with scanSafely and route the devices found
+        :return: list of roms of all buses
+        """
+        roms = []
+        for c in self.controls:
+            roms += self._route(c, c.scanSafely())
+        return roms
+
+    def refresh(self, scan=False, scan_interval=None, misses=2) -> tuple:
+        """
+        Update the device registry of every bus, see ArduinoControl.refresh
+        :return: tuple (list of added roms, list of removed roms)
+        """
+        added = []
+        removed = []
+        for c in self.controls:
+            a, r = c.refresh(scan, scan_interval, misses)
+            added += self._route(c, a)
+            removed += self._unroute(r)
+        return added, removed
+
+    def _route(self, control, roms: list) -> list:
+        for rom in roms:
+            self._routes[control._key(rom)] = control
+        return roms
+
+    def _unroute(self, roms: list) -> list:
+        for rom in roms:
+            self._routes.pop(ArduinoControl._key(rom), None)
+        return roms
+
+    def devices(self) -> list:
+        """
+        :return: list of roms of all routed devices
+        """
+        return list(self._routes)
+
+    def control(self, rom: bytearray):
+        """
+        :param rom: device
+        :return: ArduinoControl of the bus the device is connected to
+        """
+        c = self._routes.get(ArduinoControl._key(rom))
+        if c is None:
+            raise onewire.OneWireError("Device {!s} not on any bus".format(rom))
+        return c
+
+    def __getattr__(self, name):
+        # route methods of ArduinoControl by their rom argument, other names don't exist on the pool
+        if not callable(getattr(ArduinoControl, name, None)):
+            raise AttributeError(name)
+
+        def call(rom, *args, **kwargs):
+            return getattr(self.control(rom), name)(rom, *args, **kwargs)
+
+        return call
+
+    def _groups(self, calls: list, results: list) -> list:
+        """
+        Group calls by bus keeping their order, calls of unknown devices get an exception as result
+        :return: list of lists of (index, control, call)
+        """
+        groups = {}
+        for i, call in enumerate(calls):
+            try:
+                c = self.control(call[1])
+            except onewire.OneWireError as e:
+                results[i] = e
+                continue
+            if id(c) not in groups:
+                groups[id(c)] = []
+            groups[id(c)].append((i, c, call))
+        return list(groups.values())
+
+    @staticmethod
+    def _execute(group: list, results: list):
+        for i, c, call in group:
+            try:
+                results[i] = getattr(c, call[0])(call[1], *call[2:])
+            except Exception as e:
+                results[i] = e
+
+    def run(self, calls: list, threads=False) -> list:
+        """
+        Execute multiple calls. Calls of the same bus are executed in order.
+        With threads every bus gets its own thread (_thread, e.g. on esp32) so transactions on
+        different buses can overlap, otherwise the buses are used one after another.
+        :param calls: list of tuples (method name, rom, *arguments), e.g. ("digitalWrite", rom, 13, 1)
+        :param threads: use one thread per bus
+        :return: list of results in the order of calls, exceptions are returned instead of raised
+        """
+        results = [None] * len(calls)
+        groups = self._groups(calls, results)
+        if not threads or len(groups) < 2:
+            for group in groups:
+                self._execute(group, results)
+            return results
+        import _thread
+        locks = []
+        for group in groups[1:]:
+            lock = _thread.allocate_lock()
+            lock.acquire()
+            locks.append(lock)
+            _thread.start_new_thread(self._worker, (group, results, lock))
+        self._execute(groups[0], results)
+        for lock in locks:
+            lock.acquire()  # released when the worker is done
+        return results
+
+    def _worker(self, group: list, results: list, lock):
+        try:
+            self._execute(group, results)
+        finally:
+            lock.release()
+
+
+class AsyncBusPool(BusPool):
+    """
+    BusPool of AsyncArduinoControl objects. Methods called on the pool return awaitables.
+    run() executes the calls of every bus in its own task so the buses are used interleaved.
+    """
+
+    async def scan(self) -> list:
+        roms = []
+        for c in self.controls:
+            roms += self._route(c, await c.scanSafely())
+        return roms
+
+    async def refresh(self, scan=False, scan_interval=None, misses=2) -> tuple:
+        added = []
+        removed = []
+        for c in self.controls:
+            a, r = await c.refresh(scan, scan_interval, misses)
+            added += self._route(c, a)
+            removed += self._unroute(r)
+        return added, removed
+
+    async def run(self, calls: list) -> list:
+        results = [None] * len(calls)
+        await asyncio.gather(*[self._execute(group, results) for group in self._groups(calls, results)])
+        return results
+
+    @staticmethod
+    async def _execute(group: list, results: list):
+        for i, c, call in group:
+            try:
+                results[i] = await getattr(c, call[0])(call[1], *call[2:])
+            except Exception as e:
+                results[i] = e
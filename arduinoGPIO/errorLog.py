@@ -0,0 +1,117 @@
+# Author: Kevin Köck
+# Copyright Kevin Köck 2019 Released under the MIT license
+# Created on 2026-10-17
+
+__updated__ = "2026-10-17"
+__version__ = "0.1"
+
+import utime as time
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+
+class ErrorLog:
+    def __init__(self, size=16, rate=10, period=1000, echo=False):
+        """
+        Ring buffer of the recent errors of ArduinoControl. Logging only stores a reference to the
+        message in preallocated lists and never prints unless echo is set, so errors in the retry
+        loop don't slow down the transactions. Records are read with drain() or printed by monitor().
+        If the buffer is full, the oldest records are overwritten.
+        :param size: number of records kept
+        :param rate: maximum number of records per period, further errors are only counted
+        :param period: duration of the rate limit period in ms
+        :param echo: also print every record when it is logged (debugging, slow on a serial console)
+        """
+        self.enabled = True
+        self.echo = echo
+        self.rate = rate
+        self.period = period
+        self.dropped = 0  # records suppressed by the rate limit or overwritten before being drained
+        self._size = size
+        self._ticks = [0] * size
+        self._keys = [None] * size
+        self._messages = [None] * size
+        self._next = 0  # index of the next record
+        self._count = 0  # number of records in the buffer
+        self._start = 0  # ticks_ms of the current rate limit period
+        self._logged = 0  # records logged in the current period
+
+    def log(self, message: str, key: bytes = None):
+        """
+        Store an error record
+        :param message: error message
+        :param key: rom key of the device or None
+        """
+        if not self.enabled or self._size == 0:
+            return
+        t = time.ticks_ms()
+        if time.ticks_diff(t, self._start) >= self.period:
+            self._start = t
+            self._logged = 0
+        if self._logged >= self.rate:
+            self.dropped += 1
+            return
+        self._logged += 1
+        i = self._next
+        self._ticks[i] = t
+        self._keys[i] = key
+        self._messages[i] = message
+        self._next = (i + 1) % self._size
+        if self._count == self._size:
+            self.dropped += 1
+        else:
+            self._count += 1
+        if self.echo:
+            print(self.format((t, key, message)))
+
+    def __len__(self):
+        return self._count
+
+    def drain(self, max_records: int = None) -> list:
+        """
+        Remove records from the buffer, oldest first
+        :param max_records: maximum number of records or None for all
+        :return: list of tuples (ticks_ms, rom key or None, message)
+        """
+        n = self._count if max_records is None else min(max_records, self._count)
+        i = (self._next - self._count) % self._size if self._size else 0
+        records = []
+        for _ in range(n):
+            records.append((self._ticks[i], self._keys[i], self._messages[i]))
+            self._keys[i] = self._messages[i] = None
+            i = (i + 1) % self._size
+        self._count -= n
+        return records
+
+    def clear(self):
+        self.drain()
+        self.dropped = 0
+
+    @staticmethod
+    def format(record: tuple) -> str:
+        t, key, message = record
+        if key is None:
+            return "{!s}ms {!s}".format(t, message)
+        from .arduinoControl import ArduinoControl
+        return "{!s}ms {!s}: {!s}".format(t, ArduinoControl.rom2str(key), message)
+
+    async def monitor(self, handler=None, interval=1000):
+        """
+        Drain the buffer periodically, meant to be run as a task
+        :param handler: callable getting every record, prints the records if None
+        :param interval: time between draining the buffer in ms
+        """
+        reported = 0
+        while True:
+            for record in self.drain():
+                if handler is None:
+                    print(self.format(record))
+                else:
+                    handler(record)
+            if self.dropped > reported and handler is None:
+                print("{!s} errors dropped".format(self.dropped - reported))
+            reported = self.dropped
+            await asyncio.sleep(interval / 1000)
@@ -2,50 +2,80 @@
 # Copyright Kevin Köck 2019 Released under the MIT license
 # Created on 2019-04-03 
 
-__updated__ = "2019-04-03"
+__updated__ = "2026-10-17"
 __version__ = "0.1"
 
 import machine
+from micropython import const
 from .arduinoControl import ArduinoControl
 
 
+_INPUT = const(0)  # pinMode values on the arduino
+_OUTPUT = const(1)
+_INPUT_PULLUP = const(2)
+
+
+def arduinoMode(mode, pull=None) -> int:
+    """
+    Translate machine.Pin mode and pull to the pinMode value of the arduino.
+    Other values are passed through as arduino pinMode values.
+    """
+    if mode == machine.Pin.OUT:
+        return _OUTPUT
+    if mode == machine.Pin.IN:
+        return _INPUT_PULLUP if pull == machine.Pin.PULL_UP else _INPUT
+    return mode
+
+
 class Pin:
     """
     Attempt to make a compatible Pin version to machine.Pin.
-    This class does not need an Arduino Object translating between the ArduinoCtonrol object.
+    Used by ArduinoControl.Pin and Arduino.Pin. ROM and pin are validated once on creation
+    so every call is one call into ArduinoControl.
     """
     IN = machine.Pin.IN
     OUT = machine.Pin.OUT
+    __slots__ = ("_a", "_r", "_p")
 
     def __init__(self, arduinoControl: ArduinoControl, rom: bytearray, pin: int, mode=machine.Pin.OUT, pull=None,
                  value=None, *args, **kwargs):
         self._a = arduinoControl
         self._p = pin
-        self._r = rom if type(rom) == bytearray else arduinoControl.str2rom(rom)
-        if arduinoControl.digitalPins(rom) < pin:
+        self._r = arduinoControl._key(rom)
+        if pin >= arduinoControl.digitalPins(self._r):
             raise AttributeError("Selected pin number higher than available pins")
-        self.mode(mode)
+        if mode is not None:
+            self.mode(mode, pull)
         if value is not None:
-            self._a.digitalWrite(rom, pin, value)
+            arduinoControl.digitalWrite(self._r, pin, value)
         # no open_drain implemented (client side, whatever value works on the arduino).
-        # pullup not implemented
 
-    def value(self, value: int = None):
+    def value(self, value: int = None, refresh=False):
+        """
+        :param value: value to set or None to read the pin
+        :param refresh: read from the device even if the output cache of ArduinoControl knows the value
+        """
         if value is None:
-            return self._a.digitalRead(self._r, self._p)
+            return self._a.digitalRead(self._r, self._p, refresh)
         return self._a.digitalWrite(self._r, self._p, value)
 
-    def mode(self, mode):
-        self._a.pinMode(self._r, self._p, 0 if mode == machine.Pin.OUT else (1 if mode == machine.Pin.IN else mode))
+    def mode(self, mode, pull=None):
+        """
+        :param mode: machine.Pin.IN, machine.Pin.OUT or arduino pinMode value
+        :param pull: machine.Pin.PULL_UP for INPUT_PULLUP
+        """
+        self._a.pinMode(self._r, self._p, arduinoMode(mode, pull))
 
     def __call__(self, value=None):
-        return self.value(value)
+        if value is None:
+            return self._a.digitalRead(self._r, self._p)
+        return self._a.digitalWrite(self._r, self._p, value)
 
     def on(self):
-        self.value(1)
+        self._a.digitalWrite(self._r, self._p, 1)
 
     def off(self):
-        self.value(0)
+        self._a.digitalWrite(self._r, self._p, 0)
 
     def pull(self, *args, **kwargs):
         raise NotImplementedError
@@ -53,5 +83,55 @@ class Pin:
     def drive(self, *args, **kwargs):
         raise NotImplementedError
 
-    def irq(self, *args, **kwargs):
-        raise NotImplementedError
+    def irq(self, handler=None, trigger=machine.Pin.IRQ_FALLING | machine.Pin.IRQ_RISING):
+        """
+        The pin gets watched by the device and the handler is called with the Pin object by
+        ArduinoControl.poll() if the pin changed since the last poll.
+        :param handler: callable or None to remove the handler
+        :param trigger: machine.Pin.IRQ_RISING and/or machine.Pin.IRQ_FALLING
+        """
+        t = (1 if trigger & machine.Pin.IRQ_RISING else 0) | (2 if trigger & machine.Pin.IRQ_FALLING else 0)
+        self._a.irq(self._r, self._p, handler, t, self)
+
+
+def _groupByDevice(pins) -> dict:
+    groups = {}
+    for i, p in enumerate(pins):
+        key = (id(p._a), bytes(p._r))
+        if key not in groups:
+            groups[key] = (p._a, p._r, [])
+        groups[key][2].append(i)
+    return groups
+
+
+def readPins(pins: list) -> list:
+    """
+    Read the values of multiple Pin objects using one transaction per device.
+    :param pins: list of Pin objects
+    :return: list of values in the order of pins
+    """
+    res = [0] * len(pins)
+    for control, rom, indexes in _groupByDevice(pins).values():
+        values = bytearray(len(indexes))
+        control.digitalReadInto(rom, bytes(pins[i]._p for i in indexes), values)
+        for j in range(len(indexes)):
+            res[indexes[j]] = values[j]
+    return res
+
+
+def writePins(pins: list, values: list) -> bool:
+    """
+    Set the outputs of multiple Pin objects using one transaction per device.
+    :param pins: list of Pin objects
+    :param values: list of values in the order of pins
+    :return: True
+    """
+    for control, rom, indexes in _groupByDevice(pins).values():
+        mask = 0
+        v = 0
+        for i in indexes:
+            mask |= 1 << pins[i]._p
+            if values[i]:
+                v |= 1 << pins[i]._p
+        control.writePort(rom, mask, v)
+    return True
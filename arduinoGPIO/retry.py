@@ -0,0 +1,125 @@
+# Author: Kevin Köck
+# Copyright Kevin Köck 2019 Released under the MIT license
+# Created on 2026-10-17
+
+__updated__ = "2026-10-17"
+__version__ = "0.1"
+
+import utime as time
+
+try:
+    from urandom import getrandbits
+except ImportError:
+    from random import getrandbits
+
+# index of the per device state
+_FAILED = 0  # consecutive calls that failed after all attempts
+_ERRORS = 1  # decaying number of failed attempts, scaled by 8
+_LAST = 2  # ticks_ms of the last failed call
+
+
+class RetryPolicy:
+    def __init__(self, attempts=4, backoff=3, factor=2, max_backoff=50, jitter=25, deadline=None, fail_fast=2,
+                 max_attempts=6, probe=1000):
+        """
+        Retries of ArduinoControl transactions. The waiting time between attempts grows exponentially
+        and gets a random jitter so devices recovering from a disturbance don't collide again.
+        The number of attempts adapts to the recent errors of each device: a device that failed
+        fail_fast calls in a row only gets one attempt until it answers again, a device with recent
+        errors on a marginal link gets max_attempts.
+        :param attempts: attempts per call
+        :param backoff: waiting time in ms before the second attempt
+        :param factor: multiplier of the waiting time for every further attempt
+        :param max_backoff: upper limit of the waiting time in ms
+        :param jitter: random additional waiting time in percent of the waiting time
+        :param deadline: maximum duration of a call including all retries in ms or None
+        :param fail_fast: failed calls after which a device only gets one attempt, 0 to disable
+        :param max_attempts: attempts for devices with recent errors
+        :param probe: time in ms after the last failed call before a failing device is tried again
+        by calls skipping failing devices (sweep)
+        """
+        self.attempts = attempts
+        self.backoff = backoff
+        self.factor = factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.deadline = deadline
+        self.fail_fast = fail_fast
+        self.max_attempts = max(attempts, max_attempts)
+        self.probe = probe
+        self._devices = {}  # rom key: [failed calls, errors, ticks_ms of the last failure]
+
+    def attemptsFor(self, key) -> int:
+        """
+        :param key: rom key or None for SKIP_ROM
+        :return: number of attempts for the next call
+        """
+        s = self._devices.get(key)
+        if s is None:
+            return self.attempts
+        if self.fail_fast and s[_FAILED] >= self.fail_fast:
+            return 1
+        if s[_FAILED] == 0 and s[_ERRORS] >= 8:  # answering but with recent errors
+            return self.max_attempts
+        return self.attempts
+
+    def failing(self, key) -> bool:
+        """
+        :param key: rom key
+        :return: True if the device failed fail_fast calls in a row, didn't answer since and the
+        last failure was less than probe ms ago
+        """
+        s = self._devices.get(key)
+        if not self.fail_fast or s is None or s[_FAILED] < self.fail_fast:
+            return False
+        return time.ticks_diff(time.ticks_ms(), s[_LAST]) < self.probe
+
+    def delay(self, attempt: int) -> int:
+        """
+        :param attempt: number of the failed attempt, starting at 1
+        :return: waiting time in ms before the next attempt
+        """
+        d = self.backoff
+        for _ in range(attempt - 1):
+            d *= self.factor
+            if d >= self.max_backoff:
+                break
+        d = min(d, self.max_backoff)
+        return d + d * self.jitter * getrandbits(8) // 25600
+
+    def expired(self, elapsed: int, attempts: int, delay: int) -> bool:
+        """
+        :param elapsed: duration of the call so far in us
+        :param attempts: number of attempts so far
+        :param delay: waiting time in ms before the next attempt
+        :return: True if the next attempt would probably end after the deadline
+        """
+        return self.deadline is not None and elapsed + elapsed // attempts + delay * 1000 > self.deadline * 1000
+
+    def success(self, key, attempts: int):
+        s = self._state(key, attempts > 1)
+        if s is not None:
+            s[_FAILED] = 0
+            s[_ERRORS] += (attempts - 1) * 8 - s[_ERRORS] // 4
+
+    def failure(self, key, attempts: int):
+        s = self._state(key, True)
+        s[_FAILED] += 1
+        s[_ERRORS] += attempts * 8 - s[_ERRORS] // 4
+        s[_LAST] = time.ticks_ms()
+
+    def _state(self, key, create: bool) -> list:
+        s = self._devices.get(key)
+        if s is None and create:
+            s = self._devices[key] = [0, 0, 0]
+        return s
+
+    def reset(self, key=None):
+        """
+        Forget the errors of a device
+        :param key: rom key or None to forget all devices
+        """
+        if key is None:
+            self._devices.clear()
+        else:
+            self._devices.pop(key, None)
@@ -0,0 +1,122 @@
+# Author: Kevin Köck
+# Copyright Kevin Köck 2019 Released under the MIT license
+# Created on 2026-10-17
+
+__updated__ = "2026-10-17"
+__version__ = "0.1"
+
+from array import array
+
+# upper bounds of the latency histogram buckets in us, the last bucket has no upper bound
+LATENCY_BUCKETS = (2000, 5000, 10000, 15000, 20000, 30000, 50000, 100000)
+
+# indexes of the counters, followed by the latency buckets
+TRANSACTIONS = 0
+RETRIES = 1
+CRC_ERRORS = 2
+ONEWIRE_ERRORS = 3
+FAILURES = 4
+_COUNTERS = 5
+_NAMES = ("transactions", "retries", "crc_errors", "onewire_errors", "failures")
+
+
+class BusStats:
+    def __init__(self):
+        """
+        Counters and latency histograms of bus transactions per ROM and per command.
+        Long frames are counted under the command in their payload, pipelines under PIPELINE.
+        Every ROM and command allocates one fixed size array when used the first time,
+        recording a transaction afterwards doesn't allocate memory.
+        """
+        self._roms = {}  # rom key (None for SKIP_ROM): array
+        self._coms = {}  # command: array
+
+    @staticmethod
+    def _counters(d: dict, key) -> array:
+        c = d.get(key)
+        if c is None:
+            c = d[key] = array("L", [0] * (_COUNTERS + len(LATENCY_BUCKETS) + 1))
+        return c
+
+    def record(self, rom: bytes, com: int, latency: int, attempts: int, crc_errors: int, onewire_errors: int,
+               failed: bool):
+        """
+        Record one call of ArduinoControl._send
+        :param rom: rom key or None
+        :param com: command
+        :param latency: duration including retries in us
+        :param attempts: number of transactions on the bus
+        :param crc_errors: number of answers with wrong crc
+        :param onewire_errors: number of bus errors
+        :param failed: True if the device didn't answer after all retries
+        """
+        b = 0
+        for bound in LATENCY_BUCKETS:
+            if latency <= bound:
+                break
+            b += 1
+        self._add(self._counters(self._roms, rom), b, attempts, crc_errors, onewire_errors, failed)
+        self._add(self._counters(self._coms, com), b, attempts, crc_errors, onewire_errors, failed)
+
+    @staticmethod
+    def _add(c: array, bucket: int, attempts: int, crc_errors: int, onewire_errors: int, failed: bool):
+        c[TRANSACTIONS] += 1
+        c[RETRIES] += attempts - 1
+        c[CRC_ERRORS] += crc_errors
+        c[ONEWIRE_ERRORS] += onewire_errors
+        if failed:
+            c[FAILURES] += 1
+        c[_COUNTERS + bucket] += 1
+
+    def get(self, rom: bytes = None, com: int = None) -> array:
+        """
+        Raw counters of a ROM or a command, indexes are TRANSACTIONS, RETRIES, CRC_ERRORS, ONEWIRE_ERRORS,
+        FAILURES followed by the latency buckets.
+        :param rom: rom as bytes, bytearray or hex string like ArduinoControl accepts it
+        :param com: command, used if rom is None
+        :return: array or None if nothing was recorded
+        """
+        if rom is not None:
+            from .arduinoControl import ArduinoControl
+            return self._roms.get(ArduinoControl._key(rom))
+        return self._coms.get(com)
+
+    @staticmethod
+    def percentile(c: array, p: float) -> int:
+        """
+        Estimate a latency percentile from the histogram of a counter array
+        :param c: array returned by get()
+        :param p: percentile, e.g. 50 or 99
+        :return: upper bound of the bucket in us, -1 if in the last, open ended bucket
+        """
+        total = 0
+        for i in range(len(LATENCY_BUCKETS) + 1):
+            total += c[_COUNTERS + i]
+        n = 0
+        for i in range(len(LATENCY_BUCKETS) + 1):
+            n += c[_COUNTERS + i]
+            if n * 100 >= total * p:
+                return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else -1
+        return 0
+
+    @staticmethod
+    def _export(c: array) -> dict:
+        d = {}
+        for i in range(_COUNTERS):
+            d[_NAMES[i]] = c[i]
+        d["latency_us"] = list(c[_COUNTERS:])
+        return d
+
+    def export(self) -> dict:
+        """
+        :return: dict of all counters that can be serialized with json
+        """
+        from .arduinoControl import ArduinoControl
+        return {"buckets_us": LATENCY_BUCKETS,
+                "roms": {("SKIP_ROM" if k is None else ArduinoControl.rom2str(k)): self._export(c)
+                         for k, c in self._roms.items()},
+                "commands": {"0x%02X" % k: self._export(c) for k, c in self._coms.items()}}
+
+    def reset(self):
+        self._roms.clear()
+        self._coms.clear()
@@ -26,6 +26,73 @@ bool Control::checkCRC(OneWireHub * const hub, uint8_t cmd, uint8_t length)
     return true;
 }
 
+bool Control::checkBatch(OneWireHub * const hub, uint8_t crc)
+{
+    // crc: crc of the bytes received before the batch length
+    uint8_t cmd;
+    if (hub->recv(&batch_length,1)) return false;
+    if (batch_length>BATCH_MAX) return false;
+    if (hub->recv(batch,batch_length*4+1)) return false;
+    crc=crc8(&batch_length,1,crc);
+    crc=crc8(batch,batch_length*4+1,crc);
+    if (crc!=0)
+    {
+        #if DEBUG
+        Serial.println("CRC mistmatch batch");
+        #endif
+        return false;
+    }
+    for (uint8_t i=0; i<batch_length; ++i)
+    {
+        cmd=batch[i*4];
+        if (cmd!=PIN_MODE && cmd!=DIGITAL_WRITE && cmd!=ANALOG_WRITE) return false;
+    }
+    return true;
+}
+
+void Control::executeBatch(void)
+{
+    // all operations were validated by checkBatch
+    for (uint8_t i=0; i<batch_length; ++i)
+    {
+        execute(batch[i*4],batch[i*4+1],(batch[i*4+2]<<8)|batch[i*4+3]);
+    }
+}
+
+bool Control::execute(uint8_t cmd, uint8_t pin, uint16_t value)
+{
+    ramp_t * r=stopRamp(pin);
+    switch (cmd)
+    {
+        case PIN_MODE:
+            pinMode(pin,value);
+            break;
+        case DIGITAL_WRITE:
+            digitalWrite(pin,value);
+            break;
+        case ANALOG_WRITE:
+            analogWrite(pin,value);
+            if (r==nullptr) r=rampSlot(pin,false);
+            if (r!=nullptr)
+            {
+                // finished ramp keeping the duty for ramps starting at RAMP_CURRENT
+                r->pin=pin;
+                r->count=1;
+                r->index=1;
+                r->value=value;
+            }
+            break;
+        default:
+            return false;
+    }
+    #if DEBUG
+    Serial.print("cmd:");Serial.println(cmd);
+    Serial.print("pin:");Serial.println(pin);
+    Serial.print("value:");Serial.println(value);
+    #endif
+    return true;
+}
+
 void Control::sendSuccess(OneWireHub * const hub)
 {
     hub->send(SUCCESS);
@@ -38,6 +105,392 @@ void Control::sendScratchpad(OneWireHub * const hub)
 	hub->send(scratchpad,9);
 }
 
+void Control::sendStream(OneWireHub * const hub, uint8_t max)
+{
+    // answer: count, flags (0x01 overflow, 0x02 more samples available), max samples, crc
+    uint8_t answer[2+2*STREAM_READ_MAX+1];
+    uint8_t n;
+    uint16_t value;
+    if (max>STREAM_READ_MAX) max=STREAM_READ_MAX;
+    n=stream_count;
+    if (n>max) n=max;
+    if (stream_pins>0) n-=n%stream_pins; // only complete sets of samples
+    answer[0]=n;
+    answer[1]=stream_overflow ? 0x01 : 0x00;
+    for (uint8_t i=0; i<max; ++i)
+    {
+        value=0;
+        if (i<n)
+        {
+            value=stream_buffer[stream_tail];
+            stream_tail=(stream_tail+1)%STREAM_BUFFER;
+        }
+        answer[2+2*i]=(value&0xFF);
+        answer[3+2*i]=(value>>8);
+    }
+    stream_count-=n;
+    if (stream_count>0) answer[1]|=0x02;
+    stream_overflow=false;
+    answer[2+2*max]=crc8(answer,2+2*max);
+    hub->send(answer,3+2*max);
+}
+
+uint16_t Control::frameCRC(const uint8_t data[], uint8_t length, uint16_t crc)
+{
+    // CRC-16/MAXIM without final inversion, 0 for data including its crc
+    for (uint8_t i=0; i<length; ++i)
+    {
+        crc^=data[i];
+        for (uint8_t bit=0; bit<8; ++bit)
+        {
+            if (crc&0x01) crc=(crc>>1)^0xA001;
+            else crc>>=1;
+        }
+    }
+    return crc;
+}
+
+bool Control::checkLongFrame(OneWireHub * const hub, uint8_t cmd)
+{
+    // frame[0]: payload length n, [1:n]: payload starting with a command, [n+1:n+2]: crc16
+    if (hub->recv(&frame[0],1)) return false;
+    if (frame[0]==0 || frame[0]>LONG_FRAME_MAX) return false;
+    if (hub->recv(&frame[1],frame[0]+2)) return false;
+    if (frameCRC(frame,frame[0]+3,frameCRC(&cmd,1,0))!=0)
+    {
+        #if DEBUG
+        Serial.println("CRC mistmatch long frame");
+        #endif
+        return false;
+    }
+    return true;
+}
+
+void Control::executeLongFrame(OneWireHub * const hub)
+{
+    // the answer payload is written to frame[1:] and sent with length and crc16
+    uint8_t n=frame[0]-1; // arguments of the command in frame[2:]
+    uint8_t length;
+    uint16_t value;
+    switch (frame[1])
+    {
+        case BATCH:
+            // frame[2]: number of operations, [3:]: 4 bytes per operation
+            if (frame[2]*4+1!=n) return;
+            for (uint8_t i=3; i<n+2; i+=4)
+            {
+                if (frame[i]!=PIN_MODE && frame[i]!=DIGITAL_WRITE && frame[i]!=ANALOG_WRITE) return;
+            }
+            for (uint8_t i=3; i<n+2; i+=4)
+            {
+                execute(frame[i],frame[i+1],(frame[i+2]<<8)|frame[i+3]);
+            }
+            frame[1]=SUCCESS;
+            length=1;
+            break;
+
+        case ANALOG_READ:
+            // frame[2:]: pins, answer: 2 bytes per pin. Backwards as the answer overwrites the pins
+            if (2*n>LONG_FRAME_MAX) return;
+            for (uint8_t i=n; i>0; --i)
+            {
+                value=analogRead(frame[1+i]);
+                frame[2*i-1]=(value&0xFF);
+                frame[2*i]=(value>>8);
+            }
+            length=2*n;
+            break;
+
+        case DIGITAL_READ:
+            // frame[2:]: pins, answer: 1 byte per pin
+            for (uint8_t i=0; i<n; ++i)
+            {
+                frame[1+i]=digitalRead(frame[2+i]);
+            }
+            length=n;
+            break;
+
+        case READ_SCRATCHPAD:
+            // snapshot, answer: [1:7] digital pins, [8:] 2 bytes per analog pin
+            if (n!=0 || snapshot_enabled==false) return;
+            for (uint8_t i=0; i<PORT_PINS/8; ++i) frame[1+i]=snapshot_digital[i];
+            length=PORT_PINS/8;
+            for (uint8_t pin=0; pin<NUM_ANALOG_INPUTS && pin<SNAPSHOT_ANALOG; ++pin)
+            {
+                frame[1+length]=(snapshot_analog[pin]&0xFF);
+                frame[2+length]=(snapshot_analog[pin]>>8);
+                length+=2;
+            }
+            break;
+
+        case RAMP:
+            // frame[2]: pin, [3]: flags (0x01 repeat), [4:5]: start duty, [6:]: 4 bytes per keyframe
+            if (n<8 || (n-4)%4!=0) return;
+            if (startRamp(frame[2],(frame[4]<<8)|frame[5],&frame[6],(n-4)/4,frame[3]&0x01)==false) return;
+            frame[1]=SUCCESS;
+            length=1;
+            break;
+
+        default:
+            return;
+    }
+    frame[0]=length;
+    value=frameCRC(frame,length+1,0);
+    frame[length+1]=(value&0xFF);
+    frame[length+2]=(value>>8);
+    hub->send(frame,length+3);
+}
+
+uint8_t Control::pipelineArguments(uint8_t cmd)
+{
+    // argument bytes of the commands supported in a pipeline, 0xFF for others
+    switch (cmd)
+    {
+        case PIN_MODE:
+            return 2;
+        case DIGITAL_WRITE:
+        case ANALOG_WRITE:
+            return 3;
+        case DIGITAL_READ:
+        case ANALOG_READ:
+            return 1;
+        default:
+            return 0xFF;
+    }
+}
+
+bool Control::checkPipeline(OneWireHub * const hub)
+{
+    // scratchpad[1]: number of commands, each received as command, arguments, crc8.
+    // All commands are received before executing any so the host can send them back-to-back.
+    uint8_t j=0;
+    uint8_t n;
+    pipeline_length=scratchpad[1];
+    if (pipeline_length==0 || pipeline_length>PIPELINE_MAX) return false;
+    for (uint8_t i=0; i<pipeline_length; ++i)
+    {
+        if (hub->recv(&pipeline[j],1)) return false;
+        n=pipelineArguments(pipeline[j]);
+        if (n==0xFF) return false; // the length of the following frames is unknown
+        if (hub->recv(&pipeline[j+1],n+1)) return false;
+        j+=n+2;
+    }
+    return true;
+}
+
+void Control::executePipeline(OneWireHub * const hub)
+{
+    // Commands are executed in order, every command gets its usual answer with its own crc8:
+    // SUCCESS, SUCCESS_CRC for writes and the scratchpad for reads. Commands with a crc mismatch
+    // are skipped and answered with 0xFF bytes. The answers are collected in frame[] and sent
+    // after a 0 bit telling the host that all commands were executed.
+    uint8_t j=0;
+    uint8_t length=0;
+    uint8_t n;
+    uint8_t * p;
+    bool ok;
+    for (uint8_t i=0; i<pipeline_length; ++i)
+    {
+        p=&pipeline[j];
+        n=pipelineArguments(p[0]);
+        ok=crc8(p,n+2)==0;
+        j+=n+2;
+        if (p[0]==DIGITAL_READ || p[0]==ANALOG_READ)
+        {
+            if (ok)
+            {
+                setValue(p[0]==DIGITAL_READ ? digitalRead(p[1]) : analogRead(p[1]));
+                updateCRC();
+            }
+            for (uint8_t k=0; k<9; ++k) frame[length+k]=ok ? scratchpad[k] : 0xFF;
+            length+=9;
+            continue;
+        }
+        if (ok) execute(p[0],p[1],p[0]==PIN_MODE ? p[2] : (p[2]<<8)|p[3]);
+        frame[length]=ok ? SUCCESS : 0xFF;
+        frame[length+1]=ok ? SUCCESS_CRC : 0xFF;
+        length+=2;
+    }
+    hub->sendBit(false);
+    hub->send(frame,length);
+}
+
+void Control::sendChanges(OneWireHub * const hub)
+{
+    // answer: changed pins [0:6], states of the watched pins [7:13], crc
+    uint8_t answer[2*PORT_PINS/8+1];
+    for (uint8_t i=0; i<PORT_PINS/8; ++i)
+    {
+        answer[i]=watch_changed[i];
+        answer[PORT_PINS/8+i]=watch_state[i];
+    }
+    answer[2*PORT_PINS/8]=crc8(answer,2*PORT_PINS/8);
+    hub->send(answer,2*PORT_PINS/8+1);
+    for (uint8_t i=0; i<PORT_PINS/8; ++i) watch_changed[i]=0;
+}
+
+void Control::watchPins(bool latch)
+{
+    uint8_t bit;
+    for (uint8_t pin=0; pin<NUM_DIGITAL_PINS && pin<PORT_PINS; ++pin)
+    {
+        bit=(1<<(pin%8));
+        if ((watch_mask[pin/8]&bit)==0) continue;
+        if (((watch_state[pin/8]&bit)!=0)!=(digitalRead(pin)!=0))
+        {
+            watch_state[pin/8]^=bit;
+            if (latch) watch_changed[pin/8]|=bit;
+        }
+    }
+}
+
+Control::ramp_t * Control::rampSlot(uint8_t pin, bool evict)
+{
+    // slot of the pin, otherwise an unused slot, a finished slot or with evict the slot of the oldest ramp
+    ramp_t * slot=nullptr;
+    for (uint8_t i=0; i<RAMP_SLOTS; ++i)
+    {
+        if (ramps[i].count!=0 && ramps[i].pin==pin) return &ramps[i];
+    }
+    for (uint8_t i=0; i<RAMP_SLOTS; ++i)
+    {
+        if (ramps[i].count==0) return &ramps[i];
+        if (ramps[i].index==ramps[i].count) slot=&ramps[i];
+    }
+    if (slot!=nullptr || evict==false) return slot;
+    slot=&ramps[0];
+    for (uint8_t i=1; i<RAMP_SLOTS; ++i)
+    {
+        if (ramps[i].start<slot->start) slot=&ramps[i];
+    }
+    return slot;
+}
+
+bool Control::startRamp(uint8_t pin, uint16_t from, const uint8_t keys[], uint8_t count, bool repeat)
+{
+    // keys: 4 bytes per keyframe, target duty and duration in ms, both high byte first
+    uint32_t total=0;
+    ramp_t * r;
+    if (count==0 || count>RAMP_KEYFRAMES) return false;
+    for (uint8_t i=0; i<count; ++i) total+=(keys[4*i+2]<<8)|keys[4*i+3];
+    if (repeat && total==0) return false;
+    r=rampSlot(pin,true);
+    if (from==RAMP_CURRENT) from=(r->count!=0 && r->pin==pin) ? r->value : 0;
+    r->pin=pin;
+    r->count=count;
+    r->index=0;
+    r->repeat=repeat;
+    r->from=from;
+    r->value=from;
+    r->start=millis();
+    for (uint8_t i=0; i<count; ++i)
+    {
+        r->duty[i]=(keys[4*i]<<8)|keys[4*i+1];
+        r->ms[i]=(keys[4*i+2]<<8)|keys[4*i+3];
+    }
+    analogWrite(pin,from);
+    runRamps();
+    return true;
+}
+
+Control::ramp_t * Control::stopRamp(uint8_t pin)
+{
+    // returns the slot of the pin or nullptr
+    for (uint8_t i=0; i<RAMP_SLOTS; ++i)
+    {
+        if (ramps[i].count!=0 && ramps[i].pin==pin)
+        {
+            ramps[i].index=ramps[i].count;
+            return &ramps[i];
+        }
+    }
+    return nullptr;
+}
+
+void Control::runRamps(void)
+{
+    uint32_t now=millis();
+    uint32_t elapsed;
+    uint16_t value;
+    for (uint8_t i=0; i<RAMP_SLOTS; ++i)
+    {
+        ramp_t * r=&ramps[i];
+        if (r->index==r->count) continue;
+        elapsed=now-r->start;
+        while (r->index<r->count && elapsed>=r->ms[r->index])
+        {
+            elapsed-=r->ms[r->index];
+            r->start+=r->ms[r->index];
+            r->from=r->duty[r->index];
+            ++r->index;
+            if (r->index==r->count && r->repeat) r->index=0;
+        }
+        if (r->index==r->count) value=r->from;
+        // 16 bit duty difference times up to 65535ms doesn't fit into int32_t
+        else value=r->from+((int64_t)r->duty[r->index]-r->from)*(int64_t)elapsed/r->ms[r->index];
+        if (value!=r->value)
+        {
+            r->value=value;
+            analogWrite(r->pin,value);
+        }
+    }
+}
+
+void Control::updateSnapshot(void)
+{
+    // all digital pins but only one analog pin per call to keep loop() short
+    uint8_t pin;
+    if (snapshot_enabled==false) return;
+    for (uint8_t i=0; i<PORT_PINS/8; ++i) snapshot_digital[i]=0;
+    for (pin=0; pin<NUM_DIGITAL_PINS && pin<PORT_PINS; ++pin)
+    {
+        if (digitalRead(pin)) snapshot_digital[pin/8]|=(1<<(pin%8));
+    }
+    if (snapshot_mask==0) return;
+    for (uint8_t i=0; i<SNAPSHOT_ANALOG; ++i)
+    {
+        pin=snapshot_next;
+        snapshot_next=(snapshot_next+1)%SNAPSHOT_ANALOG;
+        if (snapshot_mask&(1U<<pin))
+        {
+            snapshot_analog[pin]=analogRead(pin);
+            break;
+        }
+    }
+}
+
+void Control::update(void)
+{
+    watchPins(true);
+    sampleStream();
+    runRamps();
+    updateSnapshot();
+}
+
+void Control::sampleStream(void)
+{
+    uint32_t now;
+    if (stream_mask==0) return;
+    now=millis();
+    if (now-stream_last<stream_interval) return;
+    stream_last=now;
+    if (stream_count+stream_pins>STREAM_BUFFER)
+    {
+        // drop the oldest set of samples
+        stream_tail=(stream_tail+stream_pins)%STREAM_BUFFER;
+        stream_count-=stream_pins;
+        stream_overflow=true;
+    }
+    for (uint8_t pin=0; pin<16; ++pin)
+    {
+        if (stream_mask&(1U<<pin))
+        {
+            stream_buffer[(stream_tail+stream_count)%STREAM_BUFFER]=analogRead(pin);
+            ++stream_count;
+        }
+    }
+}
+
 void Control::duty(OneWireHub * const hub)
 {
     uint8_t cmd;
@@ -67,12 +520,8 @@ void Control::duty(OneWireHub * const hub)
 		    if (checkCRC(hub, cmd,2)==false) break;
         	pin=scratchpad[1];
         	mode=scratchpad[2];
-        	pinMode(pin,mode);
+        	execute(cmd,pin,mode);
         	sendSuccess(hub);
-			#if DEBUG
-        	Serial.print("pin:");Serial.println(pin);
-        	Serial.print("mode:");Serial.println(mode);
-        	#endif
             break;
 
         case DIGITAL_READ:
@@ -87,12 +536,8 @@ void Control::duty(OneWireHub * const hub)
             if (checkCRC(hub, cmd,3)==false) break;
         	pin=scratchpad[1];
         	value=((scratchpad[2]<<8)|scratchpad[3]);
-        	digitalWrite(pin,value);
+        	execute(cmd,pin,value);
         	sendSuccess(hub);
-        	#if DEBUG
-        	Serial.print("pin:");Serial.println(pin);
-			Serial.print("value:");Serial.println(value);
-			#endif
         	break;
 
         case ANALOG_READ:
@@ -111,14 +556,128 @@ void Control::duty(OneWireHub * const hub)
         	if (checkCRC(hub, cmd,3)==false) break;
 			pin=scratchpad[1];
 			value=((scratchpad[2]<<8)|scratchpad[3]);
-			analogWrite(pin,value);
+			execute(cmd,pin,value);
             sendSuccess(hub);
-			#if DEBUG
-			Serial.print("pin:");Serial.println(pin);
-			Serial.print("analogWrite value:");Serial.println(value);
-			#endif
 			break;
 
+        case BATCH:
+            if (checkBatch(hub, crc8(&cmd,1))==false) break;
+            executeBatch();
+            sendSuccess(hub);
+            break;
+
+        case BROADCAST:
+            // sent with SKIP_ROM to all devices, no answer to prevent collisions
+            if (hub->recv(&scratchpad[1],1)) break;
+            scratchpad[0]=cmd;
+            if (checkBatch(hub, crc8(scratchpad,2))==false) break;
+            executeBatch();
+            broadcast_seq=scratchpad[1];
+            break;
+
+        case BROADCAST_STATUS:
+            if (checkCRC(hub, cmd,0)==false) break;
+            scratchpad[3]=broadcast_seq;
+            sendScratchpad(hub);
+            break;
+
+        case READ_PORT:
+            if (checkCRC(hub, cmd,0)==false) break;
+            for (uint8_t i=1; i<8; ++i) scratchpad[i]=0;
+            for (pin=0; pin<NUM_DIGITAL_PINS && pin<PORT_PINS; ++pin)
+            {
+                if (digitalRead(pin)) scratchpad[1+pin/8]|=(1<<(pin%8));
+            }
+            sendScratchpad(hub);
+            break;
+
+        case WRITE_PORT:
+            // scratchpad[1]: byte offset, [2:4]: mask, [5:7]: values
+            if (checkCRC(hub, cmd,7)==false) break;
+            for (uint8_t i=0; i<24; ++i)
+            {
+                pin=scratchpad[1]*8+i;
+                if (pin>=NUM_DIGITAL_PINS) break;
+                if (scratchpad[2+i/8]&(1<<(i%8)))
+                {
+                    stopRamp(pin);
+                    digitalWrite(pin,(scratchpad[5+i/8]>>(i%8))&1);
+                }
+            }
+            sendSuccess(hub);
+            break;
+
+        case STREAM_START:
+            // scratchpad[1:2]: analog pin mask, [3:4]: interval in ms
+            if (checkCRC(hub, cmd,4)==false) break;
+            stream_mask=(scratchpad[2]<<8)|scratchpad[1];
+            stream_interval=(scratchpad[3]<<8)|scratchpad[4];
+            stream_pins=0;
+            for (pin=0; pin<16; ++pin)
+            {
+                if (stream_mask&(1U<<pin)) ++stream_pins;
+            }
+            stream_tail=0;
+            stream_count=0;
+            stream_overflow=false;
+            stream_last=millis();
+            sendSuccess(hub);
+            break;
+
+        case STREAM_READ:
+            if (checkCRC(hub, cmd,1)==false) break;
+            sendStream(hub,scratchpad[1]);
+            break;
+
+        case WATCH:
+            // scratchpad[1:7]: pin mask, current states are taken without latching a change
+            if (checkCRC(hub, cmd,7)==false) break;
+            for (uint8_t i=0; i<PORT_PINS/8; ++i)
+            {
+                watch_mask[i]=scratchpad[1+i];
+                watch_state[i]=0;
+                watch_changed[i]=0;
+            }
+            watchPins(false);
+            sendSuccess(hub);
+            break;
+
+        case READ_CHANGES:
+            if (checkCRC(hub, cmd,0)==false) break;
+            sendChanges(hub);
+            break;
+
+        case LONG_FRAME:
+            if (checkLongFrame(hub, cmd)==false) break;
+            executeLongFrame(hub);
+            break;
+
+        case SNAPSHOT:
+            // scratchpad[1:2]: analog pin mask, [3]: 0x01 enabled
+            if (checkCRC(hub, cmd,3)==false) break;
+            snapshot_mask=(scratchpad[2]<<8)|scratchpad[1];
+            snapshot_enabled=scratchpad[3]&0x01;
+            snapshot_next=0;
+            // analog pins are sampled by update(), sampling all here would delay the answer
+            for (uint8_t i=0; i<SNAPSHOT_ANALOG; ++i) snapshot_analog[i]=0;
+            updateSnapshot();
+            sendSuccess(hub);
+            break;
+
+        case RAMP:
+            // scratchpad[1]: pin, [2:3]: start duty or RAMP_CURRENT, [4:5]: target duty, [6:7]: duration in ms
+            if (checkCRC(hub, cmd,7)==false) break;
+            if (startRamp(scratchpad[1],(scratchpad[2]<<8)|scratchpad[3],&scratchpad[4],1,false)==false) break;
+            sendSuccess(hub);
+            break;
+
+        case PIPELINE:
+            // scratchpad[1]: number of commands, followed by the commands, see checkPipeline
+            if (checkCRC(hub, cmd,1)==false) break;
+            if (checkPipeline(hub)==false) break;
+            executePipeline(hub);
+            break;
+
         case DIGITAL_PINS:
         	if (checkCRC(hub, cmd,0)==false) break;
         	scratchpad[3]=NUM_DIGITAL_PINS;
@@ -133,7 +692,12 @@ void Control::duty(OneWireHub * const hub)
 
         case READ_VERSION:
         	if (checkCRC(hub, cmd,0)==false) break;
+        	scratchpad[1]=(features&0xFF);
+        	scratchpad[2]=(features>>8);
+        	scratchpad[3]=NUM_DIGITAL_PINS;
         	setValue(client_version);
+        	scratchpad[6]=NUM_ANALOG_INPUTS;
+        	scratchpad[7]=0;
         	sendScratchpad(hub);
         	break;
 
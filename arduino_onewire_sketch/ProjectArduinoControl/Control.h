@@ -15,26 +15,126 @@ enum {
     ANALOG_PINS = 0xbc,		//!< Get number of analog inputs
     WRITE_SCRATCHPAD = 0x4E,
     READ_SCRATCHPAD = 0xBE,
-	READ_VERSION = 0xCE		//!< Read client software version
+	READ_VERSION = 0xCE,	//!< Read client software version
+	BATCH = 0x60,			//!< Execute multiple write commands
+	READ_PORT = 0x62,		//!< Read all digital pins as bitmask
+	WRITE_PORT = 0x64,		//!< Write digital pins selected by bitmask
+	BROADCAST = 0x66,		//!< Execute write commands sent to all devices
+	BROADCAST_STATUS = 0x68,//!< Read sequence number of the last executed broadcast
+	STREAM_START = 0x6A,	//!< Start/stop sampling analog pins into the stream buffer
+	STREAM_READ = 0x6C,		//!< Read samples from the stream buffer
+	WATCH = 0x6E,			//!< Latch changes of digital pins selected by bitmask
+	READ_CHANGES = 0x70,	//!< Read and clear the latched changes
+	LONG_FRAME = 0x72,		//!< Variable length frame with crc16, see executeLongFrame
+	RAMP = 0x74,			//!< Ramp the pwm duty of a pin, keyframe sequences with LONG_FRAME
+	SNAPSHOT = 0x76,		//!< Keep a snapshot of all pins, read with READ_SCRATCHPAD in a LONG_FRAME
+	PIPELINE = 0x78			//!< Execute several commands and answer them together, see executePipeline
   };
 //odd numbers are not working with select_rom, reason unknown
 
+enum {
+    FEATURE_BATCH = 0x0001,	//!< BATCH command
+    FEATURE_PORT = 0x0002,	//!< READ_PORT and WRITE_PORT commands
+    FEATURE_BROADCAST = 0x0004,	//!< BROADCAST and BROADCAST_STATUS commands
+    FEATURE_STREAM = 0x0008,	//!< STREAM_START and STREAM_READ commands
+    FEATURE_WATCH = 0x0010,	//!< WATCH and READ_CHANGES commands
+    FEATURE_LONG_FRAME = 0x0020,	//!< LONG_FRAME command
+    FEATURE_RAMP = 0x0040,	//!< RAMP command
+    FEATURE_SNAPSHOT = 0x0080,	//!< SNAPSHOT command and READ_SCRATCHPAD in a LONG_FRAME
+    FEATURE_PIPELINE = 0x0100	//!< PIPELINE command
+  };
+//features are reported with READ_VERSION in scratchpad[1:2] together with
+//the number of digital pins in scratchpad[3] and analog pins in scratchpad[6]
+
 #define SUCCESS 0xEE
 #define SUCCESS_CRC 0xF6
 
+#define BATCH_MAX 8 // operations per batch frame, 4 bytes each
+#define PORT_PINS 56 // pins covered by port commands, scratchpad[1:7]
+#define STREAM_BUFFER 64 // analog samples buffered for STREAM_READ
+#define STREAM_READ_MAX 16 // samples per STREAM_READ answer
+#define LONG_FRAME_MAX 64 // payload bytes of a long frame and its answer
+#define RAMP_SLOTS 4 // pins ramped at the same time
+#define RAMP_KEYFRAMES 8 // keyframes of a ramp sequence
+#define RAMP_CURRENT 0xFFFF // start value continuing from the current duty of the pin
+#define SNAPSHOT_ANALOG 16 // analog pins covered by the snapshot
+#define PIPELINE_MAX 7 // commands per pipeline, the answers of up to 9 bytes each are sent from frame[]
+
 
 class Control : public OneWireItem
 {
 private:
-	uint16_t client_version = 100;
+	uint16_t client_version = 110;
+	static constexpr uint16_t features { FEATURE_BATCH | FEATURE_PORT | FEATURE_BROADCAST | FEATURE_STREAM |
+	                                     FEATURE_WATCH | FEATURE_LONG_FRAME | FEATURE_RAMP | FEATURE_SNAPSHOT |
+	                                     FEATURE_PIPELINE };
+
+    struct ramp_t {
+        uint8_t pin;
+        uint8_t count; // number of keyframes, 0 for an unused slot
+        uint8_t index; // current keyframe, count when the ramp is finished
+        bool repeat;
+        uint16_t from; // duty at the start of the current keyframe
+        uint16_t value; // last written duty
+        uint32_t start; // millis() at the start of the current keyframe
+        uint16_t duty[RAMP_KEYFRAMES];
+        uint16_t ms[RAMP_KEYFRAMES];
+    };
 
     uint8_t scratchpad[9];
+    uint8_t batch[BATCH_MAX*4+1];
+    uint8_t batch_length;
+    uint8_t broadcast_seq = 0;
+
+    uint16_t stream_mask = 0;
+    uint16_t stream_interval;
+    uint32_t stream_last;
+    uint16_t stream_buffer[STREAM_BUFFER];
+    uint8_t stream_tail;
+    uint8_t stream_count;
+    uint8_t stream_pins;
+    bool stream_overflow;
+
+    uint8_t watch_mask[PORT_PINS/8] = {0};
+    uint8_t watch_state[PORT_PINS/8];
+    uint8_t watch_changed[PORT_PINS/8];
+
+    uint8_t frame[LONG_FRAME_MAX+3]; // length, payload, crc16
+
+    ramp_t ramps[RAMP_SLOTS] = {};
+
+    bool snapshot_enabled = false;
+    uint16_t snapshot_mask = 0; // analog pins sampled, one per update()
+    uint8_t snapshot_next = 0;
+    uint8_t snapshot_digital[PORT_PINS/8];
+    uint16_t snapshot_analog[SNAPSHOT_ANALOG];
+
+    uint8_t pipeline[PIPELINE_MAX*5]; // command, up to 3 arguments, crc8
+    uint8_t pipeline_length; // number of commands
 
     void updateCRC(void);
 
     bool checkCRC(OneWireHub * hub, uint8_t cmd, uint8_t length);
+    bool checkBatch(OneWireHub * hub, uint8_t crc);
+    void executeBatch(void);
+    bool execute(uint8_t cmd, uint8_t pin, uint16_t value);
     void sendSuccess(OneWireHub * const hub);
     void sendScratchpad(OneWireHub * const hub);
+    void sendStream(OneWireHub * const hub, uint8_t max);
+    void sendChanges(OneWireHub * const hub);
+    void sampleStream(void);
+    void watchPins(bool latch);
+    bool checkLongFrame(OneWireHub * const hub, uint8_t cmd);
+    void executeLongFrame(OneWireHub * const hub);
+    static uint16_t frameCRC(const uint8_t data[], uint8_t length, uint16_t crc);
+    ramp_t * rampSlot(uint8_t pin, bool evict);
+    bool startRamp(uint8_t pin, uint16_t from, const uint8_t keys[], uint8_t count, bool repeat);
+    ramp_t * stopRamp(uint8_t pin);
+    void runRamps(void);
+    void updateSnapshot(void);
+    static uint8_t pipelineArguments(uint8_t cmd);
+    bool checkPipeline(OneWireHub * const hub);
+    void executePipeline(OneWireHub * const hub);
 
 public:
 
@@ -43,6 +143,7 @@ public:
     Control(uint8_t ID1, uint8_t ID2, uint8_t ID3, uint8_t ID4, uint8_t ID5, uint8_t ID6, uint8_t ID7);
 
     void duty(OneWireHub * hub) final;
+    void update(void); //!< call periodically from loop()
 
 	void setValue(uint16_t value);
     uint16_t getValue() const;
@@ -31,6 +31,8 @@ void setup() {
 void loop() {
     // following function must be called periodically
     hub.poll();
+    // sampling of analog streams and watched pins, pwm ramps
+    arduino.update();
     // this part is just for debugging (USE_SERIAL_DEBUG in OneWire.h must be enabled for output)
     if (hub.hasError()) hub.printError();
 